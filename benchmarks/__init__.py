@@ -0,0 +1,18 @@
+"""
+Benchmarks for sphinxcontrib-autosaltsls
+
+Run from the repository root, e.g. ``python -m benchmarks.bench_build --help``:
+
+bench_build
+    Times the scan, load and write phases and a full sphinx-build over a synthetic Salt tree and saves the results
+    as JSON
+
+bench_memory
+    Reports the memory used by parsed sls objects
+
+bench_parser
+    Times the parsing of single sls files
+
+generator
+    Writes synthetic Salt trees
+"""
@@ -0,0 +1,287 @@
+"""
+Benchmark for the AutoSaltSLS scan, load and write phases and a full sphinx-build
+
+Generates a synthetic Salt tree and a Sphinx project to document it, then times ``AutoSaltSLSMapper.scan``, ``load``
+and ``write`` in-process followed by a cold and a warm ``sphinx-build`` run. The results are printed and can be saved
+as JSON and compared with a previous run, e.g.::
+
+    python -m benchmarks.bench_build --states 5000 --output results.json
+    python -m benchmarks.bench_build --states 5000 --compare results.json
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import sphinx
+from sphinx.application import Sphinx
+
+from sphinxcontrib.autosaltsls import __version__
+from sphinxcontrib.autosaltsls.mapper import AutoSaltSLSMapper
+
+from .generator import add_tree_arguments, generate_tree, tree_settings
+
+REPO_ROOT = os.path.normpath(os.path.join(os.path.dirname(__file__), ".."))
+
+CONF_PY = """
+project = "AutoSaltSLS benchmark"
+extensions = ["sphinxcontrib.autosaltsls"]
+master_doc = "index"
+autosaltsls_sources = {{
+    "states": {{
+        "title": "States",
+        "cross_ref_role": "state",
+    }},
+}}
+autosaltsls_parallel_jobs = {parallel_jobs}
+autosaltsls_write_index_page = True
+"""
+
+PHASES = ["scan", "load", "write"]
+
+
+def time_phases(docs_dir, stats, repeat, parallel_jobs):
+    """
+    Time the mapper phases in-process using a fresh mapper for each run, with the parse cache and incremental scan
+    turned off so each run does the full amount of work. A separate run with tracemalloc running records the peak
+    memory allocated by each phase.
+
+    :return: dict
+    """
+    build_dir = os.path.join(docs_dir, "_phases")
+    app = Sphinx(
+        docs_dir,
+        docs_dir,
+        os.path.join(build_dir, "html"),
+        os.path.join(build_dir, "doctrees"),
+        "html",
+        status=None,
+        warning=io.StringIO(),
+        confoverrides={
+            "autosaltsls_incremental_scan": False,
+            "autosaltsls_parse_cache": False,
+            "autosaltsls_parallel_jobs": parallel_jobs,
+        },
+    )
+    source_settings = app.config.autosaltsls_sources["states"]
+
+    best = {x: None for x in PHASES}
+    peaks = {}
+    rst_files = 0
+
+    for run in range(repeat + 1):
+        traced = run == repeat
+
+        mapper = AutoSaltSLSMapper(app, "states", source_settings)
+        mapper.show_progress = False
+        shutil.rmtree(mapper.build_root, ignore_errors=True)
+
+        for phase in PHASES:
+            if traced:
+                tracemalloc.start()
+
+            start = time.perf_counter()
+            getattr(mapper, phase)()
+            elapsed = time.perf_counter() - start
+
+            if traced:
+                peaks[phase] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            elif best[phase] is None or elapsed < best[phase]:
+                best[phase] = elapsed
+
+        rst_files = mapper.written_count
+
+    shutil.rmtree(mapper.build_root, ignore_errors=True)
+
+    results = {}
+    for phase in PHASES:
+        results[phase] = _phase_result(best[phase], stats, peak_memory=peaks[phase])
+
+    results["write"]["rst_files"] = rst_files
+    results["write"]["rst_files_per_second"] = rst_files / best["write"]
+
+    return results
+
+
+def time_sphinx_build(docs_dir, stats, jobs):
+    """
+    Time a cold sphinx-build of the project followed by a warm rebuild with nothing changed.
+
+    :return: dict
+    """
+    build_dir = os.path.join(docs_dir, "_build")
+    command = [
+        sys.executable,
+        "-m",
+        "sphinx",
+        "-b",
+        "html",
+        "-q",
+        "-j",
+        str(jobs),
+        docs_dir,
+        os.path.join(build_dir, "html"),
+    ]
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [REPO_ROOT] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else [])
+    )
+
+    results = {}
+
+    for name in ["sphinx_build_cold", "sphinx_build_warm"]:
+        with tempfile.TemporaryFile() as log_file:
+            start = time.perf_counter()
+            process = subprocess.Popen(
+                command, env=env, stdout=subprocess.DEVNULL, stderr=log_file
+            )
+            status, rusage = os.wait4(process.pid, 0)[1:]
+            elapsed = time.perf_counter() - start
+
+            if status:
+                log_file.seek(0)
+                raise RuntimeError(
+                    "sphinx-build failed:\n{0}".format(
+                        log_file.read().decode(errors="replace")
+                    )
+                )
+
+        results[name] = _phase_result(
+            elapsed, stats, peak_rss=_max_rss_bytes(rusage.ru_maxrss)
+        )
+
+    return results
+
+
+def compare(results, previous):
+    """
+    Print the change in time for each phase compared with a previous set of results.
+    """
+    print("Compared with {0} ({1}):".format(previous["version"], previous["created"]))
+
+    for phase, data in results["phases"].items():
+        old = previous["phases"].get(phase)
+        if not old:
+            continue
+
+        print(
+            "  {0:<18} {1:8.3f}s -> {2:8.3f}s ({3:+.1%})".format(
+                phase,
+                old["seconds"],
+                data["seconds"],
+                data["seconds"] / old["seconds"] - 1,
+            )
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    add_tree_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--jobs", type=int, default=1, help="sphinx-build -j value (default: 1)"
+    )
+    parser.add_argument(
+        "--parallel-jobs",
+        type=int,
+        default=1,
+        help="autosaltsls_parallel_jobs value (default: 1)",
+    )
+    parser.add_argument("--skip-build", action="store_true")
+    parser.add_argument("--output", help="JSON file to save the results to")
+    parser.add_argument("--compare", help="JSON file of results to compare with")
+    args = parser.parse_args(argv)
+
+    settings = tree_settings(args)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        stats = generate_tree(os.path.join(temp_dir, "states"), **settings)
+
+        docs_dir = os.path.join(temp_dir, "docs")
+        os.mkdir(docs_dir)
+        with open(os.path.join(docs_dir, "conf.py"), "w") as outfile:
+            outfile.write(CONF_PY.format(parallel_jobs=args.parallel_jobs))
+
+        phases = time_phases(docs_dir, stats, args.repeat, args.parallel_jobs)
+
+        if not args.skip_build:
+            phases.update(time_sphinx_build(docs_dir, stats, args.jobs))
+
+    settings.update(
+        repeat=args.repeat, jobs=args.jobs, parallel_jobs=args.parallel_jobs
+    )
+
+    results = {
+        "version": __version__,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sphinx": sphinx.__version__,
+        "platform": platform.platform(),
+        "settings": settings,
+        "tree": stats,
+        "phases": phases,
+        "peak_rss": _max_rss_bytes(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss),
+    }
+
+    print(
+        "Tree: {0} files, {1} lines, {2:.1f} MB".format(
+            stats["files"], stats["lines"], stats["bytes"] / 2 ** 20
+        )
+    )
+    for phase, data in phases.items():
+        memory = data.get("peak_memory", data.get("peak_rss"))
+        print(
+            "  {0:<18} {1:8.3f}s {2:10,.0f} files/s {3:12,.0f} lines/s {4:8.1f} MB peak".format(
+                phase,
+                data["seconds"],
+                data["files_per_second"],
+                data["lines_per_second"],
+                memory / 2 ** 20,
+            )
+        )
+
+    if args.output:
+        with open(args.output, "w") as outfile:
+            json.dump(results, outfile, indent=2)
+
+    if args.compare:
+        with open(args.compare) as infile:
+            compare(results, json.load(infile))
+
+
+#
+# Private functions
+#
+def _max_rss_bytes(max_rss):
+    """
+    Convert a ``ru_maxrss`` value to bytes, it is reported in kilobytes everywhere except macOS.
+    """
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def _phase_result(seconds, stats, **kwargs):
+    """
+    Return the timing data for a phase.
+    """
+    result = {
+        "seconds": seconds,
+        "files_per_second": stats["files"] / seconds,
+        "lines_per_second": stats["lines"] / seconds,
+    }
+    result.update(kwargs)
+
+    return result
+
+
+if __name__ == "__main__":
+    main()
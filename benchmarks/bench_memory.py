@@ -0,0 +1,85 @@
+"""
+Benchmark for the memory used by parsed AutoSaltSLS objects
+
+Parses a synthetic tree of sls files and reports the memory still allocated for the AutoSaltSLS and AutoSaltSLSEntry
+objects once parsing has finished, e.g.::
+
+    python -m benchmarks.bench_memory --files 8000 --lines 70
+"""
+import argparse
+import gc
+import os
+import tempfile
+import tracemalloc
+
+from sphinxcontrib.autosaltsls.objects import AutoSaltSLS
+from sphinxcontrib.autosaltsls.parser import AutoSaltSLSParser
+
+from .bench_parser import BenchmarkSettings, write_corpus
+
+
+def write_tree(root, files, lines):
+    """
+    Write ``files`` synthetic sls files of roughly ``lines`` lines each, spread over a dir per 100 files.
+    """
+    filenames = []
+
+    for index in range(files):
+        dir_name = os.path.join(root, "group{0}".format(index // 100))
+        if not os.path.isdir(dir_name):
+            os.mkdir(dir_name)
+
+        filename = os.path.join(dir_name, "state{0}.sls".format(index))
+        write_corpus(filename, lines, doc_ratio=1.0, include_every=20)
+        filenames.append(filename)
+
+    return filenames
+
+
+def measure(filenames, settings):
+    """
+    Parse all the files and return the memory in bytes still allocated for the objects, the object count and the
+    entry count.
+    """
+    parser = AutoSaltSLSParser(settings)
+
+    gc.collect()
+    tracemalloc.start()
+
+    sls_objects = []
+    for filename in filenames:
+        sls_obj = AutoSaltSLS(
+            os.path.basename(filename),
+            os.path.dirname(filename),
+            settings,
+            parent_name=os.path.basename(os.path.dirname(filename)),
+        )
+        sls_obj.parse_file(parser)
+        sls_objects.append(sls_obj)
+
+    gc.collect()
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return current, len(sls_objects), sum(len(x.entries) for x in sls_objects)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=8000)
+    parser.add_argument("--lines", type=int, default=70)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filenames = write_tree(temp_dir, args.files, args.lines)
+        current, object_count, entry_count = measure(filenames, BenchmarkSettings())
+
+    print(
+        "{0} sls objects, {1} entries: {2:.1f} MB retained, {3:.0f} bytes per entry".format(
+            object_count, entry_count, current / 2 ** 20, current / entry_count
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
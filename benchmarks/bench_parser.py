@@ -0,0 +1,193 @@
+"""
+Benchmark for parsing sls files with AutoSaltSLSParser
+
+Times the parsing of the bundled ``example/states`` files, a synthetic corpus with a documentation block for every
+few states and a large synthetic file with very little documentation. The peak memory allocated while parsing each
+synthetic file is also reported, e.g.::
+
+    python -m benchmarks.bench_parser --lines 100000 --large-lines 500000 --repeat 5
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from sphinxcontrib.autosaltsls.objects import AutoSaltSLS
+from sphinxcontrib.autosaltsls.parser import AutoSaltSLSParser
+
+EXAMPLE_STATES = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..", "example", "states")
+)
+
+DOC_BLOCK = """###
+# Block {0} summary line
+#
+# Some more detailed text for block {0}
+# spread over a couple of lines
+"""
+
+ID_BLOCK = """### summary_id
+# Block {0} with its state id as the summary
+state_{0}_configured:
+"""
+
+INCLUDE_BLOCK = """### include
+# Included states
+include:
+  - .sub_{0}
+  - other.state_{0}
+  - third.state_{0}
+"""
+
+CODE_BLOCK = """state_{0}_managed:
+  file.managed:
+    - name: /etc/app/{0}.conf
+    - source: salt://app/files/{0}.conf
+    - user: root
+    - group: root
+    - mode: '0644'
+    - template: jinja
+"""
+
+
+class BenchmarkSettings(object):
+    """
+    Stand-in for AutoSaltSLSMapperSettings with the default parse config values
+    """
+
+    def __init__(self, indented_comments=False):
+        self.doc_prefix = "###"
+        self.comment_prefix = "#"
+        self.comment_ignore_prefix = "#!"
+        self.indented_comments = indented_comments
+        self.remove_first_space = True
+        self.prefix = None
+
+
+def write_corpus(filename, lines, doc_ratio=0.2, include_every=20):
+    """
+    Write a synthetic sls file of roughly the requested number of lines. ``doc_ratio`` of the states have a doc
+    block and an include block is added every ``include_every`` states.
+    """
+    written = 0
+    block = 0
+
+    with open(filename, "w") as outfile:
+        outfile.write("#!jinja|yaml\n")
+
+        while written < lines:
+            if block % include_every == 0:
+                text = INCLUDE_BLOCK.format(block)
+            elif doc_ratio and (block * doc_ratio) % 1 < doc_ratio:
+                text = (ID_BLOCK if block % 2 else DOC_BLOCK).format(block)
+            else:
+                text = ""
+
+            text += CODE_BLOCK.format(block)
+            outfile.write(text)
+
+            written += text.count("\n")
+            block += 1
+
+    return written
+
+
+def time_parse(filenames, settings, repeat):
+    """
+    Return the best time in seconds of ``repeat`` runs parsing all the files.
+    """
+    best = None
+    parser = AutoSaltSLSParser(settings)
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+
+        for filename in filenames:
+            sls_obj = AutoSaltSLS(
+                os.path.basename(filename), os.path.dirname(filename), settings
+            )
+            sls_obj.parse_file(parser)
+
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def peak_memory(filename, settings):
+    """
+    Return the peak memory in bytes allocated while parsing a file.
+    """
+    parser = AutoSaltSLSParser(settings)
+    sls_obj = AutoSaltSLS(
+        os.path.basename(filename), os.path.dirname(filename), settings
+    )
+
+    tracemalloc.start()
+    sls_obj.parse_file(parser)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--large-lines", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--indented", action="store_true")
+    args = parser.parse_args(argv)
+
+    settings = BenchmarkSettings(indented_comments=args.indented)
+
+    example_files = []
+    for dir_path, dir_names, filenames in os.walk(EXAMPLE_STATES):
+        example_files.extend(
+            os.path.join(dir_path, x) for x in filenames if x.endswith(".sls")
+        )
+    example_files.sort()
+
+    example_lines = 0
+    for filename in example_files:
+        with open(filename) as infile:
+            example_lines += sum(1 for _ in infile)
+
+    # The example files are tiny so parse them many times to get a stable number
+    example_time = time_parse(example_files * 200, settings, args.repeat)
+    print(
+        "example/states: {0} files x 200, {1:.4f}s, {2:,.0f} lines/s".format(
+            len(example_files), example_time, example_lines * 200 / example_time
+        )
+    )
+
+    corpora = [
+        ("synthetic corpus", args.lines, {}),
+        (
+            "large sparse file",
+            args.large_lines,
+            {"doc_ratio": 0.01, "include_every": 1000},
+        ),
+    ]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for label, lines, kwargs in corpora:
+            corpus = os.path.join(temp_dir, "corpus.sls")
+            lines = write_corpus(corpus, lines, **kwargs)
+            corpus_time = time_parse([corpus], settings, args.repeat)
+
+            print(
+                "{0}: {1} lines ({2:.1f} MB), {3:.4f}s, {4:,.0f} lines/s, {5:.1f} MB peak".format(
+                    label,
+                    lines,
+                    os.path.getsize(corpus) / 2 ** 20,
+                    corpus_time,
+                    lines / corpus_time,
+                    peak_memory(corpus, settings) / 2 ** 20,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Synthetic Salt tree generator
+
+Writes a tree of sls files with a configurable shape for benchmarking, e.g.::
+
+    python -m benchmarks.generator /tmp/salt --states 5000 --depth 3 --doc-density 0.5
+"""
+import argparse
+import json
+import os
+import random
+
+SLS_HEADER = """#!jinja|yaml
+###
+# {name} state
+#
+# Generated state for benchmarking with {blocks} state blocks
+"""
+
+INCLUDE_BLOCK = """### include
+# Included states
+include:
+{items}
+"""
+
+DOC_BLOCKS = [
+    """###
+# Manage {id}
+#
+# Makes sure the {id} config is in place
+# and owned by the right user
+""",
+    """### summary_id
+# Manage {id} using the id as the summary
+""",
+    """### step
+# Deploy {id}
+#
+# Part of the numbered steps for this state
+""",
+    """### step_id
+# Deploy {id} as a numbered step with the id as the summary
+""",
+]
+
+STATE_BLOCK = """{id}:
+  file.managed:
+    - name: /etc/{name}/{index}.conf
+    - source: salt://{path}/files/{index}.conf
+    - user: root
+    - group: root
+    - mode: '0644'
+    - template: jinja
+"""
+
+TOP_HEADER = """### topfile
+# Top file {index}
+#
+# Generated top file with {targets} targets
+### environment
+# Base environment
+base:
+"""
+
+TOP_TARGET = """  ### topfile_id
+  # Minions with role {index}
+  'role:r{index}':
+    - match: grain
+{items}
+"""
+
+
+def generate_tree(
+    root,
+    states=1000,
+    depth=3,
+    branching=6,
+    init_ratio=0.2,
+    blocks=6,
+    doc_density=0.5,
+    include_fanout=3,
+    top_files=1,
+    top_targets=100,
+    seed=0,
+):
+    """
+    Write a synthetic Salt tree of sls files.
+
+    root
+        Dir to write the tree into, created if needed
+
+    states : 1000
+        Number of sls files to generate (not counting top files)
+
+    depth : 3
+        Maximum dir depth below the root
+
+    branching : 6
+        Number of sub dirs to choose from at each level
+
+    init_ratio : 0.2
+        Fraction of dirs that get an ``init.sls`` file
+
+    blocks : 6
+        Number of state blocks in each sls file
+
+    doc_density : 0.5
+        Fraction of state blocks with a doc comment block
+
+    include_fanout : 3
+        Number of other states included by each sls file
+
+    top_files : 1
+        Number of top files, the first is ``top.sls`` in the root and the others use the ``topfile`` directive
+
+    top_targets : 100
+        Number of ``topfile_id`` targets in each top file
+
+    seed : 0
+        Random seed so the same tree is generated every time
+
+    :return: dict
+        Counts of the files, lines and bytes written
+    """
+    rand = random.Random(seed)
+
+    # Work out the rel path of every sls file first so includes can refer to them
+    dirs = set()
+    paths = []
+
+    for index in range(states):
+        parts = [
+            "d{0}_{1}".format(level, rand.randrange(branching))
+            for level in range(rand.randint(0, depth))
+        ]
+        dir_path = "/".join(parts)
+
+        if dir_path and dir_path not in dirs:
+            dirs.add(dir_path)
+
+            if rand.random() < init_ratio:
+                paths.append(dir_path + "/init.sls")
+                continue
+
+        paths.append(
+            "{0}/s{1}.sls".format(dir_path, index)
+            if dir_path
+            else "s{0}.sls".format(index)
+        )
+
+    names = [_sls_name(x) for x in paths]
+
+    stats = {"files": 0, "lines": 0, "bytes": 0}
+
+    for index, (path, name) in enumerate(zip(paths, names)):
+        text = SLS_HEADER.format(name=name, blocks=blocks)
+
+        if include_fanout:
+            text += INCLUDE_BLOCK.format(
+                items="\n".join(
+                    "  - {0}".format(x)
+                    for x in rand.sample(names, min(include_fanout, len(names)))
+                )
+            )
+
+        for block in range(blocks):
+            state_id = "{0}_{1}".format(name.replace(".", "_"), block)
+
+            if rand.random() < doc_density:
+                text += rand.choice(DOC_BLOCKS).format(id=state_id)
+
+            text += STATE_BLOCK.format(
+                id=state_id,
+                name=name,
+                index=block,
+                path=path.rsplit("/", 1)[0] if "/" in path else "",
+            )
+
+        _write_file(root, path, text, stats)
+
+    for index in range(top_files):
+        text = TOP_HEADER.format(index=index, targets=top_targets)
+
+        for target in range(top_targets):
+            text += TOP_TARGET.format(
+                index=target,
+                items="\n".join(
+                    "    - {0}".format(x)
+                    for x in rand.sample(names, min(3, len(names)))
+                ),
+            )
+
+        _write_file(
+            root,
+            "top.sls" if index == 0 else "tops/top{0}.sls".format(index),
+            text,
+            stats,
+        )
+
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("root")
+    add_tree_arguments(parser)
+    args = parser.parse_args(argv)
+
+    print(json.dumps(generate_tree(args.root, **tree_settings(args)), indent=2))
+
+
+def add_tree_arguments(parser):
+    """
+    Add the ``generate_tree`` settings as command line arguments.
+
+    parser
+        argparse.ArgumentParser instance
+    """
+    parser.add_argument("--states", type=int, default=1000)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--branching", type=int, default=6)
+    parser.add_argument("--init-ratio", type=float, default=0.2)
+    parser.add_argument("--blocks", type=int, default=6)
+    parser.add_argument("--doc-density", type=float, default=0.5)
+    parser.add_argument("--include-fanout", type=int, default=3)
+    parser.add_argument("--top-files", type=int, default=1)
+    parser.add_argument("--top-targets", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def tree_settings(args):
+    """
+    Return the ``generate_tree`` keyword arguments from parsed command line arguments.
+
+    args
+        argparse.Namespace instance
+
+    :return: dict
+    """
+    return {
+        "states": args.states,
+        "depth": args.depth,
+        "branching": args.branching,
+        "init_ratio": args.init_ratio,
+        "blocks": args.blocks,
+        "doc_density": args.doc_density,
+        "include_fanout": args.include_fanout,
+        "top_files": args.top_files,
+        "top_targets": args.top_targets,
+        "seed": args.seed,
+    }
+
+
+#
+# Private functions
+#
+def _sls_name(path):
+    """
+    Return the dotted sls name for a rel path.
+    """
+    name = path[: -len(".sls")]
+    if name.endswith("/init"):
+        name = name[: -len("/init")]
+
+    return name.replace("/", ".")
+
+
+def _write_file(root, path, text, stats):
+    """
+    Write an sls file and add it to the stats.
+    """
+    filename = os.path.join(root, *path.split("/"))
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+    with open(filename, "w") as outfile:
+        outfile.write(text)
+
+    stats["files"] += 1
+    stats["lines"] += text.count("\n")
+    stats["bytes"] += len(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,43 @@
+import importlib.util
 import os
 from setuptools import setup
+from setuptools.command.build_py import build_py
 
 with open(os.path.join(os.path.dirname(__file__), 'README.rst')) as readme:
     README = readme.read()
 
+
+class BuildPyCommand(build_py):
+    """
+    Build the package with the built-in Jinja templates precompiled into it
+    """
+
+    def run(self):
+        build_py.run(self)
+
+        if self.dry_run:
+            return
+
+        # Load the rendering module on its own as the package needs Sphinx to import
+        spec = importlib.util.spec_from_file_location(
+            'autosaltsls_rendering',
+            os.path.join(os.path.dirname(__file__), 'sphinxcontrib', 'autosaltsls', 'rendering.py'),
+        )
+
+        try:
+            rendering = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(rendering)
+        except ImportError as e:
+            self.warn('Not precompiling templates: {0}'.format(e))
+            return
+
+        rendering.compile_templates(
+            os.path.join(self.build_lib, 'sphinxcontrib', 'autosaltsls', '_compiled_templates')
+        )
+
 setup(
     name='sphinxcontrib-autosaltsls',
+    cmdclass={'build_py': BuildPyCommand},
     version='0.7.1',
     packages=['sphinxcontrib.autosaltsls'],
     include_package_data=True,
@@ -27,4 +59,9 @@ setup(
         'Jinja2',
         'sphinx>=2.0.0'
     ],
+    entry_points={
+        'console_scripts': [
+            'autosaltsls = sphinxcontrib.autosaltsls.cli:main',
+        ],
+    },
 )
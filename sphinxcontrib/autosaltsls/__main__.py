@@ -0,0 +1,8 @@
+"""
+Run the AutoSaltSLS command line interface with ``python -m sphinxcontrib.autosaltsls``
+"""
+import sys
+
+from .cli import main
+
+sys.exit(main())
@@ -0,0 +1,746 @@
+"""
+AutoSaltSLS rst file generation
+
+Runs the mappers for all the sources to generate their rst files. This is used by the Sphinx extension when the builder
+is initialised and by the command line interface, so it does not import the directive or domain modules.
+"""
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from sphinx.errors import ExtensionError
+from sphinx.util import logging
+
+# noinspection PyUnresolvedReferences
+from sphinx.util.console import darkgreen, bold
+
+from .cache import AutoSaltSLSParseCache
+from .graph import AutoSaltSLSIncludeGraph
+from .mapper import AutoSaltSLSMapper, render_pool, start_pool
+from .metrics import AutoSaltSLSMetrics, AutoSaltSLSTraceFile
+from .registry import AutoSaltSLSRegistry
+from .rendering import TEMPLATE_DIR, get_jinja_env
+from .toctree import SHARD_MODES
+from .utils import write_file_if_changed
+
+SETTINGS_STRING = [
+    "build_dir",
+    "cross_ref_role",
+    "prefix",
+    "template_path",
+    "title",
+    "title_prefix",
+    "title_suffix",
+    "url_root",
+]
+
+# Config values with their defaults and what Sphinx rebuilds when they change, also used by the command line interface
+CONFIG_VALUES = [
+    ("autosaltsls_build_root", ".", "env"),
+    ("autosaltsls_display_master_indices", True, "html"),
+    ("autosaltsls_doc_prefix", "###", "html"),
+    ("autosaltsls_comment_ignore_prefix", "#!", "html"),
+    ("autosaltsls_comment_prefix", "#", "html"),
+    ("autosaltsls_indented_comments", False, "html"),
+    ("autosaltsls_include_json", False, ""),
+    ("autosaltsls_incremental_scan", True, ""),
+    ("autosaltsls_index_template_path", "", "env"),
+    ("autosaltsls_metrics_file", None, ""),
+    ("autosaltsls_metrics_slowest", 10, ""),
+    ("autosaltsls_nested_toctrees", False, "env"),
+    ("autosaltsls_openmetrics_file", None, ""),
+    ("autosaltsls_parallel_jobs", 0, ""),
+    ("autosaltsls_parse_cache", True, ""),
+    ("autosaltsls_parse_cache_dir", None, ""),
+    ("autosaltsls_parse_cache_size", 256 * 1024 * 1024, ""),
+    ("autosaltsls_remove_first_space", True, "html"),
+    ("autosaltsls_render_nodes", False, "env"),
+    ("autosaltsls_sources", None, "env"),
+    ("autosaltsls_sources_root", "..", "env"),
+    ("autosaltsls_source_url_root", None, "html"),
+    ("autosaltsls_split_top_files", False, "env"),
+    ("autosaltsls_strict_includes", False, ""),
+    ("autosaltsls_toctree_shard", None, "env"),
+    ("autosaltsls_toctree_shard_size", 100, "env"),
+    ("autosaltsls_top_chunk_size", 500, "env"),
+    ("autosaltsls_trace_file", None, ""),
+    ("autosaltsls_write_index_page", False, "env"),
+]
+
+logger = logging.getLogger(__name__)
+
+
+def run_autosaltsls(app, dry_run=False, changed_only=False):
+    """
+    Load AutoSaltSLS data from the filesystem
+
+    app
+        Sphinx app instance, or the minimal app used by the command line interface
+
+    dry_run : False
+        Work out which rst files would be written without writing or removing anything
+
+    changed_only : False
+        Only render the rst files affected by the sls files changed since the previous scan
+    """
+    logger.debug("[AutoSaltSLS] Starting")
+
+    start = time.perf_counter()
+
+    if not app.config.autosaltsls_sources:
+        raise ExtensionError("No autosaltsls_sources setting found in config")
+
+    sources = {}
+
+    # Convert str or list into dict
+    if isinstance(app.config.autosaltsls_sources, dict):
+        sources = app.config.autosaltsls_sources
+    elif isinstance(app.config.autosaltsls_sources, list):
+        for source in app.config.autosaltsls_sources:
+            sources[source] = {}
+
+    # Check the config options
+    for source, settings in sources.items():
+        if not isinstance(settings, dict):
+            raise ExtensionError(
+                "Settings for '{0}' in autosaltsls_sources must be a dict".format(
+                    source,
+                )
+            )
+
+        if "exclude" in settings and not isinstance(settings["exclude"], list):
+            raise ExtensionError(
+                "Entry 'exclude' for '{0}' in autosaltsls_sources setting must be a list".format(
+                    source,
+                )
+            )
+
+        for pattern in settings.get("exclude", []):
+            if not isinstance(pattern, (str, re.Pattern)):
+                raise ExtensionError(
+                    "Entries in 'exclude' for '{0}' in autosaltsls_sources setting must be strings or compiled "
+                    "regular expressions".format(source,)
+                )
+
+        if "expand_title_name" in settings and not isinstance(
+            settings["expand_title_name"], bool
+        ):
+            raise ExtensionError(
+                "Entry 'expand_title_name' for '{0}' in autosaltsls_sources setting must be a bool".format(
+                    source,
+                )
+            )
+
+        # Check the str type settings
+        for key in SETTINGS_STRING:
+            if key in settings and not isinstance(settings[key], str):
+                raise ExtensionError(
+                    "Entry '{0}' for '{1}' in autosaltsls_sources setting must be a string".format(
+                        key, source,
+                    )
+                )
+
+    # Check some other values
+    if not isinstance(app.config.autosaltsls_write_index_page, bool):
+        raise ExtensionError(
+            "Config value 'autosaltsls_write_index_page' must be True or False only"
+        )
+
+    if not isinstance(app.config.autosaltsls_index_template_path, str):
+        raise ExtensionError(
+            "Config value 'autosaltsls_index_template_path' must be a string"
+        )
+
+    if not isinstance(app.config.autosaltsls_parallel_jobs, int) or isinstance(
+        app.config.autosaltsls_parallel_jobs, bool
+    ):
+        raise ExtensionError("Config value 'autosaltsls_parallel_jobs' must be an int")
+
+    for key in [
+        "autosaltsls_metrics_file",
+        "autosaltsls_openmetrics_file",
+        "autosaltsls_parse_cache_dir",
+        "autosaltsls_trace_file",
+    ]:
+        if app.config[key] is not None and not isinstance(app.config[key], str):
+            raise ExtensionError("Config value '{0}' must be a string".format(key))
+
+    if not isinstance(app.config.autosaltsls_include_json, bool):
+        raise ExtensionError(
+            "Config value 'autosaltsls_include_json' must be True or False only"
+        )
+
+    if not isinstance(app.config.autosaltsls_render_nodes, bool):
+        raise ExtensionError(
+            "Config value 'autosaltsls_render_nodes' must be True or False only"
+        )
+
+    if not isinstance(app.config.autosaltsls_nested_toctrees, bool):
+        raise ExtensionError(
+            "Config value 'autosaltsls_nested_toctrees' must be True or False only"
+        )
+
+    if app.config.autosaltsls_toctree_shard not in (None,) + SHARD_MODES:
+        raise ExtensionError(
+            "Config value 'autosaltsls_toctree_shard' must be one of: None, {0}".format(
+                ", ".join("'{0}'".format(x) for x in SHARD_MODES)
+            )
+        )
+
+    if not isinstance(app.config.autosaltsls_toctree_shard_size, int) or isinstance(
+        app.config.autosaltsls_toctree_shard_size, bool
+    ):
+        raise ExtensionError(
+            "Config value 'autosaltsls_toctree_shard_size' must be an int"
+        )
+
+    if not isinstance(app.config.autosaltsls_split_top_files, bool):
+        raise ExtensionError(
+            "Config value 'autosaltsls_split_top_files' must be True or False only"
+        )
+
+    if not isinstance(app.config.autosaltsls_top_chunk_size, int) or isinstance(
+        app.config.autosaltsls_top_chunk_size, bool
+    ):
+        raise ExtensionError("Config value 'autosaltsls_top_chunk_size' must be an int")
+
+    if not isinstance(app.config.autosaltsls_strict_includes, bool):
+        raise ExtensionError(
+            "Config value 'autosaltsls_strict_includes' must be True or False only"
+        )
+
+    if not isinstance(app.config.autosaltsls_metrics_slowest, int) or isinstance(
+        app.config.autosaltsls_metrics_slowest, bool
+    ):
+        raise ExtensionError(
+            "Config value 'autosaltsls_metrics_slowest' must be an int"
+        )
+
+    if not isinstance(app.config.autosaltsls_parse_cache_size, int) or isinstance(
+        app.config.autosaltsls_parse_cache_size, bool
+    ):
+        raise ExtensionError(
+            "Config value 'autosaltsls_parse_cache_size' must be an int"
+        )
+
+    written_count = 0
+    skipped_count = 0
+
+    # Load the cache of previously parsed sls files
+    parse_cache = None
+    if app.config.autosaltsls_parse_cache:
+        parse_cache = AutoSaltSLSParseCache.from_app(app)
+        parse_cache.load()
+
+    # Collect timings and counters for all the sources
+    metrics = AutoSaltSLSMetrics(slowest=app.config.autosaltsls_metrics_slowest)
+
+    # Open the parse trace file if we have been asked for one
+    trace = None
+    if app.config.autosaltsls_trace_file:
+        trace_file = app.config.autosaltsls_trace_file
+        if not os.path.isabs(trace_file):
+            trace_file = os.path.normpath(os.path.join(app.confdir, trace_file))
+
+        logger.info(
+            bold("[AutoSaltSLS] ") + "Writing parse trace to '{0}'".format(trace_file)
+        )
+        trace = AutoSaltSLSTraceFile(trace_file)
+
+    # Create the mapper objects
+    mappers = [
+        AutoSaltSLSMapper(
+            app,
+            source,
+            settings,
+            parse_cache=parse_cache,
+            metrics=metrics,
+            trace=trace,
+        )
+        for source, settings in sources.items()
+    ]
+
+    for sphinx_mapper in mappers:
+        sphinx_mapper.dry_run = dry_run
+
+    # Registry of the sls names documented by all the sources, to resolve includes against
+    registry = AutoSaltSLSRegistry(app.srcdir)
+
+    jobs = mappers[0].parallel_jobs if mappers else 1
+
+    try:
+        if jobs > 1 and len(mappers) > 1:
+            graph = _process_concurrently(
+                app, mappers, jobs, registry, changed_only=changed_only
+            )
+        else:
+            # Scan the files in each source to build their object lists
+            for sphinx_mapper in mappers:
+                sphinx_mapper.scan()
+
+            # Load the sls file contents into their respective objects
+            for sphinx_mapper in mappers:
+                sphinx_mapper.load()
+
+            graph = _resolve_includes(app, mappers, registry)
+
+            if changed_only:
+                _limit_to_changed(
+                    mappers, graph, getattr(app.env, "autosaltsls_graph", None)
+                )
+
+            # Write the rst files in the correct order
+            for sphinx_mapper in mappers:
+                sphinx_mapper.write()
+    finally:
+        if trace is not None:
+            trace.close()
+
+    written_files = []
+
+    for sphinx_mapper in mappers:
+        written_count += sphinx_mapper.written_count
+        skipped_count += sphinx_mapper.skipped_count
+        written_files.extend(sphinx_mapper.written_files)
+
+    # Keep track of the documents we have generated and what they depend on
+    app.autosaltsls_mappers = mappers
+    app.autosaltsls_registry = registry
+    app.autosaltsls_graph = graph
+    app.autosaltsls_docs = {}
+    app.autosaltsls_changed_names = set()
+
+    for sphinx_mapper in mappers:
+        app.autosaltsls_docs.update(sphinx_mapper.doc_info(app.srcdir))
+
+        changes = sphinx_mapper.changes
+        if changes:
+            app.autosaltsls_changed_names.update(
+                "{0}:{1}{2}".format(
+                    sphinx_mapper.settings.cross_ref_role,
+                    sphinx_mapper.settings.prefix or "",
+                    x,
+                )
+                for x in changes["modified"]
+            )
+
+    if not dry_run:
+        _remove_stale_docs(app)
+
+        if parse_cache is not None:
+            parse_cache.save()
+
+    # Write the master index
+    if app.config.autosaltsls_write_index_page:
+        # Work out the jinja template dirs to use
+        template_paths = [TEMPLATE_DIR]
+
+        index_template_path = app.config.autosaltsls_index_template_path
+        if index_template_path:
+            if not os.path.isabs(index_template_path):
+                index_template_path = os.path.normpath(
+                    os.path.join(app.confdir, index_template_path)
+                )
+
+            template_paths.insert(0, index_template_path)
+
+        # Get the jinja environment to do the work
+        jinja_env = get_jinja_env(
+            template_paths,
+            cache_dir=os.path.join(app.doctreedir, "autosaltsls", "jinja"),
+        )
+
+        output_path = app.config.autosaltsls_build_root
+        if not os.path.isabs(output_path):
+            output_path = os.path.join(app.confdir, output_path,)
+
+        output_file = os.path.join(output_path, "index.rst")
+
+        template_obj = jinja_env.get_template("master.rst_t")
+
+        logger.debug(
+            "[AutoSaltSLS] Rendering master index '{0}' using '{1}'".format(
+                output_file, template_obj.filename,
+            )
+        )
+
+        # Render the template using Jinja
+        if write_file_if_changed(
+            output_file,
+            template_obj.render(
+                project=app.config.project,
+                display_master_indices=app.config.autosaltsls_display_master_indices,
+                roles=sorted({x.settings.cross_ref_role for x in mappers}),
+            ),
+            dry_run=dry_run,
+        ):
+            written_count += 1
+            written_files.append(output_file)
+        else:
+            skipped_count += 1
+
+    app.autosaltsls_written_files = written_files
+
+    logger.info(
+        bold("[AutoSaltSLS] ")
+        + "Build summary: {0} rst files {1}, {2} unchanged files skipped".format(
+            written_count, "would be written" if dry_run else "written", skipped_count,
+        )
+    )
+
+    metrics.build_seconds = time.perf_counter() - start
+    app.autosaltsls_metrics = metrics
+
+    _write_metrics(app, metrics)
+
+
+def save_autosaltsls(app):
+    """
+    Save the state of the sources from ``run_autosaltsls`` or ``update_autosaltsls`` for the next run, once the build
+    using their rst files has succeeded. Until then the next run reports the same changes, so the documents that
+    depend on them are still read again.
+
+    app
+        App instance ``run_autosaltsls`` has been run with
+    """
+    for sphinx_mapper in getattr(app, "autosaltsls_mappers", []):
+        sphinx_mapper.save_manifest()
+
+
+def update_autosaltsls(app, filenames):
+    """
+    Update the rst files generated by ``run_autosaltsls`` after some sls files changed, re-using its mappers. Sources
+    with only modified sls files have just those files parsed again, others are scanned again using their manifests.
+    Only the rst files affected by the changes are rendered.
+
+    app
+        App instance ``run_autosaltsls`` has been run with
+
+    filenames
+        Full paths of the sls files and dirs which have changed
+    """
+    start = time.perf_counter()
+
+    mappers = app.autosaltsls_mappers
+    changed_mappers = []
+
+    for sphinx_mapper in mappers:
+        # Progress output for every sls object would take longer than the update
+        sphinx_mapper.show_progress = False
+
+        source_files = [
+            x
+            for x in filenames
+            if x == sphinx_mapper.full_source
+            or x.startswith(sphinx_mapper.full_source + os.path.sep)
+        ]
+
+        if not source_files:
+            continue
+
+        if not sphinx_mapper.refresh(source_files):
+            sphinx_mapper.scan()
+
+        sphinx_mapper.load()
+        changed_mappers.append(sphinx_mapper)
+
+    if not changed_mappers:
+        return
+
+    registry = AutoSaltSLSRegistry(app.srcdir)
+
+    previous_graph = app.autosaltsls_graph
+    graph = _resolve_includes(app, mappers, registry)
+
+    _limit_to_changed(mappers, graph, previous_graph, changed_mappers=changed_mappers)
+
+    written_count = 0
+    for sphinx_mapper in mappers:
+        # Other sources only need writing if the changes affect their include sections
+        if (
+            sphinx_mapper not in changed_mappers
+            and sphinx_mapper.render_only is not None
+            and not sphinx_mapper.render_only
+        ):
+            continue
+
+        sphinx_mapper.write()
+        written_count += sphinx_mapper.written_count
+
+    app.autosaltsls_registry = registry
+    app.autosaltsls_graph = graph
+
+    logger.info(
+        bold("[AutoSaltSLS] ")
+        + "Updated {0} rst files in {1:.3f} seconds".format(
+            written_count, time.perf_counter() - start,
+        )
+    )
+
+
+def _resolve_includes(app, mappers, registry):
+    """
+    Add the loaded sources to the registry and report any include or top file targets that are not documented by any
+    source, raising an error for them all at once if ``autosaltsls_strict_includes`` is set. The sources are only
+    added once loaded as parsing can mark sls files as hidden. Then build the include graph, report any
+    include cycles and set the ``included_by`` names for each sls object.
+
+    app
+        Sphinx app instance
+
+    mappers
+        List of loaded AutoSaltSLSMapper instances
+
+    registry
+        Empty AutoSaltSLSRegistry instance to add the sources to
+
+    :return: AutoSaltSLSIncludeGraph
+    """
+    for sphinx_mapper in mappers:
+        registry.add_mapper(sphinx_mapper)
+
+    strict = app.config.autosaltsls_strict_includes
+    errors = []
+
+    for sphinx_mapper in mappers:
+        for sls_obj, target, line in registry.dangling_includes(sphinx_mapper):
+            location = sls_obj.full_filename
+            if line is not None:
+                location += ":{0}".format(line)
+
+            message = "sls {0} includes unknown {1} '{2}'".format(
+                sls_obj.prefixed_name, sphinx_mapper.settings.cross_ref_role, target,
+            )
+
+            if strict:
+                errors.append("{0}: {1}".format(location, message))
+            else:
+                logger.warning("[AutoSaltSLS] " + message, location=location)
+
+    if errors:
+        raise ExtensionError(
+            "AutoSaltSLS found {0} unresolved include(s):\n{1}".format(
+                len(errors), "\n".join(errors),
+            )
+        )
+
+    logger.info(
+        bold("[AutoSaltSLS] ")
+        + "Resolved includes against {0} documented sls names".format(len(registry))
+    )
+
+    graph = AutoSaltSLSIncludeGraph()
+    for sphinx_mapper in mappers:
+        graph.add_mapper(sphinx_mapper)
+
+    # Salt allows circular includes but they are worth knowing about
+    for cycle in graph.cycles():
+        logger.info(
+            bold("[AutoSaltSLS] ")
+            + "Include cycle between {0}".format(", ".join(cycle))
+        )
+
+    graph.set_included_by(mappers)
+    graph.set_all_includes(mappers)
+
+    return graph
+
+
+def _limit_to_changed(mappers, graph, previous_graph, changed_mappers=None):
+    """
+    Limit the rst files rendered for each mapper to those of the sls files added, removed or modified since the
+    previous scan, the sls files they include (and so list them as "Included by") before and after the change, and the
+    sls files including them directly or indirectly (and so list them in "All includes"). Everything is rendered if
+    the scan was not incremental or there is no previous include graph.
+
+    mappers
+        List of loaded AutoSaltSLSMapper instances
+
+    graph
+        AutoSaltSLSIncludeGraph instance for the current run
+
+    previous_graph
+        AutoSaltSLSIncludeGraph instance from the previous run, or None
+
+    changed_mappers : None
+        List of the mappers which have been scanned or refreshed since the previous run, defaults to all of them
+    """
+    for sphinx_mapper in mappers:
+        sphinx_mapper.render_only = None
+
+    if previous_graph is None:
+        return
+
+    changed = set()
+
+    for sphinx_mapper in mappers if changed_mappers is None else changed_mappers:
+        changes = sphinx_mapper.changes
+        if changes is None:
+            return
+
+        for change_type in ["added", "removed", "modified"]:
+            changed.update(
+                "{0}:{1}{2}".format(
+                    sphinx_mapper.settings.cross_ref_role,
+                    sphinx_mapper.settings.prefix or "",
+                    x,
+                )
+                for x in changes[change_type]
+            )
+
+    names = set(changed)
+    for include_graph in [previous_graph, graph]:
+        names.update(include_graph.ancestors(changed))
+
+        for node in changed:
+            names.update(include_graph.edges.get(node, ()))
+
+    for sphinx_mapper in mappers:
+        role = sphinx_mapper.settings.cross_ref_role
+
+        sphinx_mapper.render_only = {
+            obj
+            for sls_obj in sphinx_mapper.visible_sls_objects
+            for obj in [sls_obj] + sls_obj.children
+            if "{0}:{1}".format(role, obj.prefixed_name) in names
+        }
+
+    logger.info(
+        bold("[AutoSaltSLS] ")
+        + "Rendering {0} sls files affected by {1} changes".format(
+            sum(len(x.render_only) for x in mappers), len(changed),
+        )
+    )
+
+
+def _remove_stale_docs(app):
+    """
+    Delete the rst files for documents generated by the previous build which are no longer generated (e.g. for deleted
+    states) so Sphinx drops them. Only the rst files the previous build recorded writing under the build root of one
+    of the sources are deleted, never other files for the same document names.
+    """
+    previous_docs = getattr(app.env, "autosaltsls_docs", {})
+    build_roots = tuple(x.build_root + os.path.sep for x in app.autosaltsls_mappers)
+
+    for docname in sorted(set(previous_docs) - set(app.autosaltsls_docs)):
+        filename = previous_docs[docname].get("output")
+
+        if not filename or not filename.startswith(build_roots):
+            continue
+
+        if os.path.isfile(filename):
+            logger.info(
+                bold("[AutoSaltSLS] ")
+                + "Removing stale document '{0}'".format(filename)
+            )
+            os.remove(filename)
+
+
+def _write_metrics(app, metrics):
+    """
+    Write the build metrics to the files set in the config, if any.
+    """
+    for key, write_func in [
+        ("autosaltsls_metrics_file", metrics.write_json),
+        ("autosaltsls_openmetrics_file", metrics.write_openmetrics),
+    ]:
+        filename = app.config[key]
+        if not filename:
+            continue
+
+        if not os.path.isabs(filename):
+            filename = os.path.normpath(os.path.join(app.confdir, filename))
+
+        logger.info(
+            bold("[AutoSaltSLS] ") + "Writing build metrics to '{0}'".format(filename)
+        )
+        write_func(filename)
+
+
+def _process_concurrently(app, mappers, jobs, registry, changed_only=False):
+    """
+    Run the scan, load and write phases for all the sources at once using a thread per source. The worker process
+    pools used for parsing and rendering are shared between the sources and started from the main thread.
+
+    app
+        Sphinx app instance
+
+    mappers
+        List of AutoSaltSLSMapper instances
+
+    jobs
+        Number of worker processes to use
+
+    registry
+        AutoSaltSLSRegistry instance to add the sources to once they are loaded
+
+    changed_only : False
+        Only render the rst files affected by the sls files changed since the previous scan
+
+    :return: AutoSaltSLSIncludeGraph
+    """
+    logger.info(
+        bold("[AutoSaltSLS] ")
+        + "Processing {0} sources concurrently using {1} processes".format(
+            len(mappers), jobs,
+        )
+    )
+
+    for sphinx_mapper in mappers:
+        sphinx_mapper.log_tag = "[AutoSaltSLS:{0}] ".format(sphinx_mapper.source)
+        sphinx_mapper.show_progress = False
+
+    # Scan the files in each source to build their object lists
+    _run_phase(mappers, "scan", lambda x: x.scan())
+
+    # Load the sls file contents into their respective objects
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        start_pool(executor)
+        _run_phase(mappers, "load", lambda x: x.load(executor=executor))
+
+    graph = _resolve_includes(app, mappers, registry)
+
+    if changed_only:
+        _limit_to_changed(mappers, graph, getattr(app.env, "autosaltsls_graph", None))
+
+    # Write the rst files
+    with render_pool(mappers, jobs) as executor:
+        _run_phase(mappers, "write", lambda x: x.write(executor=executor))
+
+    return graph
+
+
+def _run_phase(mappers, phase, func):
+    """
+    Call a function for each mapper in a separate thread, raising a single error for all the sources that failed.
+
+    mappers
+        List of AutoSaltSLSMapper instances
+
+    phase
+        Name of the phase for logging
+
+    func
+        Function to call with each mapper
+    """
+    errors = []
+
+    with ThreadPoolExecutor(max_workers=len(mappers)) as executor:
+        futures = [(x, executor.submit(func, x)) for x in mappers]
+
+        for sphinx_mapper, future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                logger.warning(
+                    "{0}{1} failed: {2}".format(sphinx_mapper.log_tag, phase, e)
+                )
+                errors.append("{0}: {1}".format(sphinx_mapper.source, e))
+
+    if errors:
+        raise ExtensionError(
+            "AutoSaltSLS {0} failed for {1} source(s):\n{2}".format(
+                phase, len(errors), "\n".join(errors),
+            )
+        )
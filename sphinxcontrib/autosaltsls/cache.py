@@ -0,0 +1,490 @@
+"""
+AutoSaltSLS persistent parse cache
+"""
+import hashlib
+import os
+import pickle
+import threading
+import time
+from contextlib import contextmanager
+
+from sphinx.util import logging
+
+# noinspection PyUnresolvedReferences
+from sphinx.util.console import darkgreen, bold
+
+from .utils import write_file_atomic
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # No locking on platforms without fcntl (e.g. Windows), writes are still atomic
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Bump this whenever the parse result format or the parsing rules change
+CACHE_VERSION = 3
+
+# Config values that change the output of AutoSaltSLS.parse_file
+PARSE_CONFIG_VALUES = [
+    "autosaltsls_comment_ignore_prefix",
+    "autosaltsls_comment_prefix",
+    "autosaltsls_doc_prefix",
+    "autosaltsls_indented_comments",
+    "autosaltsls_remove_first_space",
+]
+
+# Name of the lock file in the store dir
+LOCK_FILENAME = ".lock"
+
+# Name of the file in the store dir holding the total size of the results, so it is known without scanning the store
+SIZE_FILENAME = ".size"
+
+# Eviction frees space down to this fraction of the largest size, so the next few builds can add results without
+# needing to scan the store again
+EVICT_RATIO = 0.9
+
+# Temp files older than this (in seconds) are left over from a build that failed and are removed by eviction
+STALE_TEMP_AGE = 3600
+
+
+class AutoSaltSLSParseCache(object):
+    """
+    Cache of the results of ``AutoSaltSLS.parse_file`` so sls files do not need to be parsed again.
+
+    Results are kept in a content-addressed store, one file per result keyed by the hash of the sls file content and
+    the parse config, so a file is only parsed once however many paths, sources or checkouts of the same tree contain
+    it. The store can be shared by several projects and by concurrent builds on the same host: results are written
+    atomically and eviction of the least recently used results holds an exclusive lock on the store.
+
+    The total size of the results is kept in the store and added to by each build that writes results, so the store is
+    only scanned when it has grown too big rather than on every build.
+
+    An index of the mtime, size and content hash of each sls file is kept for the project, so the hash of an
+    unchanged file is known without reading it.
+
+    filename
+        Full path to the index file
+
+    config_key
+        Tuple of the config values used when parsing, which is part of the key for each result
+
+    store_dir : None
+        Dir of the content-addressed store, defaults to ``parse_cache`` in the same dir as the index file
+
+    max_size : 0
+        Largest total size in bytes of the results in the store, the least recently used results are evicted by
+        ``save`` when it is bigger. The size is not limited if 0
+    """
+
+    def __init__(self, filename, config_key, store_dir=None, max_size=0):
+        self.filename = filename
+        self.config_key = config_key
+        self.store_dir = store_dir or os.path.join(
+            os.path.dirname(filename), "parse_cache"
+        )
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        self._index = {}
+        self._seen = set()
+        self._keys = {}
+        self._touched = set()
+        self._written_size = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_app(cls, app):
+        """
+        Create a cache instance with its index under the Sphinx doctree dir using the parse config and the parse cache
+        settings from the app.
+
+        app
+            Sphinx app instance
+
+        :return: AutoSaltSLSParseCache
+        """
+        config_key = tuple(getattr(app.config, x) for x in PARSE_CONFIG_VALUES)
+
+        store_dir = app.config.autosaltsls_parse_cache_dir
+        if store_dir and not os.path.isabs(store_dir):
+            store_dir = os.path.normpath(os.path.join(app.confdir, store_dir))
+
+        return cls(
+            os.path.join(app.doctreedir, "autosaltsls", "parse_cache.pickle"),
+            config_key,
+            store_dir=store_dir,
+            max_size=app.config.autosaltsls_parse_cache_size,
+        )
+
+    def content_key(self, sls_obj):
+        """
+        Return the key of the result for an sls object in the store, as worked out by the last ``get`` for it. Objects
+        with the same key have identical files so can share a parse result.
+
+        sls_obj
+            AutoSaltSLS instance
+
+        :return: str (None if the file could not be read)
+        """
+        with self._lock:
+            return self._keys.get(sls_obj.full_filename)
+
+    def get(self, sls_obj):
+        """
+        Return the cached parse result for an sls object or None if there is no result for its current content.
+
+        sls_obj
+            AutoSaltSLS instance
+
+        :return: dict
+        """
+        key = self._content_key(sls_obj)
+
+        result = None
+        if key is not None:
+            result = self._read(key)
+
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return result
+
+    def keep(self, sls_obj):
+        """
+        Mark the index entry for an sls object as still in use without looking it up, so it is not dropped by
+        ``save``.
+
+        sls_obj
+            AutoSaltSLS instance
+        """
+        with self._lock:
+            self._seen.add(sls_obj.full_filename)
+
+    def load(self):
+        """
+        Read the index file from disk, discarding its contents if it was created by a different version.
+        """
+        self._index = {}
+
+        if not os.path.isfile(self.filename):
+            return
+
+        try:
+            with open(self.filename, "rb") as infile:
+                data = pickle.load(infile)
+        except Exception as e:
+            logger.warning(
+                "[AutoSaltSLS] Ignoring unreadable parse cache '{0}': {1}".format(
+                    self.filename, e
+                )
+            )
+            return
+
+        if data.get("version") != CACHE_VERSION:
+            logger.info(
+                bold("[AutoSaltSLS] ")
+                + "Parse cache is from a different version, ignoring it"
+            )
+            self._dirty = True
+            return
+
+        self._index = data.get("entries", {})
+
+        logger.debug(
+            "[AutoSaltSLS] Loaded {0} parse cache index entries from '{1}'".format(
+                len(self._index), self.filename,
+            )
+        )
+
+    def put(self, sls_obj, result):
+        """
+        Store the parse result for an sls object, unless the store already has it for the same content.
+
+        sls_obj
+            AutoSaltSLS instance
+
+        result
+            dict as returned by ``AutoSaltSLS.get_parse_result``
+        """
+        with self._lock:
+            key = self._keys.get(sls_obj.full_filename)
+
+        if key is None:
+            key = self._content_key(sls_obj)
+            if key is None:
+                return
+
+        result_file = self._result_file(key)
+        if os.path.isfile(result_file):
+            return
+
+        data = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+        write_file_atomic(result_file, data)
+
+        with self._lock:
+            self._written_size += len(data)
+
+    def save(self):
+        """
+        Write the index to disk, dropping any entries for files that were not looked at during this build. If any
+        results were written, add their size to the total for the store and evict the least recently used results if
+        it is now too big.
+        """
+        logger.info(
+            bold("[AutoSaltSLS] ")
+            + "Parse cache: {0} hits, {1} misses".format(self.hits, self.misses)
+        )
+
+        stale_keys = set(self._index) - self._seen
+        for key in stale_keys:
+            del self._index[key]
+
+        if self._dirty or stale_keys:
+            with _locked(self.filename + ".lock"):
+                write_file_atomic(
+                    self.filename,
+                    pickle.dumps(
+                        {"version": CACHE_VERSION, "entries": self._index},
+                        pickle.HIGHEST_PROTOCOL,
+                    ),
+                )
+
+            self._dirty = False
+
+        if self._written_size:
+            self._add_store_size(self._written_size)
+            self._written_size = 0
+
+    def evict(self, max_size):
+        """
+        Delete the least recently used results from the store until their total size is no more than ``max_size``,
+        along with any temp files left over by failed builds. Other builds using the store wait for this to finish
+        before evicting results themselves.
+
+        max_size
+            Largest total size in bytes of the results to keep
+
+        :return: int (count of results deleted)
+        """
+        if not os.path.isdir(self.store_dir):
+            return 0
+
+        with _locked(os.path.join(self.store_dir, LOCK_FILENAME)):
+            return self._evict(max_size)
+
+    #
+    # Private functions
+    #
+    def _add_store_size(self, size):
+        """
+        Add to the total size of the results kept in the store, evicting results if it is now more than ``max_size``.
+        The store is only scanned to evict results or to work out the total if it is not known yet (e.g. for a store
+        created by an older version), and then only if the size is limited.
+        """
+        with _locked(os.path.join(self.store_dir, LOCK_FILENAME)):
+            total_size = _read_store_size(self.store_dir)
+            if total_size is not None:
+                total_size += size
+
+            if self.max_size and (total_size is None or total_size > self.max_size):
+                self._evict(self.max_size, int(self.max_size * EVICT_RATIO))
+            elif total_size is not None:
+                _write_store_size(self.store_dir, total_size)
+
+    def _evict(self, max_size, target_size=None):
+        """
+        Evict results as for ``evict`` if their total size is more than ``max_size``, down to ``target_size`` (which
+        defaults to ``max_size``), and store the new total size. The caller must hold the store lock.
+        """
+        if target_size is None:
+            target_size = max_size
+
+        results = []
+        total_size = 0
+        now = time.time()
+
+        for subdir in os.scandir(self.store_dir):
+            if not subdir.is_dir():
+                continue
+
+            for entry in os.scandir(subdir.path):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+
+                if entry.name.endswith(".pickle"):
+                    results.append((stat.st_mtime, stat.st_size, entry.path))
+                    total_size += stat.st_size
+                elif now - stat.st_mtime > STALE_TEMP_AGE:
+                    _remove(entry.path)
+
+        evicted = 0
+        if total_size > max_size:
+            # Results are touched when used, so the oldest mtime is the least recently used
+            for mtime, size, path in sorted(results):
+                if total_size <= target_size:
+                    break
+
+                if _remove(path):
+                    total_size -= size
+                    evicted += 1
+
+        _write_store_size(self.store_dir, total_size)
+
+        if evicted:
+            logger.info(
+                bold("[AutoSaltSLS] ")
+                + "Evicted {0} results from the parse cache".format(evicted)
+            )
+
+        return evicted
+
+    def _content_key(self, sls_obj):
+        """
+        Work out the key of the result for an sls object from the hash of its file, which is only read if its mtime or
+        size has changed since it was last indexed.
+        """
+        filename = sls_obj.full_filename
+
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            stat = None
+
+        with self._lock:
+            self._seen.add(filename)
+            cached = self._index.get(filename)
+
+        if stat is None:
+            return None
+
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            digest = cached[2]
+        else:
+            digest = _file_digest(filename)
+            if digest is None:
+                return None
+
+        # The name of the file is part of the key as top.sls files are parsed as top files
+        key = hashlib.sha1(
+            "{0}\0{1!r}\0{2}\0{3}".format(
+                CACHE_VERSION,
+                self.config_key,
+                os.path.basename(filename) == "top.sls",
+                digest,
+            ).encode("utf-8")
+        ).hexdigest()
+
+        with self._lock:
+            if (
+                cached is None
+                or cached[2] != digest
+                or cached[:2] != (stat.st_mtime_ns, stat.st_size,)
+            ):
+                self._index[filename] = (stat.st_mtime_ns, stat.st_size, digest)
+                self._dirty = True
+
+            self._keys[filename] = key
+
+        return key
+
+    def _read(self, key):
+        """
+        Return the result for a key from the store, touching the file so eviction sees it has been used.
+        """
+        result_file = self._result_file(key)
+
+        try:
+            with open(result_file, "rb") as infile:
+                result = pickle.load(infile)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(
+                "[AutoSaltSLS] Ignoring unreadable parse cache result '{0}': {1}".format(
+                    result_file, e
+                )
+            )
+            return None
+
+        with self._lock:
+            touch = key not in self._touched
+            self._touched.add(key)
+
+        if touch:
+            try:
+                os.utime(result_file)
+            except OSError:
+                pass
+
+        return result
+
+    def _result_file(self, key):
+        return os.path.join(self.store_dir, key[:2], key + ".pickle")
+
+
+@contextmanager
+def _locked(lock_filename):
+    """
+    Context manager holding an exclusive lock on a lock file, created if needed.
+    """
+    os.makedirs(os.path.dirname(lock_filename), exist_ok=True)
+
+    with open(lock_filename, "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _file_digest(filename):
+    """
+    Return the SHA-1 hex digest of a file's contents.
+    """
+    try:
+        with open(filename, "rb") as infile:
+            return hashlib.sha1(infile.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def _read_store_size(store_dir):
+    """
+    Return the total size of the results in a store, or None if it has not been stored.
+    """
+    try:
+        with open(os.path.join(store_dir, SIZE_FILENAME)) as infile:
+            return int(infile.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _remove(path):
+    """
+    Delete a file, returning whether it was deleted rather than already gone.
+    """
+    try:
+        os.remove(path)
+    except OSError:
+        return False
+
+    return True
+
+
+def _write_store_size(store_dir, size):
+    """
+    Store the total size of the results in a store.
+    """
+    write_file_atomic(os.path.join(store_dir, SIZE_FILENAME), str(size))
@@ -0,0 +1,424 @@
+"""
+AutoSaltSLS command line interface
+
+Generates the rst files for the sources in a Sphinx ``conf.py`` without starting Sphinx, e.g. from a pre-commit hook::
+
+    python -m sphinxcontrib.autosaltsls docs --changed-only
+"""
+import argparse
+import logging
+import os
+import pickle
+import sys
+import types
+
+# Sphinx and the rest of the package are only imported by main() once the arguments have been parsed, so --help and
+# argument errors return straight away
+# The default dir for the command line state, kept apart from the Sphinx doctrees as both track changes since their
+# own previous run
+DEFAULT_DOCTREE_DIR = os.path.join("_build", "autosaltsls-cli")
+
+GRAPH_FILENAME = "graph.pickle"
+
+
+class AutoSaltSLSConfig(dict):
+    """
+    Config values read from ``conf.py``, which can also be read as attributes like ``sphinx.config.Config``.
+    """
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class AutoSaltSLSApp(object):
+    """
+    Minimal stand-in for the Sphinx app, with the attributes ``run_autosaltsls`` and the mappers use.
+
+    srcdir
+        Sphinx source dir
+
+    confdir
+        Dir containing ``conf.py``, relative settings are resolved against it
+
+    doctreedir
+        Dir to keep the scan manifests, parse cache and include graph in between runs
+
+    config
+        AutoSaltSLSConfig instance
+
+    verbosity : 0
+        Verbosity level, debug messages are output above 1 as with Sphinx
+    """
+
+    def __init__(self, srcdir, confdir, doctreedir, config, verbosity=0):
+        self.srcdir = srcdir
+        self.confdir = confdir
+        self.doctreedir = doctreedir
+        self.config = config
+        self.verbosity = verbosity
+        self.parallel = 0
+
+        # Holds the include graph from the previous run, as the Sphinx environment does
+        self.env = types.SimpleNamespace(autosaltsls_graph=None)
+
+    @property
+    def graph_filename(self):
+        """
+        Return the filename the include graph is kept in between runs.
+
+        :return: str
+        """
+        return os.path.join(self.doctreedir, "autosaltsls", GRAPH_FILENAME)
+
+    def load_graph(self):
+        """
+        Load the include graph from the previous run, if there is one.
+        """
+        try:
+            with open(self.graph_filename, "rb") as infile:
+                self.env.autosaltsls_graph = pickle.load(infile)
+        except Exception:
+            self.env.autosaltsls_graph = None
+
+    def save_graph(self):
+        """
+        Write the include graph from this run to disk.
+        """
+        graph_dir = os.path.dirname(self.graph_filename)
+        if not os.path.isdir(graph_dir):
+            os.makedirs(graph_dir, exist_ok=True)
+
+        temp_filename = "{0}.{1}.tmp".format(self.graph_filename, os.getpid())
+
+        with open(temp_filename, "wb") as outfile:
+            pickle.dump(
+                self.autosaltsls_graph, outfile, protocol=pickle.HIGHEST_PROTOCOL
+            )
+
+        os.replace(temp_filename, self.graph_filename)
+
+
+def get_parser():
+    """
+    Return the argument parser for the command line interface.
+
+    :return: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(
+        prog="autosaltsls",
+        description="Generate the AutoSaltSLS rst files for a Sphinx project without running Sphinx.",
+    )
+    parser.add_argument(
+        "srcdir",
+        nargs="?",
+        default=".",
+        help="Sphinx source dir (default: the current dir)",
+    )
+    parser.add_argument(
+        "-c",
+        "--conf-dir",
+        dest="confdir",
+        help="dir containing conf.py (default: the source dir)",
+    )
+    parser.add_argument(
+        "-d",
+        "--doctree-dir",
+        dest="doctreedir",
+        help="dir for the cached state between runs (default: {0} in the source dir)".format(
+            DEFAULT_DOCTREE_DIR
+        ),
+    )
+    parser.add_argument(
+        "-s",
+        "--source",
+        dest="sources",
+        action="append",
+        metavar="SOURCE",
+        help="only generate this source, settings are taken from conf.py if it has them (can be repeated)",
+    )
+    parser.add_argument(
+        "-D",
+        dest="overrides",
+        action="append",
+        default=[],
+        metavar="setting=value",
+        help="override an autosaltsls setting from conf.py",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="number of worker processes to use (sets autosaltsls_parallel_jobs)",
+    )
+    parser.add_argument(
+        "-n",
+        "--dry-run",
+        action="store_true",
+        help="report the rst files that would be written without changing anything",
+    )
+    parser.add_argument(
+        "--changed-only",
+        action="store_true",
+        help="only render the rst files affected by sls files changed since the previous run",
+    )
+    parser.add_argument(
+        "-w",
+        "--watch",
+        action="store_true",
+        help="keep running and update the rst files as sls files change",
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="poll for changes when watching instead of using inotify",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        dest="verbosity",
+        action="count",
+        default=0,
+        help="increase verbosity (can be repeated)",
+    )
+    parser.add_argument(
+        "-q", "--quiet", action="store_true", help="only output warnings and errors"
+    )
+
+    return parser
+
+
+def load_config(confdir, overrides=None, sources=None):
+    """
+    Return the AutoSaltSLS config values, using the defaults for anything not set in ``conf.py``.
+
+    confdir
+        Dir containing ``conf.py``, the defaults are used if there isn't one
+
+    overrides : None
+        List of 'setting=value' strings, converted to the type of the setting's default
+
+    sources : None
+        List of source keys to limit ``autosaltsls_sources`` to
+
+    :return: AutoSaltSLSConfig
+    """
+    from .build import CONFIG_VALUES
+
+    config = AutoSaltSLSConfig(project="Python")
+    defaults = {}
+
+    for name, default, rebuild in CONFIG_VALUES:
+        config[name] = defaults[name] = default
+
+    conf_file = os.path.join(confdir, "conf.py")
+    if os.path.isfile(conf_file):
+        # Only needed for a conf.py, so imported here
+        from sphinx.config import eval_config_file
+        from sphinx.util.tags import Tags
+
+        namespace = eval_config_file(conf_file, Tags())
+
+        for name in config:
+            if name in namespace:
+                config[name] = namespace[name]
+
+    for override in overrides or []:
+        name, sep, value = override.partition("=")
+
+        if not sep or name not in defaults:
+            raise ValueError("Unknown setting override '{0}'".format(override))
+
+        config[name] = _convert_value(name, value, defaults[name])
+
+    if sources:
+        configured = config.autosaltsls_sources
+        if not isinstance(configured, dict):
+            configured = {}
+
+        config["autosaltsls_sources"] = {x: configured.get(x, {}) for x in sources}
+
+    return config
+
+
+def main(argv=None):
+    """
+    Run the command line interface.
+
+    argv : None
+        List of arguments, taken from ``sys.argv`` if not supplied
+
+    :return: int (exit status)
+    """
+    parser = get_parser()
+    args = parser.parse_args(argv)
+
+    if args.watch and args.dry_run:
+        parser.error("--watch can't be used with --dry-run")
+
+    from sphinx.errors import SphinxError
+
+    # noinspection PyUnresolvedReferences
+    from sphinx.util.console import color_terminal, nocolor
+
+    from .build import run_autosaltsls, save_autosaltsls
+
+    srcdir = os.path.abspath(args.srcdir)
+    confdir = os.path.abspath(args.confdir) if args.confdir else srcdir
+    doctreedir = (
+        os.path.abspath(args.doctreedir)
+        if args.doctreedir
+        else os.path.join(srcdir, DEFAULT_DOCTREE_DIR)
+    )
+
+    if not color_terminal():
+        nocolor()
+
+    handler = _LogHandler()
+    handler.setLevel(
+        logging.WARNING
+        if args.quiet
+        else logging.DEBUG
+        if args.verbosity > 1
+        else logging.INFO
+    )
+
+    sphinx_logger = logging.getLogger("sphinx")
+    sphinx_logger.setLevel(logging.DEBUG)
+    sphinx_logger.addHandler(handler)
+
+    try:
+        try:
+            config = load_config(
+                confdir, overrides=args.overrides, sources=args.sources
+            )
+        except ValueError as e:
+            parser.error(str(e))
+
+        if args.jobs is not None:
+            config["autosaltsls_parallel_jobs"] = args.jobs
+
+        app = AutoSaltSLSApp(
+            srcdir, confdir, doctreedir, config, verbosity=args.verbosity
+        )
+
+        if args.changed_only:
+            app.load_graph()
+
+        try:
+            run_autosaltsls(app, dry_run=args.dry_run, changed_only=args.changed_only)
+        except SphinxError as e:
+            sys.stderr.write("{0}: {1}\n".format(e.category, e))
+            return 1
+
+        if args.dry_run:
+            for filename in app.autosaltsls_written_files:
+                sphinx_logger.info(
+                    "Would write '{0}'".format(os.path.relpath(filename, srcdir))
+                )
+        else:
+            save_autosaltsls(app)
+
+            if args.watch:
+                _watch(app, poll=args.poll)
+
+            app.save_graph()
+    finally:
+        sphinx_logger.removeHandler(handler)
+
+    return 0
+
+
+#
+# Private functions
+#
+class _LogHandler(logging.StreamHandler):
+    """
+    Output the Sphinx log messages, with the status to stdout and warnings to stderr as Sphinx does.
+    """
+
+    def __init__(self):
+        super(_LogHandler, self).__init__(sys.stdout)
+
+    def emit(self, record):
+        if record.levelno >= logging.WARNING:
+            self.stream = sys.stderr
+
+            location = getattr(record, "location", None)
+            record.msg = "{0}WARNING: {1}".format(
+                "{0}: ".format(location) if location else "", record.msg
+            )
+        else:
+            self.stream = sys.stdout
+
+        # Progress messages from status_iterator continue on the same line
+        self.terminator = "" if getattr(record, "nonl", False) else "\n"
+
+        super(_LogHandler, self).emit(record)
+
+
+def _watch(app, poll=False):
+    """
+    Update the rst files as the sls files in the sources change, until interrupted.
+    """
+    from sphinx.errors import SphinxError
+
+    from .build import save_autosaltsls, update_autosaltsls
+    from .watcher import get_watcher
+
+    sphinx_logger = logging.getLogger("sphinx")
+    mappers = app.autosaltsls_mappers
+
+    watcher = get_watcher(sorted(set(x.full_source for x in mappers)), poll=poll)
+
+    sphinx_logger.info(
+        "Watching {0} sources for changes, press Ctrl+C to stop".format(len(mappers))
+    )
+
+    try:
+        while True:
+            filenames = watcher.wait()
+
+            if filenames:
+                try:
+                    update_autosaltsls(app, filenames)
+                    save_autosaltsls(app)
+                except SphinxError as e:
+                    sys.stderr.write("{0}: {1}\n".format(e.category, e))
+                except OSError as e:
+                    # Files are often deleted or renamed while being edited, the next change will pick it up
+                    sphinx_logger.warning(
+                        "[AutoSaltSLS] Update failed, waiting for further changes: {0}".format(
+                            e
+                        )
+                    )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+    # The parse cache is only saved once the watching stops as it covers every sls file
+    if mappers and mappers[0].parse_cache is not None:
+        mappers[0].parse_cache.save()
+
+
+def _convert_value(name, value, default):
+    """
+    Convert a setting override from the command line to the type of the setting's default.
+    """
+    if isinstance(default, bool):
+        if value.lower() in ("1", "true", "yes", "on"):
+            return True
+        if value.lower() in ("0", "false", "no", "off"):
+            return False
+        raise ValueError("Setting '{0}' must be true or false".format(name))
+
+    if isinstance(default, int):
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError("Setting '{0}' must be an int".format(name))
+
+    return value
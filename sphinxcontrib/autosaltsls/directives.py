@@ -0,0 +1,394 @@
+"""
+AutoSaltSLS directive
+
+Builds the page for a documented sls file as docutils nodes straight from its parsed AutoSaltSLS object, so only the
+text of its comment blocks goes through the rst parser.
+"""
+from docutils import nodes
+from docutils.parsers.rst import directives, roles
+from docutils.statemachine import StringList
+from sphinx import addnodes
+from sphinx.util import logging
+from sphinx.util.docutils import SphinxDirective
+from sphinx.util.nodes import nested_parse_with_titles, split_explicit_title
+
+logger = logging.getLogger(__name__)
+
+# Entry summaries this long or longer are output as text rather than as section titles, as the built-in templates do
+MAX_TITLE_LENGTH = 80
+
+
+class AutoSaltSLSDirective(SphinxDirective):
+    """
+    Output the page for an sls file documented by one of the sources, with the same layout as the built-in
+    ``sls.rst_t`` and ``top.rst_t`` templates. The sls file is looked up by its full name (including any source prefix)
+    and the cross-reference role of its source, which defaults to ``sls``::
+
+        .. autosaltsls:: apache.installed
+            :role: state
+
+    The stub rst files written when :confval:`autosaltsls_render_nodes` is set hold just this directive.
+    """
+
+    required_arguments = 1
+    option_spec = {"role": directives.unchanged_required}
+
+    def run(self):
+        role = self.options.get("role", "sls")
+        name = self.arguments[0]
+
+        registry = getattr(self.env.app, "autosaltsls_registry", None)
+        resolved = registry.resolve(role, name) if registry is not None else None
+
+        if resolved is None:
+            logger.warning(
+                "[AutoSaltSLS] Unknown {0} '{1}'".format(role, name),
+                location=(self.env.docname, self.lineno),
+            )
+            return []
+
+        sls_obj = resolved[0]
+
+        # Sphinx reads the document again if the sls file changes
+        if sls_obj.full_filename:
+            self.env.note_dependency(sls_obj.full_filename)
+
+        self._source = sls_obj.full_filename or self.env.doc2path(self.env.docname)
+        self._messages = []
+        self._roles = {}
+
+        if sls_obj.topfile:
+            page = self._build_top_page(sls_obj)
+        else:
+            page = self._build_sls_page(sls_obj)
+
+        return [page] + self._messages
+
+    #
+    # Private functions
+    #
+    def _add_entry(self, entry, title_nodes=None):
+        """
+        Add a body entry, starting a section for it if its summary is short enough to be a title. The title is the
+        summary with any inline markup parsed if no title nodes are supplied.
+        """
+        if entry.summary and len(entry.summary) < MAX_TITLE_LENGTH:
+            if title_nodes is None:
+                title_nodes = self._parse_inline(entry.summary)
+
+            self._add_section("~", title_nodes)
+        else:
+            self._parse_text(entry.summary)
+
+        self._parse_text(entry.content)
+
+    def _add_header(self, sls_obj):
+        """
+        Add the summary of the header entry in italics and its content.
+        """
+        header = sls_obj.header
+
+        if header.has_text:
+            self._parse_text("*{0}*\n\n{1}".format(header.summary, header.content))
+
+    def _add_links(self, sls_obj):
+        """
+        Add the ``[Source]`` link and, for sls files in a dir, the link to the ``main`` page of the dir.
+        """
+        links = []
+
+        if sls_obj.source_url:
+            links.append(
+                [nodes.reference("[Source]", "[Source]", refuri=sls_obj.source_url)]
+            )
+
+        if not sls_obj.topfile:
+            if sls_obj.parent_name:
+                links.append(
+                    self._run_role(
+                        "doc", "[{0} (main)] <main>".format(sls_obj.parent_name)
+                    )
+                )
+
+            if sls_obj.initfile and sls_obj.child_count:
+                links.append(self._run_role("doc", "[main] <main>"))
+
+        if links:
+            paragraph = nodes.paragraph()
+            for index, link_nodes in enumerate(links):
+                if index:
+                    paragraph += nodes.Text("\n")
+                paragraph.extend(link_nodes)
+
+            self._sections[-1] += paragraph
+
+    def _add_section(self, style, title_nodes):
+        """
+        Start a section at the level the rst parser would give a title with an underline style, which depends on the
+        order the styles are first used in on the page.
+        """
+        if style not in self._styles:
+            self._styles.append(style)
+
+        level = min(self._styles.index(style) + 1, len(self._sections) + 1)
+
+        section = self._new_section(title_nodes)
+
+        del self._sections[level - 1 :]
+        self._sections[-1] += section
+        self._sections.append(section)
+
+    def _bullet_list(self, items):
+        """
+        Return a list of items (each a list of nodes) indented as in the built-in templates.
+        """
+        bullet_list = nodes.bullet_list(bullet="*")
+
+        for item_nodes in items:
+            bullet_list += nodes.list_item("", nodes.paragraph("", "", *item_nodes))
+
+        return nodes.block_quote("", bullet_list)
+
+    def _build_sls_page(self, sls_obj):
+        """
+        Return the section for the page of a non-top sls file.
+        """
+        role = sls_obj.source_settings.cross_ref_role
+        title = sls_obj.title + (" [init]" if sls_obj.initfile else "")
+
+        page = self._start_page([nodes.literal(title, title)])
+        page.extend(self._run_directive("salt:" + role, sls_obj.prefixed_name))
+
+        if sls_obj.format:
+            text = "File Format: {0}".format(sls_obj.format)
+            page += nodes.paragraph("", "", nodes.strong(text, text))
+
+        if not sls_obj.entries:
+            page += nodes.paragraph("", "", nodes.emphasis("No content", "No content"))
+        else:
+            self._add_header(sls_obj)
+
+            if sls_obj.include:
+                self._add_section("^", [nodes.Text("Includes")])
+                self._parse_text(sls_obj.include.text)
+                self._sections[-1] += self._bullet_list(
+                    [self._xref(role, x) for x in sls_obj.include.includes]
+                )
+
+            steps = sls_obj.steps
+            if steps:
+                self._add_section("^", [nodes.Text("Steps")])
+                self._sections[-1] += self._step_list(steps)
+
+            for entry in sls_obj.body:
+                if not entry.is_step and not entry.include and entry.has_text:
+                    self._add_entry(entry)
+
+        if sls_obj.all_includes and sls_obj.all_includes[-1][1] > 1:
+            self._add_section("^", [nodes.Text("All includes")])
+            self._sections[-1] += self._bullet_list(
+                [
+                    self._xref(role, name) + [nodes.Text(" (depth {0})".format(depth))]
+                    for name, depth in sls_obj.all_includes
+                ]
+            )
+
+        if sls_obj.included_by:
+            self._add_section("^", [nodes.Text("Included by")])
+            self._sections[-1] += self._bullet_list(
+                [self._xref(role, x) for x in sls_obj.included_by]
+            )
+
+        self._add_links(sls_obj)
+
+        return page
+
+    def _build_top_page(self, sls_obj):
+        """
+        Return the section for the page of a top file.
+        """
+        role = sls_obj.source_settings.cross_ref_role
+
+        page = self._start_page([nodes.literal(sls_obj.title, sls_obj.title)])
+        page.extend(self._run_directive("salt:" + role, sls_obj.prefixed_name))
+
+        if not sls_obj.entries:
+            page += nodes.paragraph("", "", nodes.emphasis("No content", "No content"))
+        else:
+            self._add_header(sls_obj)
+
+            for entry in sls_obj.body:
+                if entry.has_text:
+                    if entry.environment:
+                        self._add_section(
+                            "=", self._parse_inline("Environment: " + entry.summary),
+                        )
+                        self._parse_text(entry.content)
+                    else:
+                        title_nodes = [nodes.literal(entry.summary, entry.summary)]
+                        if entry.match_type:
+                            title_nodes.append(
+                                nodes.Text(" (Match: {0})".format(entry.match_type))
+                            )
+
+                        self._add_entry(entry, title_nodes)
+
+                if entry.include:
+                    self._sections[-1] += self._bullet_list(
+                        [self._xref(role, x) for x in entry.includes]
+                    )
+
+        self._add_links(sls_obj)
+
+        return page
+
+    def _new_section(self, title_nodes):
+        """
+        Return a section with a title, with the same name and id the rst parser would give it.
+        """
+        title = nodes.title("", "", *title_nodes)
+
+        section = nodes.section()
+        section += title
+        section["names"].append(nodes.fully_normalize_name(title.astext()))
+        self.set_source_info(section)
+        self.state.document.note_implicit_target(section, section)
+
+        return section
+
+    def _parse_inline(self, text):
+        """
+        Return the nodes for some text from a comment block with any inline markup parsed.
+        """
+        text_nodes, messages = self.state.inline_text(text, self.lineno)
+        self._messages.extend(messages)
+
+        return text_nodes
+
+    def _parse_text(self, text, node=None):
+        """
+        Parse some text from a comment block as rst into a node, the current section if not supplied.
+        """
+        if text:
+            nested_parse_with_titles(
+                self.state,
+                StringList(text.splitlines(), source=self._source),
+                self._sections[-1] if node is None else node,
+            )
+
+    def _run_directive(self, name, argument):
+        """
+        Return the nodes for a directive with one argument and no content, looked up as the rst parser would.
+        """
+        directive_class, messages = directives.directive(
+            name, self.state_machine.language, self.state.document
+        )
+        self._messages.extend(messages)
+
+        if directive_class is None:
+            return []
+
+        directive = directive_class(
+            name,
+            [argument],
+            {},
+            StringList(),
+            self.lineno,
+            self.content_offset,
+            "",
+            self.state,
+            self.state_machine,
+        )
+
+        return directive.run()
+
+    def _run_role(self, name, text):
+        """
+        Return the nodes for a role, e.g. a cross-reference, looked up as the rst parser would.
+        """
+        if name not in self._roles:
+            role_func, messages = roles.role(
+                name, self.state_machine.language, self.lineno, self.state.reporter
+            )
+            self._messages.extend(messages)
+            self._roles[name] = role_func
+
+        rawtext = ":{0}:`{1}`".format(name, text)
+
+        role_func = self._roles[name]
+        if role_func is None:
+            return [nodes.Text(rawtext)]
+
+        role_nodes, messages = role_func(
+            name, rawtext, text, self.lineno, self.state.inliner
+        )
+        self._messages.extend(messages)
+
+        return role_nodes
+
+    def _start_page(self, title_nodes):
+        """
+        Return the top-level section for the page, which later sections are added under.
+        """
+        page = self._new_section(title_nodes)
+
+        self._styles = ["*"]
+        self._sections = [page]
+
+        return page
+
+    def _step_list(self, steps):
+        """
+        Return the numbered list of steps. Steps with content are output as a definition, as the built-in templates
+        are.
+        """
+        step_list = nodes.enumerated_list(enumtype="arabic", prefix="", suffix=".")
+
+        for entry in steps:
+            if entry.step_id:
+                summary_nodes = [nodes.literal(entry.summary, entry.summary)]
+            else:
+                summary_nodes = self._parse_inline(entry.summary)
+
+            item = nodes.list_item()
+
+            if entry.content:
+                definition = nodes.definition()
+                self._parse_text(entry.content, node=definition)
+
+                item += nodes.definition_list(
+                    "",
+                    nodes.definition_list_item(
+                        "", nodes.term("", "", *summary_nodes), definition
+                    ),
+                )
+            else:
+                item += nodes.paragraph("", "", *summary_nodes)
+
+            step_list += item
+
+        return step_list
+
+    def _xref(self, role, text):
+        """
+        Return the nodes for a cross-reference to an sls name, the same as the role for its source creates. They are
+        built directly as a page can have thousands of them (e.g. in *All includes*).
+        """
+        has_explicit_title, title, target = split_explicit_title(text)
+        rawtext = ":{0}:`{1}`".format(role, text)
+
+        refnode = addnodes.pending_xref(
+            rawtext,
+            refdoc=self.env.docname,
+            refdomain="salt",
+            reftype=role,
+            refexplicit=has_explicit_title,
+            refwarn=False,
+        )
+        self.set_source_info(refnode)
+        refnode["reftarget"] = target
+        refnode += nodes.literal(
+            rawtext, title, classes=["xref", "salt", "salt-" + role]
+        )
+
+        return [refnode]
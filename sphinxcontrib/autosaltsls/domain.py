@@ -0,0 +1,242 @@
+"""
+AutoSaltSLS Sphinx domain
+
+The ``salt`` domain holds the sls files documented by the sources in a dict per cross-reference role, keyed by their
+full dot-separated name, so a cross-reference is resolved with a single lookup. Each role gets a compact index page of
+its sls files rather than an entry in the general index for every sls file.
+"""
+from sphinx import addnodes
+from sphinx.directives import ObjectDescription
+from sphinx.domains import Domain, Index, IndexEntry, ObjType
+from sphinx.roles import XRefRole
+from sphinx.util import logging
+from sphinx.util.nodes import make_id, make_refnode
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROLE = "sls"
+
+
+def get_source_roles(config):
+    """
+    Return the cross-reference roles used by the sources, including the default ``sls`` role.
+
+    config
+        Sphinx config
+
+    :return: list
+    """
+    roles = {DEFAULT_ROLE}
+
+    if isinstance(config.autosaltsls_sources, dict):
+        for settings in config.autosaltsls_sources.values():
+            if isinstance(settings, dict) and settings.get("cross_ref_role"):
+                roles.add(settings["cross_ref_role"])
+
+    return sorted(roles)
+
+
+class AutoSaltSLSObject(ObjectDescription):
+    """
+    Describe an sls file as the target for the cross-reference role of the same name, e.g.::
+
+        .. salt:state:: apache.installed
+
+    The directive for each role is also registered without the ``salt:`` prefix, as used by the built-in templates.
+    """
+
+    def run(self):
+        if ":" not in self.name:
+            self.name = "salt:" + self.name
+
+        return super().run()
+
+    def handle_signature(self, sig, signode):
+        signode += addnodes.desc_name(sig, sig)
+        return sig
+
+    def add_target_and_index(self, name, sig, signode):
+        node_id = make_id(self.env, self.state.document, self.objtype, name)
+        signode["ids"].append(node_id)
+        self.state.document.note_explicit_target(signode)
+
+        self.env.get_domain("salt").note_object(
+            self.objtype, name, node_id, location=signode
+        )
+
+
+class AutoSaltSLSXRefRole(XRefRole):
+    """
+    Cross-reference to an sls file, registered with and without the ``salt:`` prefix like the directive.
+    """
+
+    def run(self):
+        if ":" not in self.name:
+            self.name = "salt:" + self.name
+
+        return super().run()
+
+
+class AutoSaltSLSIndex(Index):
+    """
+    Index of the sls files for one cross-reference role, grouped by first letter with the sls files in a dir listed
+    under its top-level name. A subclass is created for each role by ``AutoSaltSLSDomain``.
+    """
+
+    role = DEFAULT_ROLE
+
+    def generate(self, docnames=None):
+        objects = self.domain.data["objects"].get(self.role, {})
+
+        groups = {}
+        for name, (docname, node_id) in objects.items():
+            if docnames and docname not in docnames:
+                continue
+
+            groups.setdefault(name.split(".", 1)[0], []).append(name)
+
+        content = {}
+        child_count = 0
+
+        for top in sorted(groups):
+            entries = content.setdefault(top[0].upper(), [])
+            children = sorted(x for x in groups[top] if x != top)
+            child_count += len(children)
+
+            if top in objects and top in groups[top]:
+                docname, node_id = objects[top]
+                entries.append(
+                    IndexEntry(top, 1 if children else 0, docname, node_id, "", "", "")
+                )
+            else:
+                # Dirs without an init.sls file have no page of their own
+                entries.append(IndexEntry(top, 1, "", "", "", "", ""))
+
+            for name in children:
+                docname, node_id = objects[name]
+                entries.append(IndexEntry(name, 2, docname, node_id, "", "", ""))
+
+        # Collapse the sls files in dirs if there are more of them than top-level names, as the module index does
+        return sorted(content.items()), child_count > len(groups)
+
+
+class AutoSaltSLSDomain(Domain):
+    """
+    Sphinx domain for the sls files documented by the sources. Objects are stored per role as ``{name: (docname,
+    node_id)}``, along with the (role, name) pairs described in each document so they can be cleared and merged per
+    document for parallel builds.
+    """
+
+    name = "salt"
+    label = "Salt"
+    object_types = {DEFAULT_ROLE: ObjType("sls file", DEFAULT_ROLE)}
+    directives = {DEFAULT_ROLE: AutoSaltSLSObject}
+    roles = {DEFAULT_ROLE: AutoSaltSLSXRefRole()}
+    initial_data = {"objects": {}, "docs": {}}
+    data_version = 1
+
+    def __init__(self, env):
+        super().__init__(env)
+
+        # The domain is created before the environment has the config, so use the app's
+        for role in get_source_roles(env.app.config):
+            if role not in self.object_types:
+                self.add_object_type(role, ObjType("{0} file".format(role), role))
+                self.directives[role] = AutoSaltSLSObject
+                self.roles[role] = AutoSaltSLSXRefRole()
+
+            self.indices.append(
+                type(
+                    "AutoSaltSLSIndex_{0}".format(role),
+                    (AutoSaltSLSIndex,),
+                    {
+                        "name": role,
+                        "localname": "{0} File Index".format(role.capitalize()),
+                        "shortname": role,
+                        "role": role,
+                    },
+                )
+            )
+
+    @property
+    def objects(self):
+        return self.data["objects"]
+
+    def note_object(self, role, name, node_id, location=None):
+        """
+        Add an sls file described in the current document, warning if it is already described in another.
+
+        role
+            Cross-reference role of the sls file
+
+        name
+            Full sls name, including any source prefix
+
+        node_id
+            Id of the target node
+
+        location
+            Node to report any warning against
+        """
+        objects = self.objects.setdefault(role, {})
+        docname = self.env.docname
+
+        if name in objects and objects[name][0] != docname:
+            logger.warning(
+                "[AutoSaltSLS] Duplicate {0} description of {1}, other instance in {2}".format(
+                    role, name, objects[name][0]
+                ),
+                location=location,
+            )
+
+        objects[name] = (docname, node_id)
+        self.data["docs"].setdefault(docname, []).append((role, name))
+
+    def clear_doc(self, docname):
+        for role, name in self.data["docs"].pop(docname, []):
+            objects = self.objects.get(role, {})
+            if name in objects and objects[name][0] == docname:
+                del objects[name]
+
+    def merge_domaindata(self, docnames, otherdata):
+        for docname in docnames:
+            pairs = otherdata["docs"].get(docname, [])
+
+            for role, name in pairs:
+                objects = self.objects.setdefault(role, {})
+                objects[name] = otherdata["objects"][role][name]
+
+            if pairs:
+                self.data["docs"].setdefault(docname, []).extend(pairs)
+
+    def resolve_xref(self, env, fromdocname, builder, typ, target, node, contnode):
+        match = self.objects.get(typ, {}).get(target)
+        if match is None:
+            return None
+
+        return make_refnode(builder, fromdocname, match[0], match[1], contnode)
+
+    def resolve_any_xref(self, env, fromdocname, builder, target, node, contnode):
+        results = []
+
+        for role in sorted(self.objects):
+            match = self.objects[role].get(target)
+            if match is not None:
+                results.append(
+                    (
+                        "salt:" + role,
+                        make_refnode(
+                            builder, fromdocname, match[0], match[1], contnode
+                        ),
+                    )
+                )
+
+        return results
+
+    def get_objects(self):
+        for role, objects in self.objects.items():
+            for name, (docname, node_id) in objects.items():
+                yield name, name, role, docname, node_id, 1
+
+    def get_full_qualified_name(self, node):
+        return node.get("reftarget")
@@ -0,0 +1,211 @@
+"""
+AutoSaltSLS Sphinx extension
+
+Connects the rst file generation to the Sphinx events and adds the ``autosaltsls`` directive and ``salt`` domain.
+"""
+from sphinx.util import docutils, logging
+
+# noinspection PyUnresolvedReferences
+from sphinx.util.console import darkgreen, bold
+
+from . import __version__
+from .build import CONFIG_VALUES, run_autosaltsls, save_autosaltsls
+from .directives import AutoSaltSLSDirective
+from .domain import (
+    AutoSaltSLSDomain,
+    AutoSaltSLSObject,
+    AutoSaltSLSXRefRole,
+    get_source_roles,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def build_finished(app, exception):
+    """
+    Save the state of the sources for the next build once this one has succeeded.
+    """
+    if exception is None:
+        save_autosaltsls(app)
+
+
+def env_get_outdated(app, env, added, changed, removed):
+    """
+    Return the generated documents that need to be read again because an sls file they were generated from or one of
+    the sls names they include was added, removed or modified.
+    """
+    previous_docs = getattr(env, "autosaltsls_docs", {})
+    current_docs = getattr(app, "autosaltsls_docs", {})
+
+    # Swap in the include graph for this build, keeping the previous one to find any removed includes
+    previous_graph = getattr(env, "autosaltsls_graph", None)
+    env.autosaltsls_graph = getattr(app, "autosaltsls_graph", None)
+
+    previous_names = set()
+    for info in previous_docs.values():
+        previous_names.update(info["names"])
+
+    current_names = set()
+    for info in current_docs.values():
+        current_names.update(info["names"])
+
+    changed_names = (
+        getattr(app, "autosaltsls_changed_names", set())
+        | (previous_names - current_names)
+        | (current_names - previous_names)
+    )
+
+    if not changed_names:
+        return []
+
+    # The changed names and the names that include them, from the reverse edges of both graphs
+    names = set(changed_names)
+    for graph in [previous_graph, env.autosaltsls_graph]:
+        if graph is not None:
+            names.update(graph.dependents(changed_names))
+
+    # Pages built by the autosaltsls directive have stub rst files that don't change when their include sections do
+    if app.config.autosaltsls_render_nodes:
+        names.update(
+            _include_changes(changed_names, previous_graph, env.autosaltsls_graph)
+        )
+
+    name_docs = {}
+    for docname, info in current_docs.items():
+        for name in info["names"]:
+            name_docs[name] = docname
+
+    outdated = set()
+    for name in names:
+        docname = name_docs.get(name)
+        if docname in previous_docs:
+            outdated.add(docname)
+
+    outdated -= set(added) | set(changed) | set(removed)
+
+    if outdated:
+        logger.info(
+            bold("[AutoSaltSLS] ")
+            + "{0} documents reference changed sls files".format(len(outdated))
+        )
+
+    return sorted(outdated)
+
+
+def env_merge_info(app, env, docnames, other):
+    """
+    Merge the document details collected by a parallel read process.
+    """
+    if not hasattr(env, "autosaltsls_docs"):
+        env.autosaltsls_docs = {}
+
+    other_docs = getattr(other, "autosaltsls_docs", {})
+
+    for docname in docnames:
+        if docname in other_docs:
+            env.autosaltsls_docs[docname] = other_docs[docname]
+
+
+def env_purge_doc(app, env, docname):
+    """
+    Drop the stored details for a document that is about to be re-read or has been removed.
+    """
+    if hasattr(env, "autosaltsls_docs"):
+        env.autosaltsls_docs.pop(docname, None)
+
+
+def source_read(app, docname, source):
+    """
+    Store the details for a generated document in the environment as it is read.
+    """
+    info = getattr(app, "autosaltsls_docs", {}).get(docname)
+
+    if info is not None:
+        if not hasattr(app.env, "autosaltsls_docs"):
+            app.env.autosaltsls_docs = {}
+
+        app.env.autosaltsls_docs[docname] = info
+
+
+def config_autosaltsls(app, config):
+    """
+    Add the directive and role for each source-specific cross-reference role without the ``salt`` domain prefix
+    """
+    for role in get_source_roles(config):
+        # Sources can share a role and other extensions may already use the name
+        if docutils.is_directive_registered(role) or docutils.is_role_registered(role):
+            continue
+
+        app.add_directive(role, AutoSaltSLSObject)
+        app.add_role(role, AutoSaltSLSXRefRole())
+
+        logger.info(
+            bold("[AutoSaltSLS] ")
+            + "Adding custom Sphinx role/object type "
+            + darkgreen("{0}".format(role))
+        )
+
+
+def setup(app):
+    """
+    Setup the Sphinx app with the default config values and add the ``autosaltsls`` directive and ``salt`` domain.
+    """
+    # Connect our functions to Sphinx events
+    app.connect("config-inited", config_autosaltsls)
+    app.connect("builder-inited", run_autosaltsls)
+    app.connect("build-finished", build_finished)
+    app.connect("env-get-outdated", env_get_outdated)
+    app.connect("env-merge-info", env_merge_info)
+    app.connect("env-purge-doc", env_purge_doc)
+    app.connect("source-read", source_read)
+
+    # Defined the config options we have
+    for name, default, rebuild in CONFIG_VALUES:
+        app.add_config_value(name, default, rebuild)
+
+    # Add the directive for building sls pages from the parsed sls files
+    app.add_directive("autosaltsls", AutoSaltSLSDirective)
+
+    # Add the domain holding the sls files documented by the sources
+    app.add_domain(AutoSaltSLSDomain)
+
+    return {
+        "version": __version__,
+        "parallel_read_safe": True,
+        "parallel_write_safe": True,
+    }
+
+
+def _include_changes(names, previous_graph, graph):
+    """
+    Return the names whose *Included by* or *All includes* sections are affected by changes to what some names include,
+    i.e. the names they include before and after the change and the names including them directly or indirectly.
+
+    names
+        Set of 'role:name' strings for the added, removed or modified sls files
+
+    previous_graph
+        AutoSaltSLSIncludeGraph instance from the previous build, or None
+
+    graph
+        AutoSaltSLSIncludeGraph instance for this build, or None
+
+    :return: set
+    """
+    graphs = [x for x in [previous_graph, graph] if x is not None]
+
+    # Only names whose includes have changed affect other names
+    changed = {
+        x
+        for x in names
+        if len(graphs) < 2 or previous_graph.edges.get(x) != graph.edges.get(x)
+    }
+
+    affected = set()
+    for include_graph in graphs:
+        affected.update(include_graph.ancestors(changed))
+
+        for node in changed:
+            affected.update(include_graph.edges.get(node, ()))
+
+    return affected
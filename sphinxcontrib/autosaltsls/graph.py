@@ -0,0 +1,292 @@
+"""
+AutoSaltSLS include dependency graph
+"""
+
+
+class AutoSaltSLSIncludeGraph(object):
+    """
+    Directed graph of the sls files including (or, for top files, targeting) other sls files. The nodes are
+    'role:name' strings, the same as the names stored for each generated document.
+    """
+
+    def __init__(self):
+        self.edges = {}
+        self._closure = None
+        self._components_list = None
+        self._reverse = None
+
+    def __getstate__(self):
+        # The reverse edges and closure can be rebuilt so don't store them with the Sphinx environment
+        return {
+            "edges": self.edges,
+            "_closure": None,
+            "_components_list": None,
+            "_reverse": None,
+        }
+
+    def add_node(self, node, targets):
+        """
+        Add a node and the edges to the nodes it includes.
+
+        node
+            'role:name' string for the sls file
+
+        targets
+            List of 'role:name' strings for the sls files it includes
+        """
+        self.edges[node] = list(targets)
+        self._closure = None
+        self._components_list = None
+        self._reverse = None
+
+    def add_mapper(self, mapper):
+        """
+        Add a node for each visible sls file in a loaded mapper.
+
+        mapper
+            AutoSaltSLSMapper instance
+        """
+        for node, targets in mapper.include_edges():
+            self.add_node(node, targets)
+
+    def ancestors(self, nodes):
+        """
+        Return the nodes that include any of a set of nodes, directly or indirectly.
+
+        nodes
+            Iterable of 'role:name' strings
+
+        :return: set
+        """
+        reverse = self.reverse
+        ancestors = set()
+        queue = list(nodes)
+
+        for node in queue:
+            for includer in reverse.get(node, ()):
+                if includer not in ancestors:
+                    ancestors.add(includer)
+                    queue.append(includer)
+
+        return ancestors
+
+    def closure(self):
+        """
+        Return the transitive closure of the graph, with the depth at which each node is first included. Each node is
+        resolved once, in reverse topological order of its strongly connected component, by merging the memoised
+        closures of the nodes it includes, so the cost grows with the size of the result rather than the number of
+        paths. Only nodes within a cycle need a search of their own component.
+
+        :return: dict
+            Node mapped to a dict of each node it includes, directly or indirectly, and the shortest include depth
+        """
+        if self._closure is not None:
+            return self._closure
+
+        closure = {}
+
+        for component in self._components():
+            members = set(component)
+
+            for node in component:
+                # Depths to the other members of a cycle, only needed when there is one
+                depths = {node: 0}
+                if len(component) > 1:
+                    queue = [node]
+                    for current in queue:
+                        for target in self.edges.get(current, ()):
+                            if target in members and target not in depths:
+                                depths[target] = depths[current] + 1
+                                queue.append(target)
+
+                result = {}
+
+                for member, depth in depths.items():
+                    if member != node:
+                        _merge_depth(result, member, depth)
+
+                    for target in self.edges.get(member, ()):
+                        if target in members:
+                            continue
+
+                        _merge_depth(result, target, depth + 1)
+
+                        for included, included_depth in closure.get(target, {}).items():
+                            _merge_depth(result, included, depth + 1 + included_depth)
+
+                result.pop(node, None)
+                closure[node] = result
+
+        self._closure = closure
+
+        return closure
+
+    def cycles(self):
+        """
+        Return the groups of nodes that include each other, directly or indirectly.
+
+        :return: list
+            Sorted lists of nodes, one for each cycle
+        """
+        return sorted(
+            sorted(x)
+            for x in self._components()
+            if len(x) > 1 or x[0] in self.edges.get(x[0], ())
+        )
+
+    def dependents(self, nodes):
+        """
+        Return the nodes that include any of a set of nodes.
+
+        nodes
+            Iterable of 'role:name' strings
+
+        :return: set
+        """
+        reverse = self.reverse
+        dependents = set()
+
+        for node in nodes:
+            dependents.update(reverse.get(node, ()))
+
+        return dependents
+
+    @property
+    def reverse(self):
+        """
+        Return the reverse edges, mapping each node to the nodes that include it, built in one pass over the edges.
+
+        :return: dict
+        """
+        if self._reverse is None:
+            self._reverse = {}
+
+            for node, targets in self.edges.items():
+                for target in targets:
+                    self._reverse.setdefault(target, set()).add(node)
+
+        return self._reverse
+
+    def set_included_by(self, mappers):
+        """
+        Set the ``included_by`` list of sls names on every visible sls object from the reverse edges.
+
+        mappers
+            List of loaded AutoSaltSLSMapper instances
+        """
+        objects = {}
+
+        for mapper in mappers:
+            role = mapper.settings.cross_ref_role
+
+            for sls_obj in mapper.visible_sls_objects:
+                for obj in [sls_obj] + sls_obj.children:
+                    obj.included_by = ()
+                    objects["{0}:{1}".format(role, obj.prefixed_name)] = obj
+
+        for node, includers in self.reverse.items():
+            obj = objects.get(node)
+
+            if obj is not None:
+                obj.included_by = sorted(x.split(":", 1)[1] for x in includers)
+
+    def set_all_includes(self, mappers):
+        """
+        Set the ``all_includes`` list of (sls name, depth) tuples on every visible sls object from the transitive
+        closure, sorted by depth and then name.
+
+        mappers
+            List of loaded AutoSaltSLSMapper instances
+        """
+        closure = self.closure()
+
+        for mapper in mappers:
+            role = mapper.settings.cross_ref_role
+
+            for sls_obj in mapper.visible_sls_objects:
+                for obj in [sls_obj] + sls_obj.children:
+                    includes = closure.get("{0}:{1}".format(role, obj.prefixed_name))
+
+                    obj.all_includes = (
+                        sorted(
+                            (
+                                (x.split(":", 1)[1], depth)
+                                for x, depth in includes.items()
+                            ),
+                            key=lambda x: (x[1], x[0]),
+                        )
+                        if includes
+                        else ()
+                    )
+
+    #
+    # Private functions
+    #
+    def _components(self):
+        """
+        Return the strongly connected components of the graph using Tarjan's algorithm, in reverse topological order
+        (a component comes after any components it includes). It is iterative so deep include chains can't hit the
+        recursion limit.
+
+        :return: list
+            Lists of nodes
+        """
+        if self._components_list is not None:
+            return self._components_list
+
+        index = {}
+        low = {}
+        on_stack = set()
+        stack = []
+        components = []
+
+        for root in self.edges:
+            if root in index:
+                continue
+
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(self.edges.get(root, ())))]
+
+            while work:
+                node, targets = work[-1]
+
+                for target in targets:
+                    if target not in index:
+                        index[target] = low[target] = len(index)
+                        stack.append(target)
+                        on_stack.add(target)
+                        work.append((target, iter(self.edges.get(target, ()))))
+                        break
+                    elif target in on_stack:
+                        low[node] = min(low[node], index[target])
+                else:
+                    work.pop()
+
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+
+                        components.append(component)
+
+        self._components_list = components
+
+        return components
+
+
+def _merge_depth(depths, node, depth):
+    """
+    Add a node to a dict of depths, keeping the shortest depth.
+    """
+    if depth < depths.get(node, depth + 1):
+        depths[node] = depth
@@ -1,17 +1,29 @@
 """
 AutoSaltSLS mapper class
 """
+import hashlib
+import json
+import multiprocessing
 import os
-import pathlib
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 
-from jinja2 import Environment, FileSystemLoader
 from sphinx.errors import ExtensionError
 from sphinx.util import logging, status_iterator
+from sphinx.util.parallel import parallel_available
 
 # noinspection PyUnresolvedReferences
 from sphinx.util.console import darkgreen, bold
 
+from .metrics import AutoSaltSLSMetrics
 from .objects import AutoSaltSLS
+from .parser import AutoSaltSLSParser
+from .rendering import TEMPLATE_DIR, get_jinja_env
+from .scanner import AutoSaltSLSExcludeMatcher, AutoSaltSLSManifest, walk_sls_tree
+from .toctree import build_toc_levels
+from .utils import relative_path, write_file_if_changed
 
 logger = logging.getLogger(__name__)
 
@@ -26,11 +38,14 @@ class AutoSaltSLSMapperSettings(object):
         self.doc_prefix = app.config.autosaltsls_doc_prefix
         self.comment_prefix = app.config.autosaltsls_comment_prefix
         self.comment_ignore_prefix = app.config.autosaltsls_comment_ignore_prefix
+        self.indented_comments = app.config.autosaltsls_indented_comments
+        self.remove_first_space = app.config.autosaltsls_remove_first_space
 
         # Now use the source settings
         self.build_dir = settings.get("build_dir", None)
         self.cross_ref_role = settings.get("cross_ref_role", "sls")
         self.exclude = settings.get("exclude", [])
+        self.exclude_matcher = AutoSaltSLSExcludeMatcher(self.exclude)
         self.expand_title_name = settings.get("expand_title_name", None)
         self.no_first_space = settings.get("no_first_space", True)
         self.prefix = settings.get("prefix", None)
@@ -63,19 +78,56 @@ class AutoSaltSLSMapper(object):
 
     settings
         Source settings from conf.py for the specified key
+
+    parse_cache : None
+        AutoSaltSLSParseCache instance to use for skipping the parsing of unchanged files
+
+    metrics : None
+        AutoSaltSLSMetrics instance to record timings and counters in, one is created if not supplied
+
+    trace : None
+        AutoSaltSLSTraceFile instance to write a record to for each sls file parsed
     """
 
-    def __init__(self, app, source, settings):
+    def __init__(
+        self, app, source, settings, parse_cache=None, metrics=None, trace=None
+    ):
         self.app = app
+        self.parse_cache = parse_cache
+        self.metrics = metrics if metrics is not None else AutoSaltSLSMetrics()
+        self.trace = trace
         self.source = source.replace("/", os.path.sep)
         self.full_source = source
         self.settings = settings
         self.sls_objects = []
+        self.written_count = 0
+        self.skipped_count = 0
+        self.written_files = []
+
+        # Only work out which files would be written, set by the command line interface
+        self.dry_run = False
+
+        # Set of sls objects to limit rendering to, all visible objects are rendered when None
+        self.render_only = None
+
+        # Root AutoSaltSLSTocLevel when the toctrees are nested, set when the rst files are prepared
+        self.toc_level = None
+
+        # Logging and progress output, changed when sources are processed concurrently
+        self.log_tag = "[AutoSaltSLS] "
+        self.show_progress = True
+
+        # Sphinx only outputs debug messages when run with -vv
+        self.debug_logging = app.verbosity > 1
 
         self._sub_object_count = None
+        self._parse_results = {}
+        self._parse_stats = {}
+        self._rst_files = None
 
         # Parse some settings into attributes
         self.settings = AutoSaltSLSMapperSettings(app, source, settings)
+        self.parser = AutoSaltSLSParser(self.settings)
 
         # Expand the source to a full dir
         if not os.path.isabs(self.source):
@@ -85,6 +137,20 @@ class AutoSaltSLSMapper(object):
                 )
             )
 
+        # Load the manifest from the previous scan of this source
+        self.manifest = None
+        if app.config.autosaltsls_incremental_scan:
+            self.manifest = AutoSaltSLSManifest(
+                os.path.join(
+                    app.doctreedir,
+                    "autosaltsls",
+                    "manifest-{0}.pickle".format(
+                        hashlib.sha1(self.full_source.encode("utf-8")).hexdigest()[:16]
+                    ),
+                )
+            )
+            self.manifest.load()
+
         # Work out the build root location for this source
         build_root = app.config.autosaltsls_build_root
         if not os.path.isabs(build_root):
@@ -102,11 +168,7 @@ class AutoSaltSLSMapper(object):
         )
 
         # Work out the jinja template dirs to use
-        template_paths = [
-            os.path.normpath(
-                os.path.join(os.path.realpath(__file__), "..", "templates")
-            )
-        ]
+        template_paths = [TEMPLATE_DIR]
 
         # Add source template path to list
         source_template_path = settings.get("template_path", None)
@@ -116,62 +178,133 @@ class AutoSaltSLSMapper(object):
                     os.path.join(app.confdir, source_template_path)
                 )
             logger.debug(
-                "[AutoSaltSLS] Adding template path '{0}'".format(source_template_path)
+                self.log_tag + "Adding template path '{0}'".format(source_template_path)
             )
             template_paths.insert(0, source_template_path)
 
-        # Initialise the jinja rendering engine
-        self.jinja_env = Environment(loader=FileSystemLoader(template_paths))
+        # Use the jinja rendering engine shared by all sources with the same template dirs
+        self.jinja_env = get_jinja_env(
+            template_paths,
+            cache_dir=os.path.join(app.doctreedir, "autosaltsls", "jinja"),
+        )
 
-    def load(self):
+    def load(self, executor=None):
         """
         Read the files associated with the sls objects and parse their comment blocks
+
+        executor : None
+            ProcessPoolExecutor to parse the files with, a pool is created if needed when not supplied
         """
+        start = time.perf_counter()
+
+        # Parse the files up-front across a process pool if we have been asked to
+        jobs = self.parallel_jobs
+        if jobs > 1:
+            self._parse_parallel(jobs, executor=executor)
+
         # Process all the sls objects and their files
-        for sls_obj in status_iterator(
+        for sls_obj in self._status_iterator(
             self.sls_objects,
-            bold("[AutoSaltSLS] Reading primary sls... "),
+            bold(self.log_tag + "Reading primary sls... "),
             "darkgreen",
             self.sls_objects_count,
             1,
             stringify_func=_stringify_sls,
         ):
             # Parse the sls object's file and add to the object as an entry
-            sls_obj.parse_file()
-
-            # Some debugging info
-            if sls_obj.header.has_text:
-                logger.debug(
-                    "[AutoSaltSLS] {0} extracted header:\n{1}".format(
-                        "Top File" if sls_obj.topfile else "File",
-                        sls_obj.header.annotated_text,
-                    )
-                )
+            self._parse_sls(sls_obj)
 
-            if sls_obj.body:
-                logger.debug(
-                    "[AutoSaltSLS] {0} extracted body:\n{1}".format(
-                        "Top File" if sls_obj.topfile else "File",
-                        sls_obj.annotated_body,
-                    )
-                )
+            # Building the debug text splits up every entry so only do it when it will be output
+            if self.debug_logging:
+                self._log_parsed(sls_obj)
 
             # Now parse any files belong to its children
-            for sls_child_obj in status_iterator(
+            for sls_child_obj in self._status_iterator(
                 sls_obj.children,
-                bold("[AutoSaltSLS] Reading child sls... "),
+                bold(self.log_tag + "Reading child sls... "),
                 "darkgreen",
                 sls_obj.child_count,
                 1,
                 stringify_func=_stringify_sls,
             ):
-                sls_child_obj.parse_file()
-                if sls_child_obj.text:
-                    logger.debug(
-                        "[AutoSaltSLS] Child extracted text:\n{0}".format(
-                            sls_child_obj.text
-                        )
+                self._parse_sls(sls_child_obj)
+
+                if self.debug_logging:
+                    self._log_parsed(sls_child_obj, child=True)
+
+        self._parse_stats = {}
+
+        self.metrics.add_phase_time(self.source, "parse", time.perf_counter() - start)
+
+    @property
+    def changes(self):
+        """
+        Return the sls names added, removed or modified since the previous scan, or None if the scan was not
+        incremental.
+
+        :return: dict
+        """
+        if self.manifest is None:
+            return None
+
+        return self.manifest.changes
+
+    def doc_info(self, srcdir):
+        """
+        Return the details of the documents generated for the visible sls objects, used to work out which documents
+        need to be re-read by Sphinx when sls files change.
+
+        srcdir
+            Sphinx source dir
+
+        :return: dict
+            Document name mapped to a dict of the ``names`` it documents (as 'role:name' strings), the sls ``files``
+            it was generated from and the full path of the rst file written for it as ``output``
+        """
+        role = self.settings.cross_ref_role
+        docs = {}
+
+        for sls_obj in self.visible_sls_objects:
+            for obj, output_file, template in sls_obj.rst_files(self.build_root):
+                docname = os.path.splitext(relative_path(output_file, srcdir))[0]
+                docname = docname.replace(os.path.sep, "/")
+
+                # Only the sls and top file pages document an sls name
+                if template is not None:
+                    docs[docname] = {"names": set(), "files": [], "output": output_file}
+                    continue
+
+                docs[docname] = {
+                    "names": {"{0}:{1}".format(role, obj.prefixed_name)},
+                    "files": [obj.full_filename] if obj.full_filename else [],
+                    "output": output_file,
+                }
+
+        return docs
+
+    def include_edges(self):
+        """
+        Return the sls names included by each visible sls object, or targeted by a top file.
+
+        :return: list
+            Tuples of ('role:name' string for the sls object, list of 'role:name' strings it includes)
+        """
+        role = self.settings.cross_ref_role
+        edges = []
+
+        for sls_obj in self.visible_sls_objects:
+            for obj in [sls_obj] + sls_obj.children:
+                if obj.hidden or not obj.full_filename:
+                    continue
+
+                edges.append(
+                    (
+                        "{0}:{1}".format(role, obj.prefixed_name),
+                        ["{0}:{1}".format(role, x) for x in obj.include_targets],
                     )
+                )
+
+        return edges
 
     @property
     def other_files(self):
@@ -184,6 +317,32 @@ class AutoSaltSLSMapper(object):
         sls_objs.sort(key=lambda sls: sls.name)
         return sls_objs
 
+    def save_manifest(self):
+        """
+        Write the manifest from the latest scan and write to disk, so the next scan only reports changes since then.
+        This is left until the build using the rst files has succeeded, so a failed build has the same changes
+        reported again.
+        """
+        if self.manifest is not None and not self.dry_run:
+            self.manifest.save()
+
+    @property
+    def parallel_jobs(self):
+        """
+        Return the number of worker processes to use, taken from ``autosaltsls_parallel_jobs`` or the Sphinx ``-j``
+        option if that is 0.
+
+        :return: int
+        """
+        if not parallel_available:
+            return 1
+
+        jobs = self.app.config.autosaltsls_parallel_jobs
+        if not jobs:
+            jobs = self.app.parallel
+
+        return max(jobs or 1, 1)
+
     @property
     def sls_objects_count(self):
         """
@@ -208,32 +367,87 @@ class AutoSaltSLSMapper(object):
 
         return self._sub_object_count
 
+    def refresh(self, filenames):
+        """
+        Re-read some modified sls files this mapper already has objects for, without scanning the source again. Only
+        the modified files need parsing by the next ``load``. Files that are not in the source or are excluded from it
+        are ignored.
+
+        filenames
+            List of full paths to sls files
+
+        :return: bool (False if a ``scan`` is needed instead, e.g. as sls files have been added or removed)
+        """
+        if self.manifest is None:
+            return False
+
+        objects = {}
+        for sls_obj in self.sls_objects:
+            for obj in [sls_obj] + sls_obj.children:
+                if obj.full_filename:
+                    objects[obj.full_filename] = obj
+
+        files = []
+        for filename in filenames:
+            rel_path = os.path.relpath(filename, self.full_source)
+            if rel_path.startswith(os.pardir) or self._is_excluded(rel_path):
+                continue
+
+            if filename not in objects:
+                return False
+
+            files.append((rel_path, filename))
+
+        if not self.manifest.update_files(files):
+            return False
+
+        for rel_path, filename in files:
+            if rel_path in self.manifest.modified:
+                objects[filename].parsed = False
+
+        logger.info(
+            bold(self.log_tag)
+            + "Refreshing {0} modified sls files".format(len(self.manifest.modified))
+        )
+
+        return True
+
     def scan(self):
         """
         Scan the source dir for ``*.sls`` files and create an AutoSaltSLS object for each
 
         :return: int (count of sls objects found)
         """
+        start = time.perf_counter()
+
         # Check the source dir exists
         if not os.path.isdir(self.full_source):
             raise ExtensionError(
                 "Source path '{0}' does not exist".format(self.full_source)
             )
 
-        logger.info(bold("[AutoSaltSLS] ") + "Scanning {0}".format(self.full_source))
+        logger.info(bold(self.log_tag) + "Scanning {0}".format(self.full_source))
 
-        cwd = os.getcwd()
-        os.chdir(self.full_source)
+        # Keep hold of the objects from any previous scan so their parsed data can be re-used
+        previous_objects = {}
+        for sls_obj in self.sls_objects:
+            for obj in [sls_obj] + sls_obj.children:
+                if obj.full_filename and obj.parsed:
+                    previous_objects[(obj.name, obj.full_filename)] = obj
 
         # Clear out any old data
         self.sls_objects = []
+        self._sub_object_count = None
 
-        for dir_path, dir_names, filenames in os.walk("."):
-            # Remove the source from the dir we are processing as this will give us the sls namespace
-            p = pathlib.Path(dir_path)
-            rel_path = dir_path
-            if dir_path != ".":
-                rel_path = str(pathlib.Path(*p.parts[:]))
+        for rel_path, filenames in walk_sls_tree(
+            self.full_source,
+            exclude=self.settings.exclude_matcher,
+            log_tag=self.log_tag,
+            manifest=self.manifest,
+        ):
+            # Dirs without any sls files don't need an object
+            if not filenames:
+                continue
 
             source_url_path = None
 
@@ -242,27 +456,18 @@ class AutoSaltSLSMapper(object):
                     self.settings.url_root + "/" + rel_path.replace("\\", "/")
                 )
 
-            # Skip any paths in the exclude list
-            if rel_path in self.settings.exclude:
-                logger.info(
-                    bold("[AutoSaltSLS] ") + darkgreen("Ignoring {0}".format(dir_path))
-                )
-                dir_names[:] = []
-                filenames[:] = []
-                continue
-
             # Start with an empty parent
             sls_parent = None
 
             # Create a parent container object if not in the top level
             if rel_path != ".":
-                logger.debug(
-                    "[AutoSaltSLS] Creating sls object for {0} (No file)".format(
-                        rel_path
+                if self.debug_logging:
+                    logger.debug(
+                        self.log_tag
+                        + "Creating sls object for {0} (No file)".format(rel_path)
                     )
-                )
+
                 sls_parent = AutoSaltSLS(
-                    self.app,
                     rel_path,
                     self.full_source,
                     self.settings,
@@ -271,44 +476,43 @@ class AutoSaltSLSMapper(object):
                 self.sls_objects.append(sls_parent)
 
             for file in filenames:
-                # We only want .sls files
-                if file.endswith(".sls"):
-                    # init.sls files are the parent so update the right object
-                    if file == "init.sls" and sls_parent:
-                        sls_parent.initfile = True
-                        continue
-
-                    # Create an sls object for the file
+                # init.sls files are the parent so update the right object
+                if file == "init.sls" and sls_parent:
+                    sls_parent.initfile = True
+                    continue
+
+                # Create an sls object for the file
+                if self.debug_logging:
                     logger.debug(
-                        "[AutoSaltSLS] Creating sls object for {0} ({1})".format(
+                        self.log_tag
+                        + "Creating sls object for {0} ({1})".format(
                             rel_path if rel_path != "." else "[root]", file,
                         )
                     )
-                    sls_obj = AutoSaltSLS(
-                        self.app,
-                        file,
-                        os.path.join(self.full_source, rel_path)
-                        if rel_path != "."
-                        else self.full_source,
-                        self.settings,
-                        parent_name=sls_parent.name if sls_parent else None,
-                        source_url_root=source_url_path,
-                    )
 
-                    if sls_parent:
-                        # Add the child to the parent
-                        sls_parent.add_child(sls_obj)
-                    else:
-                        self.sls_objects.append(sls_obj)
+                sls_obj = AutoSaltSLS(
+                    file,
+                    os.path.join(self.full_source, rel_path)
+                    if rel_path != "."
+                    else self.full_source,
+                    self.settings,
+                    parent_name=sls_parent.name if sls_parent else None,
+                    source_url_root=source_url_path,
+                )
+
+                if sls_parent:
+                    # Add the child to the parent
+                    sls_parent.add_child(sls_obj)
+                else:
+                    self.sls_objects.append(sls_obj)
 
         # Post-process the sls objects to set the initfile data correctly for true parent objects and to identify any
         # top files
         for sls_obj in self.sls_objects:
             if sls_obj.initfile:
                 logger.debug(
-                    "[AutoSaltSLS] Setting sls object {0} as init file".format(
-                        sls_obj.basename
-                    )
+                    self.log_tag
+                    + "Setting sls object {0} as init file".format(sls_obj.basename)
                 )
 
                 rst_filename = None
@@ -317,17 +521,47 @@ class AutoSaltSLSMapper(object):
 
                 sls_obj.set_initfile(rst_filename=rst_filename)
 
-        # Change back to the starting dir
-        os.chdir(cwd)
+        if self.manifest is not None:
+            changes = self.manifest.changes
+
+            logger.info(
+                bold(self.log_tag)
+                + "Changes since last scan: {0} added, {1} removed, {2} modified".format(
+                    len(changes["added"]),
+                    len(changes["removed"]),
+                    len(changes["modified"]),
+                )
+            )
+
+            for change_type in ["added", "removed", "modified"]:
+                for name in sorted(changes[change_type]):
+                    logger.debug(
+                        self.log_tag + "sls {0}: {1}".format(change_type, name)
+                    )
+
+            # Carry the parsed data over for unchanged files from a previous scan by this mapper
+            if previous_objects:
+                changed_files = {
+                    os.path.join(self.full_source, x)
+                    for x in self.manifest.added | self.manifest.modified
+                }
+
+                for sls_obj in self.sls_objects:
+                    for obj in [sls_obj] + sls_obj.children:
+                        previous = previous_objects.get((obj.name, obj.full_filename))
+                        if previous and obj.full_filename not in changed_files:
+                            obj.copy_parsed(previous)
 
         # Report the count of objects found
         logger.info(
-            bold("[AutoSaltSLS] ")
+            bold(self.log_tag)
             + "Found {0} top-level sls entities and {1} sub-entities".format(
                 self.sls_objects_count, self.sls_sub_object_count,
             )
         )
 
+        self.metrics.add_phase_time(self.source, "scan", time.perf_counter() - start)
+
         return self.sls_objects_count
 
     @property
@@ -348,57 +582,718 @@ class AutoSaltSLSMapper(object):
         """
         return [x for x in self.sls_objects if not x.hidden]
 
-    def write(self):
+    def write(self, executor=None):
         """
         Generate the rst files for the loaded sls objects
+
+        executor : None
+            ProcessPoolExecutor from ``render_pool`` to render the files with. If not supplied a pool is created if
+            needed and the workers can be forked, otherwise the files are rendered in this process
+        """
+        self._create_build_root()
+
+        # Reset the file counts
+        self.written_count = 0
+        self.skipped_count = 0
+        self.written_files = []
+
+        jobs = self.parallel_jobs
+        if executor is not None:
+            self._write_parallel(executor, jobs)
+        elif (
+            jobs > 1
+            and _fork_available()
+            and (self.render_only is None or len(self.render_only) >= jobs * 2)
+        ):
+            with render_pool([self], jobs) as executor:
+                self._write_parallel(executor, jobs)
+        else:
+            # Loop over the rst files for the sls objects and write them out
+            rst_files = self._prepare_render()
+
+            for sls_obj, output_file, template in self._status_iterator(
+                rst_files,
+                bold(self.log_tag + "Generating rst files... "),
+                "darkgreen",
+                len(rst_files),
+                1,
+                stringify_func=lambda x: os.path.relpath(x[1], self.build_root),
+            ):
+                start = time.perf_counter()
+                content = sls_obj.render_rst(
+                    self.jinja_env, output_file, template=template
+                )
+                self._add_render_time(
+                    sls_obj.name, output_file, time.perf_counter() - start
+                )
+                self._add_write_result(
+                    output_file, *_write_rst_file(output_file, content, self.dry_run)
+                )
+
+        # Write out the source index file
+        index_file = os.path.join(self.build_root, "index.rst")
+
+        template_obj = self.jinja_env.get_template("index.rst_t")
+
+        logger.info(
+            bold(self.log_tag)
+            + "Rendering index file '{0}' using '{1}'".format(
+                index_file, template_obj.filename,
+            )
+        )
+
+        # Render the template using Jinja
+        start = time.perf_counter()
+        content = template_obj.render(obj=self)
+        self._add_render_time("index", index_file, time.perf_counter() - start)
+        self._add_write_result(
+            index_file, *_write_rst_file(index_file, content, self.dry_run)
+        )
+
+        if self.toc_level is not None:
+            self._write_toc_levels()
+
+        self.metrics.add(self.source, "files_written", self.written_count)
+        self.metrics.add(self.source, "files_skipped", self.skipped_count)
+
+        if self.dry_run:
+            logger.info(
+                bold(self.log_tag)
+                + "Would write {0} rst files for '{1}', {2} unchanged".format(
+                    self.written_count, self.source, self.skipped_count,
+                )
+            )
+            return
+
+        if self.app.config.autosaltsls_include_json:
+            self._write_include_json()
+
+        logger.info(
+            bold(self.log_tag)
+            + "Wrote {0} rst files for '{1}', skipped {2} unchanged".format(
+                self.written_count, self.source, self.skipped_count,
+            )
+        )
+
+        if self.manifest is not None:
+            self._remove_stale_outputs()
+
+    #
+    # Private functions
+    #
+    def _add_parse_time(self, sls_obj, seconds, size):
+        """
+        Record the time taken and bytes read to parse the file for an sls object.
+        """
+        self.metrics.add(self.source, "sls_files_parsed")
+        self.metrics.add(self.source, "bytes_read", size)
+        self.metrics.add_file_time(
+            "parse", self.source, sls_obj.name, sls_obj.full_filename, seconds
+        )
+
+        if self.trace is not None:
+            self._parse_stats[sls_obj] = (seconds, size)
+
+    def _add_render_time(self, name, output_file, seconds):
+        """
+        Record the time taken to render an rst file.
+        """
+        self.metrics.add_phase_time(self.source, "render", seconds)
+        self.metrics.add_file_time("render", self.source, name, output_file, seconds)
+
+    def _add_write_result(self, output_file, written, seconds):
+        """
+        Count an rst file as written or skipped and record the time taken.
+        """
+        if written:
+            self.written_count += 1
+            self.written_files.append(output_file)
+        else:
+            self.skipped_count += 1
+
+        self.metrics.add_phase_time(self.source, "write", seconds)
+
+    def _get_cached_result(self, sls_obj):
+        """
+        Return the parse result for an sls object from the parse cache, counting the hit or miss.
+        """
+        result = self.parse_cache.get(sls_obj)
+
+        self.metrics.add(
+            self.source, "parse_cache_misses" if result is None else "parse_cache_hits"
+        )
+
+        return result
+
+    def _is_excluded(self, rel_path):
+        """
+        Return whether a path relative to the source, or any dir it is in, is excluded by the source settings.
+        """
+        matcher = self.settings.exclude_matcher
+        if not matcher:
+            return False
+
+        parts = rel_path.replace(os.path.sep, "/").split("/")
+
+        return any(matcher.match("/".join(parts[:x])) for x in range(1, len(parts) + 1))
+
+    def _log_parsed(self, sls_obj, child=False):
+        """
+        Output the text extracted from an sls file as debug messages.
+        """
+        if child:
+            if sls_obj.text:
+                logger.debug(
+                    self.log_tag + "Child extracted text:\n{0}".format(sls_obj.text)
+                )
+            return
+
+        if sls_obj.header.has_text:
+            logger.debug(
+                self.log_tag
+                + "{0} extracted header:\n{1}".format(
+                    "Top File" if sls_obj.topfile else "File",
+                    sls_obj.header.annotated_text,
+                )
+            )
+
+        if sls_obj.body:
+            logger.debug(
+                self.log_tag
+                + "{0} extracted body:\n{1}".format(
+                    "Top File" if sls_obj.topfile else "File", sls_obj.annotated_body,
+                )
+            )
+
+    def _parse_file(self, sls_obj):
+        """
+        Parse the file for an sls object in this process, recording the time taken.
+        """
+        start = time.perf_counter()
+        size = sls_obj.parse_file(self.parser)
+
+        if sls_obj.full_filename:
+            self._add_parse_time(sls_obj, time.perf_counter() - start, size)
+
+    def _parse_parallel(self, jobs, executor=None):
+        """
+        Parse the files for all the sls objects across a pool of worker processes. The results are stored so they
+        can be applied to the objects in order by ``_parse_sls``. Files with the same content as another (e.g. the
+        same sls file in several sources) are only parsed once.
+
+        jobs
+            Number of worker processes to use
+
+        executor : None
+            ProcessPoolExecutor to use instead of creating a new one
         """
-        # Create the build dir for our source
-        if not os.path.exists(self.build_root):
+        self._parse_results = {}
+        pending = []
+        duplicates = {}
+
+        for sls_obj in self.sls_objects:
+            for obj in [sls_obj] + sls_obj.children:
+                if not obj.full_filename or obj.parsed:
+                    continue
+
+                result = None
+                content_key = None
+                if self.parse_cache is not None:
+                    result = self._get_cached_result(obj)
+                    content_key = self.parse_cache.content_key(obj)
+
+                if result is not None:
+                    self._parse_results[obj] = result
+                elif content_key is None or content_key not in duplicates:
+                    pending.append(obj)
+                    if content_key is not None:
+                        duplicates[content_key] = [obj]
+                else:
+                    duplicates[content_key].append(obj)
+
+        # Not worth starting the pool for a handful of files
+        if len(pending) < jobs * 2:
+            for obj in pending:
+                self._parse_file(obj)
+                self._store_parse_result(obj, obj.get_parse_result())
+
+            self._share_parse_results(duplicates)
+            return
+
+        logger.info(
+            bold(self.log_tag)
+            + "Parsing {0} sls files using {1} processes".format(len(pending), jobs)
+        )
+
+        tasks = [
+            (
+                obj.full_filename,
+                obj.basename,
+                obj.source_path,
+                obj.parent_name,
+                obj.topfile,
+                self.parser,
+            )
+            for obj in pending
+        ]
+
+        chunksize = max(len(tasks) // (jobs * 4), 1)
+
+        if executor is None:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                results = list(
+                    executor.map(_parse_sls_task, tasks, chunksize=chunksize)
+                )
+        else:
+            results = executor.map(_parse_sls_task, tasks, chunksize=chunksize)
+
+        for obj, (result, seconds, size) in zip(pending, results):
+            self._add_parse_time(obj, seconds, size)
+            self._store_parse_result(obj, result)
+
+        self._share_parse_results(duplicates)
+
+    def _parse_sls(self, sls_obj):
+        """
+        Parse the file for an sls object, using any result from ``_parse_parallel`` or the parse cache if available.
+
+        sls_obj
+            AutoSaltSLS instance
+        """
+        # Already parsed by a previous load
+        if sls_obj.parsed:
+            if self.parse_cache is not None and sls_obj.full_filename:
+                self.parse_cache.keep(sls_obj)
+        elif sls_obj in self._parse_results:
+            sls_obj.apply_parse_result(self._parse_results.pop(sls_obj))
+        elif self.parse_cache is None or not sls_obj.full_filename:
+            self._parse_file(sls_obj)
+        else:
+            result = self._get_cached_result(sls_obj)
+
+            if result is None:
+                self._parse_file(sls_obj)
+                self.parse_cache.put(sls_obj, sls_obj.get_parse_result())
+            else:
+                sls_obj.apply_parse_result(result)
+
+        if self.trace is not None and sls_obj.full_filename:
+            self._trace_sls(sls_obj)
+
+    def _create_build_root(self):
+        """
+        Create the build dir for our source if needed.
+        """
+        if not self.dry_run and not os.path.exists(self.build_root):
             logger.info(
-                bold("[AutoSaltSLS] ")
-                + "Creating '{0}' build root dir '{0}'".format(
+                bold(self.log_tag)
+                + "Creating '{0}' build root dir '{1}'".format(
                     self.source, self.build_root
                 )
             )
 
             try:
-                os.makedirs(self.build_root)
+                os.makedirs(self.build_root, exist_ok=True)
             except PermissionError:
                 raise ExtensionError(
                     "Could not create '{0}, permission denied".format(self.build_root)
                 )
 
-        # Loop over the sls objects and write out their rst files
-        sls_objects = self.visible_sls_objects
+    def _prepare_render(self):
+        """
+        Work out the list of rst files to render in parallel, create their output dirs and compile the templates so
+        forked render workers inherit everything they need.
 
-        for sls_obj in status_iterator(
-            sls_objects,
-            bold("[AutoSaltSLS] Generating rst files... "),
-            "darkgreen",
-            len(sls_objects),
-            1,
-        ):
-            sls_obj.write_rst_files(self.jinja_env, self.build_root)
+        :return: list
+            Tuples of (AutoSaltSLS instance, output file, template)
+        """
+        self._create_build_root()
+
+        # Mirror the dir hierarchy in nested toctrees rather than listing everything on the source index page
+        self.toc_level = None
+        if self.app.config.autosaltsls_nested_toctrees:
+            self.toc_level = build_toc_levels(
+                self.other_files,
+                self.settings.title,
+                mode=self.app.config.autosaltsls_toctree_shard,
+                size=self.app.config.autosaltsls_toctree_shard_size,
+            )
 
-        # Write out the source index file
-        index_file = os.path.join(self.build_root, "index.rst")
+        # Split large top files into a page per environment, including top files in dirs
+        for sls_obj in self.visible_sls_objects:
+            for obj in [sls_obj] + sls_obj.children:
+                if obj.topfile and self.app.config.autosaltsls_split_top_files:
+                    obj.split_top_file(
+                        chunk_size=self.app.config.autosaltsls_top_chunk_size
+                    )
+                else:
+                    obj.top_pages = ()
+
+        # The sls and top file pages are only stubs for the autosaltsls directive when it is building them
+        page_template = None
+        if self.app.config.autosaltsls_render_nodes:
+            page_template = "directive.rst_t"
+
+        self._rst_files = []
+        for sls_obj in self.visible_sls_objects:
+            for obj, output_file, template in sls_obj.rst_files(self.build_root):
+                if (
+                    self.render_only is None
+                    or obj in self.render_only
+                    or (
+                        template == "main.rst_t"
+                        and self.render_only.intersection(obj.children)
+                    )
+                    or (template == "top_env.rst_t" and obj.sls in self.render_only)
+                ):
+                    # The overview pages of split top files always come from the template
+                    if template is None and not obj.top_pages:
+                        template = page_template
 
-        template_obj = self.jinja_env.get_template("index.rst_t")
+                    self._rst_files.append((obj, output_file, template))
+
+        # Create all the output dirs before we start
+        for output_dir in sorted(set(os.path.dirname(x[1]) for x in self._rst_files)):
+            if not self.dry_run and not os.path.exists(output_dir):
+                logger.debug(
+                    self.log_tag + "Creating build dir '{0}'".format(output_dir)
+                )
+
+                # Dirs without sls files have no object of their own so may need creating too
+                try:
+                    os.makedirs(output_dir, exist_ok=True)
+                except PermissionError:
+                    raise ExtensionError(
+                        "Could not create '{0}', permission denied".format(output_dir)
+                    )
+
+        # Compile the templates once
+        for sls_obj, output_file, template in self._rst_files:
+            if not template:
+                template = "top.rst_t" if sls_obj.topfile else "sls.rst_t"
+            self.jinja_env.get_template(template)
+
+        return self._rst_files
+
+    def _remove_stale_outputs(self):
+        """
+        Delete any rst files generated by the previous build which are no longer generated (e.g. for removed sls
+        files) and record the current list of files in the manifest.
+        """
+        outputs = ["index.rst"]
+        if self.app.config.autosaltsls_include_json:
+            outputs.append("includes.json")
+
+        if self.toc_level is not None:
+            outputs.extend(
+                x.docname.replace("/", os.path.sep) + ".rst"
+                for x in self._toc_level_pages()
+            )
+
+        for sls_obj in self.visible_sls_objects:
+            outputs.extend(
+                relative_path(x[1], self.build_root)
+                for x in sls_obj.rst_files(self.build_root)
+            )
+
+        for output in sorted(set(self.manifest.outputs) - set(outputs)):
+            output_file = os.path.join(self.build_root, output)
+
+            if os.path.isfile(output_file):
+                logger.info(
+                    bold(self.log_tag)
+                    + "Removing stale rst file '{0}'".format(output_file)
+                )
+                os.remove(output_file)
+
+                # Tidy up the dir if it is now empty
+                output_dir = os.path.dirname(output_file)
+                if output_dir != self.build_root and not os.listdir(output_dir):
+                    os.rmdir(output_dir)
+
+        self.manifest.outputs = outputs
+
+    def _status_iterator(self, iterable, summary, color, length, verbosity, **kwargs):
+        """
+        Wrapper for ``status_iterator`` which suppresses the progress output when ``show_progress`` is not set.
+        """
+        if not self.show_progress:
+            return iterable
+
+        return status_iterator(iterable, summary, color, length, verbosity, **kwargs)
+
+    def _trace_sls(self, sls_obj):
+        """
+        Write the trace record for a parsed sls object.
+        """
+        seconds, size = self._parse_stats.pop(sls_obj, (None, None))
+
+        self.trace.write(
+            {
+                "source": self.source,
+                "name": sls_obj.name,
+                "filename": sls_obj.full_filename,
+                "cached": seconds is None,
+                "seconds": seconds,
+                "bytes": size,
+                "format": sls_obj.format,
+                "hidden": sls_obj.hidden,
+                "topfile": sls_obj.topfile,
+                "entries": [
+                    {
+                        "directives": x.directives,
+                        "summary": x.summary,
+                        "lines": len(x.lines),
+                        "includes": list(x.includes),
+                        "match_type": x.match_type,
+                    }
+                    for x in sls_obj.entries
+                ],
+            }
+        )
+
+    def _write_include_json(self):
+        """
+        Write out the direct and transitive includes of each visible sls object as JSON.
+        """
+        output_file = os.path.join(self.build_root, "includes.json")
+
+        data = {}
+        for sls_obj in self.visible_sls_objects:
+            for obj in [sls_obj] + sls_obj.children:
+                if obj.hidden or not obj.full_filename:
+                    continue
+
+                data[obj.prefixed_name] = {
+                    "includes": obj.include_targets,
+                    "included_by": list(obj.included_by),
+                    "all_includes": [
+                        {"name": name, "depth": depth}
+                        for name, depth in obj.all_includes
+                    ],
+                }
 
         logger.info(
-            bold("[AutoSaltSLS] ")
-            + "Rendering index file '{0}' using '{1}'".format(
-                index_file, template_obj.filename,
+            bold(self.log_tag) + "Writing include details to '{0}'".format(output_file)
+        )
+
+        write_file_if_changed(
+            output_file,
+            json.dumps(
+                {"role": self.settings.cross_ref_role, "sls": data},
+                indent=2,
+                sort_keys=True,
+            ),
+        )
+
+    def _toc_level_pages(self):
+        """
+        Return the nested toctree levels which need a page of their own, as they are shards or dirs without a
+        ``main`` page from an sls object.
+
+        :return: list
+        """
+        return [
+            x
+            for x in self.toc_level.all_levels
+            if x is not self.toc_level and x.sls_obj is None
+        ]
+
+    def _write_toc_levels(self):
+        """
+        Write out the pages for the nested toctree levels without an sls object of their own.
+        """
+        template_obj = self.jinja_env.get_template("level.rst_t")
+
+        for level in self._toc_level_pages():
+            output_file = os.path.join(
+                self.build_root, level.docname.replace("/", os.path.sep) + ".rst"
+            )
+
+            start = time.perf_counter()
+            content = template_obj.render(level=level)
+            self._add_render_time(
+                level.docname, output_file, time.perf_counter() - start
             )
+            self._add_write_result(
+                output_file, *_write_rst_file(output_file, content, self.dry_run)
+            )
+
+    def _write_parallel(self, executor, jobs):
+        """
+        Render the rst files prepared by ``render_pool`` using its forked worker processes and write them out using a
+        pool of threads. The rendered content is the same as ``AutoSaltSLS.write_rst_files`` produces.
+
+        executor
+            ProcessPoolExecutor created by ``render_pool``
+
+        jobs
+            Number of threads to write files with
+        """
+        rst_files = self._rst_files
+
+        with ThreadPoolExecutor(max_workers=jobs) as writer:
+            contents = executor.map(
+                _render_rst_task,
+                [id(self)] * len(rst_files),
+                range(len(rst_files)),
+                chunksize=max(len(rst_files) // (jobs * 4), 1),
+            )
+
+            # Write each file out as soon as its content has been rendered
+            futures = []
+            for (sls_obj, output_file, template), (content, seconds) in zip(
+                rst_files, contents
+            ):
+                self._add_render_time(sls_obj.name, output_file, seconds)
+                futures.append(
+                    (
+                        output_file,
+                        writer.submit(
+                            _write_rst_file, output_file, content, self.dry_run
+                        ),
+                    )
+                )
+
+            for output_file, future in self._status_iterator(
+                futures,
+                bold(self.log_tag + "Generating rst files... "),
+                "darkgreen",
+                len(futures),
+                1,
+                stringify_func=lambda x: os.path.relpath(x[0], self.build_root),
+            ):
+                self._add_write_result(output_file, *future.result())
+
+    def _share_parse_results(self, duplicates):
+        """
+        Give the sls objects left out of ``_parse_parallel`` the result for the object with the same content that was
+        parsed.
+
+        duplicates
+            dict of the objects for each parse cache content key, with the one that was parsed first
+        """
+        for objs in duplicates.values():
+            for obj in objs[1:]:
+                self._parse_results[obj] = self._parse_results[objs[0]]
+                self.metrics.add(self.source, "parse_results_shared")
+
+    def _store_parse_result(self, sls_obj, result):
+        """
+        Keep a parse result for ``_parse_sls`` and add it to the parse cache.
+        """
+        self._parse_results[sls_obj] = result
+
+        if self.parse_cache is not None:
+            self.parse_cache.put(sls_obj, result)
+
+
+@contextmanager
+def render_pool(mappers, jobs):
+    """
+    Context manager that prepares the rst files for a list of mappers and yields a pool of forked worker processes to
+    render them with using ``AutoSaltSLSMapper.write``. The pool is started before returning, so it is safe to use from
+    other threads.
+
+    The workers need to inherit the prepared rst files, so None is yielded instead of a pool where the workers can't
+    safely be forked and ``AutoSaltSLSMapper.write`` renders the files in this process.
+
+    mappers
+        List of AutoSaltSLSMapper instances that will be written using the pool
+
+    jobs
+        Number of worker processes to use
+    """
+    if not _fork_available():
+        logger.debug(
+            "[AutoSaltSLS] Rendering in this process as worker processes can't be forked"
         )
+        yield None
+        return
 
-        # Render the template using Jinja
-        with open(index_file, "w") as outfile:
-            outfile.write(template_obj.render(obj=self))
+    for mapper in mappers:
+        _render_jobs[id(mapper)] = (mapper.jinja_env, mapper._prepare_render())
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=jobs, mp_context=multiprocessing.get_context("fork")
+        ) as executor:
+            start_pool(executor)
+            yield executor
+    finally:
+        for mapper in mappers:
+            _render_jobs.pop(id(mapper), None)
+
+
+def start_pool(executor):
+    """
+    Make sure the worker processes of a ProcessPoolExecutor have been started, so they are forked from the calling
+    thread rather than from whichever thread first submits some work.
+
+    executor
+        ProcessPoolExecutor instance
+    """
+    executor.submit(os.getpid).result()
 
 
 #
 # Private functions
 #
+
+# Jinja environments and lists of rst files to render for each mapper, inherited by forked render workers
+_render_jobs = {}
+
+
+def _fork_available():
+    """
+    Return whether the render workers can be forked from this process. There is no fork on Windows, and on macOS
+    forking is unsafe as system libraries may have started threads, which is why it is not the default there.
+    """
+    return (
+        "fork" in multiprocessing.get_all_start_methods() and sys.platform != "darwin"
+    )
+
+
+def _parse_sls_task(task):
+    """
+    Parse an sls file in a worker process and return the result as plain types so it can be passed back.
+    """
+    full_filename, basename, source_path, parent_name, topfile, parser = task
+
+    sls_obj = AutoSaltSLS(basename, source_path, None, parent_name=parent_name)
+    sls_obj.full_filename = full_filename
+    sls_obj.topfile = topfile
+
+    start = time.perf_counter()
+    size = sls_obj.parse_file(parser)
+
+    return sls_obj.get_parse_result(), time.perf_counter() - start, size
+
+
+def _render_rst_task(key, index):
+    """
+    Render an entry from an inherited list of rst files in a worker process, returning the content and the time
+    taken.
+    """
+    jinja_env, rst_files = _render_jobs[key]
+    sls_obj, output_file, template = rst_files[index]
+
+    start = time.perf_counter()
+    content = sls_obj.render_rst(jinja_env, output_file, template=template)
+
+    return content, time.perf_counter() - start
+
+
+def _write_rst_file(output_file, content, dry_run=False):
+    """
+    Write an rst file if its content has changed, returning whether it was (or for a dry run would be) written and the
+    time taken.
+    """
+    start = time.perf_counter()
+    written = write_file_if_changed(output_file, content, dry_run=dry_run)
+
+    return written, time.perf_counter() - start
+
+
 def _stringify_sls(sls_obj):
     return "{0} ({1})".format(sls_obj.name, sls_obj.filename,)
@@ -0,0 +1,307 @@
+"""
+AutoSaltSLS build metrics
+"""
+import heapq
+import json
+import os
+import threading
+
+from .utils import write_file_atomic
+
+# Counters kept for each source, in report order
+COUNTERS = [
+    "sls_files_parsed",
+    "bytes_read",
+    "parse_cache_hits",
+    "parse_cache_misses",
+    "parse_results_shared",
+    "files_written",
+    "files_skipped",
+]
+
+# Phases timed for each source, in report order
+PHASES = ["scan", "parse", "render", "write"]
+
+# Help text for the OpenMetrics families
+OPENMETRICS_HELP = {
+    "build_seconds": "Wall time spent generating the rst files for all sources",
+    "phase_seconds": "Time spent in each phase of generating the rst files, summed over the files for render and "
+    "write",
+    "sls_files_parsed": "Number of sls files parsed (not taken from the parse cache)",
+    "read_bytes": "Number of bytes read from parsed sls files",
+    "parse_cache_hits": "Number of sls files taken from the parse cache",
+    "parse_cache_misses": "Number of sls files missing from the parse cache",
+    "parse_results_shared": "Number of sls files given the parse result of an identical file parsed in the same "
+    "build",
+    "files_written": "Number of rst files written",
+    "files_skipped": "Number of rst files skipped as unchanged",
+    "slowest_file_seconds": "Time spent on the slowest files to parse or render",
+}
+
+
+class AutoSaltSLSMetrics(object):
+    """
+    Collects timings and counters while the rst files are generated. Instances are safe to share between the threads
+    used to process sources concurrently.
+
+    slowest : 10
+        Number of the slowest files to parse and render to keep
+    """
+
+    def __init__(self, slowest=10):
+        self.slowest = slowest
+        self.build_seconds = 0.0
+        self.sources = {}
+
+        # Min-heaps of (seconds, source, name, filename) so the fastest entry is dropped first
+        self._slowest_files = {"parse": [], "render": []}
+        self._lock = threading.Lock()
+
+    def add(self, source, counter, value=1):
+        """
+        Add to a counter for a source.
+
+        source
+            Source name
+
+        counter
+            Counter name from ``COUNTERS``
+
+        value : 1
+            Amount to add
+        """
+        with self._lock:
+            self._source(source)["counters"][counter] += value
+
+    def add_file_time(self, kind, source, name, filename, seconds):
+        """
+        Record the time taken for a single file so the slowest ones can be reported.
+
+        kind
+            'parse' or 'render'
+
+        source
+            Source name
+
+        name
+            Name of the sls object the file is for
+
+        filename
+            Full path of the sls file parsed or the rst file rendered
+
+        seconds
+            Time taken
+        """
+        if not self.slowest:
+            return
+
+        item = (seconds, source, name, filename)
+
+        with self._lock:
+            heap = self._slowest_files[kind]
+
+            if len(heap) < self.slowest:
+                heapq.heappush(heap, item)
+            elif seconds > heap[0][0]:
+                heapq.heapreplace(heap, item)
+
+    def add_phase_time(self, source, phase, seconds):
+        """
+        Add to the wall time recorded for a phase of a source.
+
+        source
+            Source name
+
+        phase
+            Phase name from ``PHASES``
+
+        seconds
+            Time taken
+        """
+        with self._lock:
+            self._source(source)["phases"][phase] += seconds
+
+    def as_dict(self):
+        """
+        Return all the metrics as a dict of plain types.
+
+        :return: dict
+        """
+        # Imported here to avoid a circular import with the package
+        from . import __version__
+
+        with self._lock:
+            totals = {x: 0 for x in COUNTERS}
+            for data in self.sources.values():
+                for counter, value in data["counters"].items():
+                    totals[counter] += value
+
+            return {
+                "version": __version__,
+                "build_seconds": self.build_seconds,
+                "counters": totals,
+                "sources": {
+                    source: {
+                        "phases": dict(data["phases"]),
+                        "counters": dict(data["counters"]),
+                    }
+                    for source, data in self.sources.items()
+                },
+                "slowest_parse": self._slowest_list("parse"),
+                "slowest_render": self._slowest_list("render"),
+            }
+
+    def write_json(self, filename):
+        """
+        Write the metrics to a JSON file.
+
+        filename
+            Full path of the file to write
+        """
+        write_file_atomic(filename, json.dumps(self.as_dict(), indent=2) + "\n")
+
+    def write_openmetrics(self, filename):
+        """
+        Write the metrics to a file in the OpenMetrics text format (e.g. for the Prometheus node exporter textfile
+        collector).
+
+        filename
+            Full path of the file to write
+        """
+        data = self.as_dict()
+        lines = []
+
+        def add_family(family, samples, unit=None):
+            lines.append("# TYPE autosaltsls_{0} gauge".format(family))
+            if unit:
+                lines.append("# UNIT autosaltsls_{0} {1}".format(family, unit))
+            lines.append(
+                "# HELP autosaltsls_{0} {1}".format(family, OPENMETRICS_HELP[family])
+            )
+
+            for labels, value in samples:
+                lines.append(
+                    "autosaltsls_{0}{1} {2}".format(
+                        family, _openmetrics_labels(labels), value
+                    )
+                )
+
+        add_family("build_seconds", [({}, data["build_seconds"])], unit="seconds")
+        add_family(
+            "phase_seconds",
+            [
+                ({"source": source, "phase": phase}, value)
+                for source, source_data in data["sources"].items()
+                for phase, value in source_data["phases"].items()
+            ],
+            unit="seconds",
+        )
+
+        for counter in COUNTERS:
+            add_family(
+                "read_bytes" if counter == "bytes_read" else counter,
+                [
+                    ({"source": source}, source_data["counters"][counter])
+                    for source, source_data in data["sources"].items()
+                ],
+                unit="bytes" if counter == "bytes_read" else None,
+            )
+
+        add_family(
+            "slowest_file_seconds",
+            [
+                (
+                    {"kind": kind, "source": x["source"], "file": x["filename"]},
+                    x["seconds"],
+                )
+                for kind in ["parse", "render"]
+                for x in data["slowest_" + kind]
+            ],
+            unit="seconds",
+        )
+
+        lines.append("# EOF")
+
+        write_file_atomic(filename, "\n".join(lines) + "\n")
+
+    #
+    # Private functions
+    #
+    def _slowest_list(self, kind):
+        """
+        Return the slowest files of a kind, slowest first.
+        """
+        return [
+            {"source": source, "name": name, "filename": filename, "seconds": seconds}
+            for seconds, source, name, filename in sorted(
+                self._slowest_files[kind], reverse=True
+            )
+        ]
+
+    def _source(self, source):
+        """
+        Return the data for a source, creating it if needed. Must be called with the lock held.
+        """
+        if source not in self.sources:
+            self.sources[source] = {
+                "phases": {x: 0.0 for x in PHASES},
+                "counters": {x: 0 for x in COUNTERS},
+            }
+
+        return self.sources[source]
+
+
+class AutoSaltSLSTraceFile(object):
+    """
+    JSON Lines file with a record for each sls file parsed, for debugging the parsing of a source without turning on
+    debug logging. Instances are safe to share between threads.
+
+    filename
+        Full path of the file to write, the dir is created if needed
+    """
+
+    def __init__(self, filename):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+        self.filename = filename
+        self._file = open(filename, "w")
+        self._lock = threading.Lock()
+
+    def close(self):
+        """
+        Close the file.
+        """
+        self._file.close()
+
+    def write(self, record):
+        """
+        Write a record to the file.
+
+        record
+            dict of plain types
+        """
+        line = json.dumps(record) + "\n"
+
+        with self._lock:
+            self._file.write(line)
+
+
+def _openmetrics_labels(labels):
+    """
+    Return a dict of labels formatted for an OpenMetrics sample.
+    """
+    if not labels:
+        return ""
+
+    return "{{{0}}}".format(
+        ",".join(
+            '{0}="{1}"'.format(
+                key,
+                str(value)
+                .replace("\\", "\\\\")
+                .replace('"', '\\"')
+                .replace("\n", "\\n"),
+            )
+            for key, value in labels.items()
+        )
+    )
@@ -10,16 +10,60 @@ from sphinx.errors import ExtensionError
 # noinspection PyUnresolvedReferences
 from sphinx.util.console import darkgreen, bold
 
+from .utils import write_file_if_changed
+
 logger = logging.getLogger(__name__)
 
+# Entry directive attribute names
+ENTRY_DIRECTIVES = (
+    "environment",
+    "include",
+    "show_id",
+    "step",
+    "step_id",
+    "summary_id",
+    "topfile_id",
+)
+
+# Bit flags for the entry directives, packed into ``AutoSaltSLSEntry.flags``
+ENTRY_DIRECTIVE_FLAGS = {x: 1 << index for index, x in enumerate(ENTRY_DIRECTIVES)}
+
+# Extra entry flag set when a packed entry has any text lines
+ENTRY_HAS_TEXT = 1 << len(ENTRY_DIRECTIVES)
+
+# Directive combinations used when processing entries
+PREPEND_ID_FLAGS = (
+    ENTRY_DIRECTIVE_FLAGS["environment"]
+    | ENTRY_DIRECTIVE_FLAGS["step_id"]
+    | ENTRY_DIRECTIVE_FLAGS["summary_id"]
+    | ENTRY_DIRECTIVE_FLAGS["topfile_id"]
+)
+PROCESS_ID_FLAGS = PREPEND_ID_FLAGS | ENTRY_DIRECTIVE_FLAGS["show_id"]
+STEP_FLAGS = ENTRY_DIRECTIVE_FLAGS["step"] | ENTRY_DIRECTIVE_FLAGS["step_id"]
+
+
+def _directive_property(directive):
+    """
+    Return a property to get and set the bit flag for an entry directive as a bool.
+    """
+    flag = ENTRY_DIRECTIVE_FLAGS[directive]
+
+    def getter(self):
+        return bool(self.flags & flag)
+
+    def setter(self, value):
+        if value:
+            self.flags |= flag
+        else:
+            self.flags &= ~flag
+
+    return property(getter, setter, doc="'{0}' directive flag".format(directive))
+
 
 class AutoSaltSLS(object):
     """
     Object representation of an sls file or directory.
 
-    app
-        Sphinx application instance
-
     basename
         sls filename or group name
         (e.g. 'ssl_enabled.sls' or 'apache')
@@ -38,16 +82,42 @@ class AutoSaltSLS(object):
         URL root to the source control viewable files location
     """
 
+    __slots__ = (
+        "all_includes",
+        "basename",
+        "children",
+        "docname",
+        "entries",
+        "filename",
+        "format",
+        "full_filename",
+        "hidden",
+        "include",
+        "included_by",
+        "initfile",
+        "parent_name",
+        "parsed",
+        "rst_filename",
+        "source_path",
+        "source_settings",
+        "source_url",
+        "source_url_root",
+        "toc_level",
+        "top_pages",
+        "topfile",
+        "_header_entry",
+        "_include_items",
+        "_text_buffer",
+    )
+
     def __init__(
         self,
-        app,
         basename,
         source_path,
         source_settings,
         parent_name=None,
         source_url_root=None,
     ):
-        self.app = app
         self.basename, self.filename = self._parse_name(basename)
         self.source_path = source_path
         self.parent_name = parent_name
@@ -66,13 +136,19 @@ class AutoSaltSLS(object):
         self.initfile = True if self.filename == "init.sls" else False
         self.children = []
         self.entries = []
-        self.steps = []
         self.include = None
+        self.included_by = ()
+        self.all_includes = ()
         self.source_url = None
+        self.toc_level = None
+        self.top_pages = ()
         self.docname = None
+        self.parsed = False
 
         # Internal properties
         self._header_entry = None
+        self._include_items = None
+        self._text_buffer = None
 
         # Work out some related filenames
         if self.filename:
@@ -98,19 +174,42 @@ class AutoSaltSLS(object):
 
     def add_entry(self, entry):
         """
-        Add an AutoSaltSLSEntry entry object to this instance. If the entry is a step append it to the list of
-        steps instead.
+        Add an AutoSaltSLSEntry entry object to this instance. If the entry is an include it is also stored as the
+        ``include`` entry.
 
         entry
             An AutoSaltSLSEntry instance
         """
         self.entries.append(entry)
+        self._include_items = None
 
         # Do some entry-specific processing
         if entry.include:
             self.include = entry
-        elif entry.is_step:
-            self.steps.append(entry)
+
+    def apply_parse_result(self, result):
+        """
+        Replace the parsed data for this instance with a result previously generated by ``get_parse_result``.
+
+        result
+            dict as returned by ``get_parse_result``
+        """
+        self.format = result["format"]
+        self.hidden = result["hidden"]
+        self.topfile = result["topfile"]
+
+        # Clear out any old entries
+        self.entries = []
+        self.include = None
+        self._header_entry = None
+        self._include_items = None
+        self._text_buffer = result["text"]
+
+        for entry_data in result["entries"]:
+            self.add_entry(AutoSaltSLSEntry.from_dict(entry_data, self._text_buffer))
+
+        self._resolve_relative_includes()
+        self.parsed = True
 
     @property
     def annotated_body(self):
@@ -150,6 +249,52 @@ class AutoSaltSLS(object):
         """
         return "\n\n".join([x.text for x in self.body])
 
+    def copy_parsed(self, other):
+        """
+        Take the parsed data from another instance for the same sls file (e.g. from a previous scan) so the file
+        does not need to be parsed again.
+
+        other
+            AutoSaltSLS instance
+        """
+        self.format = other.format
+        self.hidden = other.hidden
+        self.topfile = other.topfile
+        self.entries = other.entries
+        self.include = other.include
+        self._header_entry = None
+        self._include_items = other._include_items
+        self._text_buffer = other._text_buffer
+        self.parsed = other.parsed
+
+    def get_parse_result(self):
+        """
+        Return the data extracted by ``parse_file`` as a dict of plain types so it can be cached and re-applied
+        later with ``apply_parse_result``. Relative includes are returned as written, so the result only depends on
+        the content of the file and can be applied to any sls object with the same content.
+
+        :return: dict
+        """
+        if self._text_buffer is None:
+            self.pack_entries()
+
+        entries = []
+        for entry in self.entries:
+            entry_data = entry.as_dict()
+            entry_data["includes"] = [
+                x.split(" <", 1)[0] if x.startswith(".") else x
+                for x in entry_data["includes"]
+            ]
+            entries.append(entry_data)
+
+        return {
+            "format": self.format,
+            "hidden": self.hidden,
+            "topfile": self.topfile,
+            "text": self._text_buffer,
+            "entries": entries,
+        }
+
     @property
     def header(self):
         """
@@ -165,6 +310,46 @@ class AutoSaltSLS(object):
 
         return self._header_entry
 
+    @property
+    def include_items(self):
+        """
+        Return the items from the include entries, or from the ``topfile_id`` entries for a top file. They are worked
+        out once per parse as the include graph needs them for every object on every build.
+
+        :return: list
+            Tuples of (text as written in the sls file, target sls name with any relative include resolved)
+        """
+        if self._include_items is not None:
+            return self._include_items
+
+        items = []
+
+        for entry in self.entries:
+            if entry.include or entry.topfile_id:
+                for include in entry.includes:
+                    # Relative includes are stored as 'text <target>'
+                    if include.endswith(">") and "<" in include:
+                        index = include.rindex("<")
+                        items.append(
+                            (include[:index].strip(), include[index + 1 : -1].strip())
+                        )
+                    else:
+                        items.append((include.strip(), include.strip()))
+
+        self._include_items = items
+
+        return items
+
+    @property
+    def include_targets(self):
+        """
+        Return the sls names referenced by the include entries, or by the ``topfile_id`` entries for a top file, with
+        any relative includes resolved.
+
+        :return: list
+        """
+        return [x[1] for x in self.include_items]
+
     @property
     def name(self):
         """
@@ -194,12 +379,82 @@ class AutoSaltSLS(object):
 
         template : None
             Template file to use. Defaults to 'top.rst_t' for a topfile or 'sls.rst_t' otherwise
+
+        :return: bool (True if the file was written, False if it was already up to date)
         """
         if filename is None:
             filename = self.rst_filename
 
         output_file = os.path.join(output_dir, filename)
 
+        # Render the template using Jinja and only replace the file if the content has changed
+        return write_file_if_changed(
+            output_file, self.render_rst(jinja_env, output_file, template=template)
+        )
+
+    def parse_file(self, parser=None):
+        """
+        Read the associated sls file, create an AutoSaltSLSEntry object for any comment blocks found and add them as
+        entries.
+
+        parser : None
+            AutoSaltSLSParser instance to use, one is created from the source settings if not supplied
+
+        :return: int (count of bytes read)
+        """
+        if parser is None:
+            # Imported here as the parser module depends on this one
+            from .parser import AutoSaltSLSParser
+
+            parser = AutoSaltSLSParser(self.source_settings)
+
+        size = parser.parse(self)
+        self._resolve_relative_includes()
+        self.parsed = True
+
+        return size
+
+    def pack_entries(self):
+        """
+        Move the text of all the entries into one buffer shared between them, so each entry only needs to hold
+        offsets into it rather than its own lines and strings.
+        """
+        texts = [x.text for x in self.entries]
+        self._text_buffer = "\n\n".join(texts)
+
+        start = 0
+        for entry, text in zip(self.entries, texts):
+            entry.pack(self._text_buffer, start)
+            start += len(text) + 2
+
+    @property
+    def prefixed_name(self):
+        """
+        Return the full dot-separated name of the sls object (e.g. apache.sls_configured) with the source-specific
+        prefix applied.
+
+        :return: str
+        """
+        if self.source_settings.prefix:
+            return self.source_settings.prefix + self.name
+
+        return self.name
+
+    def render_rst(self, jinja_env, output_file, template=None):
+        """
+        Render the rst content for this sls object.
+
+        jinja_env
+            Jinja Environment object to use when rendering templates
+
+        output_file
+            Full path of the file the content is for
+
+        template : None
+            Template file to use. Defaults to 'top.rst_t' for a topfile or 'sls.rst_t' otherwise
+
+        :return: str
+        """
         # Get the Jinja template
         if not template:
             template = "top.rst_t" if self.topfile else "sls.rst_t"
@@ -212,201 +467,107 @@ class AutoSaltSLS(object):
             )
         )
 
-        # Render the template using Jinja
-        with open(output_file, "w") as outfile:
-            outfile.write(template_obj.render(sls=self))
+        return template_obj.render(sls=self)
 
-    def parse_file(self):
+    def rst_files(self, build_root_dir):
         """
-        Read the associated sls file, create an AutoSaltSLSEntry object for any comment blocks found and add them as
-        entries.
+        Return the list of rst files ``write_rst_files`` generates for this object and all children.
+
+        build_root_dir
+            Root dir for the source output files
+
+        :return: list
+            Tuples of (AutoSaltSLS instance, output file, template)
         """
-        if self.full_filename:
-            with open(self.full_filename) as sls_file:
-                entry = None
-                included = False
-                line_no = 0
-
-                # Read each line
-                for line in sls_file:
-                    line_no += 1
-
-                    # Remove the newline
-                    line = line.strip("\n")
-
-                    # Grab the file format from the first line of the file
-                    if line.startswith("#!") and line_no == 1:
-                        self.format = line.replace("#!", "", 1).strip()
-
-                    # Skip lines starting with comment ignore prefix (e.g. '#!')
-                    if self._check_line_startswith(
-                        line, self.source_settings.comment_ignore_prefix
-                    ):
-                        continue
-
-                    # Start a block and create an AutoSaltSLSEntry object when we get the doc prefix (e.g. '###')
-                    if self._check_line_startswith(
-                        line, self.source_settings.doc_prefix
-                    ):
-                        # Finish any current entry and store it in case we have two concurrent blocks without
-                        # any lines in between
-                        if entry:
-                            self.add_entry(entry)
-
-                        # Start a new entry
-                        entry = AutoSaltSLSEntry()
-
-                        # Strip off the prefix
-                        line = line.replace(self.source_settings.doc_prefix, "", 1)
-
-                        # Check for directive keywords, stripping spaces from the fields
-                        if line and not line.isspace():
-                            directives = [x.strip() for x in line.split(",")]
-
-                            # Process directives
-                            ignore = False
-                            for directive in directives:
-                                # 'hidden' marks the file as not to have documentation generated so we might as well
-                                # treat it as 'ignore' too
-                                if "hidden" in directives:
-                                    logger.debug(
-                                        "[AutoSaltSLS] Marking sls {0} as hidden due to directive".format(
-                                            self.basename
-                                        )
-                                    )
-                                    self.hidden = True
-                                    ignore = True
-                                # 'ignore' halts all processing for this file
-                                elif directive == "ignore":
-                                    logger.debug(
-                                        "[AutoSaltSLS] Aborting processing of sls {0} due to 'ignore' directive".format(
-                                            self.basename
-                                        )
-                                    )
-                                    ignore = True
-                                # 'topfile' is an sls directive
-                                elif directive == "topfile":
-                                    logger.debug(
-                                        "[AutoSaltSLS] Marking sls {0} as top file due to directive".format(
-                                            self.basename
-                                        )
-                                    )
-                                    self.topfile = True
-                                # Everything else is for an entry
-                                elif hasattr(entry, directive):
-                                    setattr(entry, directive, True)
-
-                            # Check the ignore flag and stop processing
-                            if ignore:
-                                break
-                        continue
-
-                    # End the block
-                    if entry and not self._check_line_startswith(
-                        line, self.source_settings.comment_prefix,
-                    ):
-                        # Capture the first line (YAML ID) as content
-                        if entry.process_id():
-                            # Line ending with a colon
-                            if line[-1] == ":":
-                                line = line[:-1]
-                            # In-line sls in a top file
-                            elif entry.topfile_id and ":" in line:
-                                fields = line.split(":")
-                                entry.add_include(fields[1].strip())
-                                line = fields[0].strip()
-
-                            if entry.prepend_id:
-                                # Prepend with a newline so the summary is correctly identified later
-                                entry.prepend_line("")
-
-                                # Remove any leading whitespace as the summary has to be left-justified
-                                if self.app.config.autosaltsls_indented_comments:
-                                    line = line.lstrip(" ")
-
-                                entry.prepend_line(line)
-
-                                # Clear the process_id flag and force another line to be read so we can parse the
-                                # block entries as includes
-                                if entry.topfile_id:
-                                    entry.process_id(False)
-                                    continue
-                            else:
-                                entry.append_line(line)
-
-                        # Read all the include or topfile entries (flag set by directive above)
-                        elif entry.include or entry.topfile_id:
-                            if "include:" in line:
-                                included = True
-                                continue
-                            elif (
-                                (included or entry.topfile_id)
-                                and line
-                                and not line.isspace()
-                            ):
-                                # Use regex to match an include entry and store it
-                                # First non-match will trigger block end
-                                match = re.search("^\s+-\s+([\s\w\-.:]+)", line)
-                                if match:
-                                    text = match.group(1)
-
-                                    if "match:" in text:
-                                        entry.match_type = text.replace(
-                                            "match:", ""
-                                        ).strip()
-                                        continue
-                                    if text.startswith("."):
-                                        text = "{0} <{1}{2}>".format(
-                                            text,
-                                            self.parent_name
-                                            if self.parent_name
-                                            else self.name,
-                                            text,
-                                        )
-
-                                    entry.add_include(text)
-                                    continue
-
-                                # Skip any jinja directives within the includes
-                                if "{%" in line or "{%" in line:
-                                    continue
-
-                        # Add the entry to the main list
-                        self.add_entry(entry)
-                        entry = None
-
-                        continue
-
-                    # Any other comment line within an active block is part of the entry
-                    if entry and self._check_line_startswith(
-                        line, self.source_settings.comment_prefix
-                    ):
-                        if self.app.config.autosaltsls_indented_comments:
-                            line = line.lstrip(" ")
-
-                        line = line.replace(self.source_settings.comment_prefix, "", 1)
-
-                        if self.app.config.autosaltsls_remove_first_space:
-                            line = line[1:]
-
-                        entry.append_line(line)
-
-            # Catch there being no content after the comment document
-            if entry:
-                self.add_entry(entry)
+        if self.children:
+            output_dir = os.path.join(
+                build_root_dir, self.basename.replace(".", os.path.sep)
+            )
 
-    @property
-    def prefixed_name(self):
+            files = [(self, os.path.join(output_dir, "main.rst"), "main.rst_t")]
+
+            if self.initfile:
+                files.append((self, os.path.join(output_dir, self.rst_filename), None))
+
+            for sls_obj in self.children:
+                files.append(
+                    (sls_obj, os.path.join(output_dir, sls_obj.rst_filename), None)
+                )
+
+                # Top files in a dir are split the same as top files at the root
+                for page in sls_obj.top_pages:
+                    files.append(
+                        (
+                            page,
+                            os.path.join(output_dir, page.rst_filename),
+                            "top_env.rst_t",
+                        )
+                    )
+
+            return files
+
+        files = [(self, os.path.join(build_root_dir, self.rst_filename), None)]
+
+        # The page of a split top file is an overview of the pages for its environments
+        for page in self.top_pages:
+            files.append(
+                (page, os.path.join(build_root_dir, page.rst_filename), "top_env.rst_t")
+            )
+
+        return files
+
+    def split_top_file(self, chunk_size=0):
         """
-        Return the full dot-separated name of the sls object (e.g. apache.sls_configured) with the source-specific
-        prefix applied.
+        Split the targets of a top file across a page for each ``environment`` entry, which ``rst_files`` then
+        returns along with the page for the top file itself. That page is rendered as an overview listing the
+        environment pages. A top file without any environment entries is not split.
 
-        :return: str
+        chunk_size : 0
+            Largest number of ``topfile_id`` entries on a page, environments with more are split across several pages.
+            Environments are not chunked if 0
+
+        :return: list (the AutoSaltSLSTopPage instances, also kept in ``top_pages``)
         """
-        if self.source_settings.prefix:
-            return self.source_settings.prefix + self.name
+        pages = []
+        base = os.path.splitext(self.rst_filename)[0]
+        keys = set()
+
+        for environment, entries in self.top_environments:
+            if environment is None:
+                continue
+
+            # Environment names are used in the page filenames
+            key = re.sub(r"[^\w-]+", "_", environment.summary) or "_"
+            while key in keys:
+                key += "_"
+            keys.add(key)
+
+            size = chunk_size if chunk_size > 0 else max(len(entries), 1)
+            chunks = [entries[x : x + size] for x in range(0, len(entries), size)]
+
+            for index, chunk in enumerate(chunks or [[]]):
+                rst_filename = "{0}.{1}.rst".format(base, key)
+                if len(chunks) > 1:
+                    rst_filename = "{0}.{1}.{2}.rst".format(base, key, index + 1)
+
+                pages.append(
+                    AutoSaltSLSTopPage(
+                        self, environment, chunk, index + 1, len(chunks), rst_filename
+                    )
+                )
 
-        return self.name
+        self.top_pages = pages
+
+        return pages
+
+    @property
+    def steps(self):
+        """
+        Return the list of entries that are steps.
+
+        :return: list
+        """
+        return [x for x in self.entries if x.is_step and not x.include]
 
     def set_initfile(self, rst_filename=None):
         """
@@ -453,6 +614,42 @@ class AutoSaltSLS(object):
 
         return title
 
+    @property
+    def top_environments(self):
+        """
+        Return the body entries of a top file grouped by the ``environment`` entry they follow.
+
+        :return: list
+            Tuples of (environment entry, list of the other entries up to the next environment entry). The environment
+            is None for any entries before the first environment entry
+        """
+        groups = [(None, [])]
+
+        for entry in self.body:
+            if entry.environment:
+                groups.append((entry, []))
+            else:
+                groups[-1][1].append(entry)
+
+        if not groups[0][1]:
+            del groups[0]
+
+        return groups
+
+    @property
+    def top_overview_entries(self):
+        """
+        Return the body entries of a split top file which are output on its overview page, i.e. those before the
+        first ``environment`` entry.
+
+        :return: list
+        """
+        groups = self.top_environments
+        if groups and groups[0][0] is None:
+            return groups[0][1]
+
+        return []
+
     @property
     def toc_entry(self):
         """
@@ -468,7 +665,7 @@ class AutoSaltSLS(object):
         return toc_entry
 
     def write_rst_files(
-        self, jinja_env, build_root_dir,
+        self, jinja_env, build_root_dir, split_top_file=False, top_chunk_size=0,
     ):
         """
         Write the rst files for this object and all children.
@@ -479,67 +676,55 @@ class AutoSaltSLS(object):
         build_root_dir
             Root dir for the source output files
 
-        :return: int
-            Count of files created
+        split_top_file : False
+            Write a page for each environment of a top file and an overview page, see ``split_top_file``
+
+        top_chunk_size : 0
+            Largest number of targets on an environment page of a split top file, 0 for no limit
+
+        :return: tuple
+            Count of files written and count of files skipped as unchanged
         """
-        file_count = 0
+        for sls_obj in [self] + self.children:
+            if sls_obj.topfile and split_top_file:
+                sls_obj.split_top_file(chunk_size=top_chunk_size)
+            else:
+                sls_obj.top_pages = ()
 
-        if self.children:
-            # Create the parent dir
-            output_dir = os.path.join(
-                build_root_dir, self.basename.replace(".", os.path.sep)
-            )
+        results = []
 
+        for sls_obj, output_file, template in self.rst_files(build_root_dir):
+            output_dir = os.path.dirname(output_file)
+
+            # Create the parent dir
             if not os.path.exists(output_dir):
                 logger.debug(
                     "[AutoSaltSLS] Creating build dir '{0}'".format(output_dir)
                 )
 
+                # Dirs without sls files have no object of their own so may need creating too
                 try:
-                    os.mkdir(output_dir)
+                    os.makedirs(output_dir, exist_ok=True)
                 except PermissionError:
                     raise ExtensionError(
                         "Could not create '{0}', permission denied".format(output_dir)
                     )
 
-            # Generate the main index
-            self.output_rst(
-                jinja_env, output_dir, filename="main.rst", template="main.rst_t"
+            # Render the template using Jinja and only replace the file if the content has changed
+            results.append(
+                write_file_if_changed(
+                    output_file,
+                    sls_obj.render_rst(jinja_env, output_file, template=template),
+                )
             )
-            file_count += 1
-
-            # Write out our init base file
-            if self.initfile:
-                self.output_rst(jinja_env, output_dir)
 
-            # Generate the base files for the children
-            for sls_obj in self.children:
-                sls_obj.output_rst(jinja_env, output_dir)
-                file_count += 1
-        else:
-            self.output_rst(jinja_env, build_root_dir)
-            file_count += 1
+        written_count = results.count(True)
 
-        return file_count
+        return written_count, len(results) - written_count
 
     #
     # Private functions
     #
-    def _check_line_startswith(
-        self, line, pattern,
-    ):
-        """
-        Check if a line starts with a pattern, optionally ignoring leading spaces if ``autosaltsls_indented_comments``
-        is set.
-        """
-        if self.app.config.autosaltsls_indented_comments:
-            line = line.lstrip(" ")
-
-        if line.startswith(pattern):
-            return True
-
-        return False
-
     @staticmethod
     def _parse_name(basename):
         # Replace the path separator with a dot
@@ -550,12 +735,139 @@ class AutoSaltSLS(object):
 
         return basename, ""
 
+    def _resolve_relative_includes(self):
+        """
+        Store relative includes (e.g. '.config') as 'text <target>', with the target under the dir of the sls file.
+        """
+        base = self.parent_name or self.name
+
+        for entry in self.entries:
+            if any(x.startswith(".") and not x.endswith(">") for x in entry.includes):
+                entry.includes = [
+                    "{0} <{1}{0}>".format(x, base)
+                    if x.startswith(".") and not x.endswith(">")
+                    else x
+                    for x in entry.includes
+                ]
+
+        self._include_items = None
+
+
+class AutoSaltSLSTopPage(object):
+    """
+    Page for the targets of one environment of a split top file, or a chunk of them for a large environment.
+
+    sls
+        AutoSaltSLS instance for the top file
+
+    environment
+        AutoSaltSLSEntry for the ``environment`` entry
+
+    entries
+        List of the entries following the environment entry to output on the page
+
+    chunk
+        Number of the page for the environment, starting at 1
+
+    chunk_count
+        Number of pages for the environment
+
+    rst_filename
+        Filename for the page, in the same dir as the page for the top file
+    """
+
+    __slots__ = (
+        "chunk",
+        "chunk_count",
+        "entries",
+        "environment",
+        "rst_filename",
+        "sls",
+    )
+
+    def __init__(self, sls, environment, entries, chunk, chunk_count, rst_filename):
+        self.sls = sls
+        self.environment = environment
+        self.entries = entries
+        self.chunk = chunk
+        self.chunk_count = chunk_count
+        self.rst_filename = rst_filename
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def docname(self):
+        """
+        Return the document name of the page relative to the page for the top file.
+
+        :return: str
+        """
+        return os.path.splitext(self.rst_filename)[0]
+
+    @property
+    def label(self):
+        """
+        Return the text for the page in the overview toctree (e.g. 'Environment: base (2 of 3)').
+
+        :return: str
+        """
+        label = "Environment: {0}".format(self.environment.summary)
+
+        if self.chunk_count > 1:
+            label += " ({0} of {1})".format(self.chunk, self.chunk_count)
+
+        return label
+
+    @property
+    def name(self):
+        """
+        Return the name of the page for logging (e.g. 'top [base 2]').
+
+        :return: str
+        """
+        if self.chunk_count > 1:
+            return "{0} [{1} {2}]".format(
+                self.sls.name, self.environment.summary, self.chunk
+            )
+
+        return "{0} [{1}]".format(self.sls.name, self.environment.summary)
+
+    def render_rst(self, jinja_env, output_file, template=None):
+        """
+        Render the rst content for the page.
+
+        jinja_env
+            Jinja Environment object to use when rendering templates
+
+        output_file
+            Full path of the file the content is for
+
+        template : None
+            Template file to use. Defaults to 'top_env.rst_t'
+
+        :return: str
+        """
+        template_obj = jinja_env.get_template(template or "top_env.rst_t")
+
+        logger.debug(
+            "[AutoSaltSLS] Rendering file '{0}' for {1} using '{2}'".format(
+                output_file, self.name, template_obj.filename,
+            )
+        )
+
+        return template_obj.render(sls=self.sls, page=self)
+
 
 class AutoSaltSLSEntry(object):
     """
     Object representation of an sls file comment block. The data is logically split into a summary (all text to the
     first blank line) and content (the rest).
 
+    While an entry is being built its text is held as a list of lines. Once it is complete ``pack`` moves the text
+    into a buffer, usually shared with the other entries for the same sls file, and only the offsets of the summary
+    and content within it are kept.
+
     text : None
         Initial text to place in ``lines``
 
@@ -595,32 +907,47 @@ class AutoSaltSLSEntry(object):
              lines to extract the matching criteria and sub-lines for generating cross-references
     """
 
+    __slots__ = (
+        "flags",
+        "includes",
+        "match_type",
+        "_content_start",
+        "_end",
+        "_lines",
+        "_process_id",
+        "_start",
+        "_summary_end",
+        "_text",
+    )
+
     def __init__(self, text=None):
-        self.lines = []
-        self.includes = []
+        self.flags = 0
         self.match_type = None
 
-        # Directives
-        self.environment = False
-        self.include = False
-        self.show_id = False
-        self.step = False
-        self.step_id = False
-        self.summary_id = False
-        self.topfile_id = False
+        # Most entries don't have includes so they share an empty tuple until one is added
+        self.includes = ()
 
         # Internal properties
-        self._summary = None
-        self._content = None
+        self._lines = text.splitlines() if text is not None else []
+        self._text = None
+        self._start = 0
+        self._summary_end = 0
+        self._content_start = 0
+        self._end = 0
         self._process_id = None
 
-        # Initialise with any text we've been given
-        if text is not None:
-            self.lines = text.splitlines()
-
     def __str__(self):
         return self.text
 
+    # Directives
+    environment = _directive_property("environment")
+    include = _directive_property("include")
+    show_id = _directive_property("show_id")
+    step = _directive_property("step")
+    step_id = _directive_property("step_id")
+    summary_id = _directive_property("summary_id")
+    topfile_id = _directive_property("topfile_id")
+
     def add_include(self, include):
         """
         Add an include statement to the list and set the ``include`` property.
@@ -628,8 +955,11 @@ class AutoSaltSLSEntry(object):
         include
             Include statement to add
         """
+        if not self.includes:
+            self.includes = []
+
         self.includes.append(include.strip(" "))
-        self.include = True
+        self.flags |= ENTRY_DIRECTIVE_FLAGS["include"]
 
     @property
     def annotated_text(self):
@@ -650,6 +980,32 @@ class AutoSaltSLSEntry(object):
 
         return output
 
+    @property
+    def directives(self):
+        """
+        Return the names of the directives set for the entry.
+
+        :return: list
+        """
+        return [x for x in ENTRY_DIRECTIVES if self.flags & ENTRY_DIRECTIVE_FLAGS[x]]
+
+    def as_dict(self):
+        """
+        Return the entry data as a dict of plain types. The text is not included, only the offsets into the buffer
+        the entry was last packed into.
+
+        :return: dict
+        """
+        if self._lines is not None:
+            self.pack(self.text, 0)
+
+        return {
+            "flags": self.flags,
+            "offsets": (self._start, self._summary_end, self._content_start, self._end),
+            "includes": list(self.includes),
+            "match_type": self.match_type,
+        }
+
     def append_line(self, text):
         """
         Append some text to the content lines.
@@ -657,10 +1013,8 @@ class AutoSaltSLSEntry(object):
         text
             Text to append to the content lines
         """
-        self.lines.append(text)
-
-        # Reset the internal content property
-        self._content = None
+        self._unpack()
+        self._lines.append(text)
 
     @property
     def content(self):
@@ -669,10 +1023,37 @@ class AutoSaltSLSEntry(object):
 
         :return: str
         """
-        if self._content is None:
-            self._split_lines()
+        if self._lines is not None:
+            self.pack(self.text, 0)
+
+        return self._text[self._content_start : self._end]
+
+    @classmethod
+    def from_dict(cls, data, text):
+        """
+        Create an entry from a dict generated by ``as_dict``.
+
+        data
+            dict of entry data
+
+        text
+            Text buffer the offsets in the entry data refer to
+
+        :return: AutoSaltSLSEntry
+        """
+        entry = cls()
+        entry.flags = data["flags"]
+        if data["includes"]:
+            entry.includes = list(data["includes"])
+        entry.match_type = data["match_type"]
 
-        return self._content
+        entry._lines = None
+        entry._text = text
+        entry._start, entry._summary_end, entry._content_start, entry._end = data[
+            "offsets"
+        ]
+
+        return entry
 
     @property
     def has_text(self):
@@ -681,7 +1062,10 @@ class AutoSaltSLSEntry(object):
 
         :return: bool
         """
-        return True if self.lines else False
+        if self._lines is None:
+            return bool(self.flags & ENTRY_HAS_TEXT)
+
+        return bool(self._lines)
 
     @property
     def is_step(self):
@@ -690,7 +1074,58 @@ class AutoSaltSLSEntry(object):
 
         :return: bool
         """
-        return self.step or self.step_id
+        return bool(self.flags & STEP_FLAGS)
+
+    @property
+    def lines(self):
+        """
+        Return the list of text lines.
+
+        :return: list
+        """
+        if self._lines is None:
+            return self.text.split("\n") if self.flags & ENTRY_HAS_TEXT else []
+
+        return self._lines
+
+    def pack(self, text, start):
+        """
+        Stop holding the text as a list of lines and refer to it in a text buffer instead. The summary and content
+        offsets are worked out here so they don't need to be kept as separate strings.
+
+        text
+            Text buffer containing the text of this entry
+
+        start
+            Offset of the text of this entry within the buffer
+        """
+        lines = self.lines
+        end = start + sum(len(x) + 1 for x in lines) - 1 if lines else start
+
+        # The summary is everything down to the first blank line and the content is everything after it
+        summary_end = end
+        content_start = end
+        offset = start
+
+        for line in lines:
+            if line == "" or line.isspace():
+                summary_end = max(offset - 1, start)
+                content_start = min(offset + len(line) + 1, end)
+                break
+
+            offset += len(line) + 1
+
+        if lines:
+            self.flags |= ENTRY_HAS_TEXT
+        else:
+            self.flags &= ~ENTRY_HAS_TEXT
+
+        self._lines = None
+        self._text = text
+        self._start = start
+        self._summary_end = summary_end
+        self._content_start = content_start
+        self._end = end
 
     @property
     def prepend_id(self):
@@ -699,10 +1134,7 @@ class AutoSaltSLSEntry(object):
 
         :return: bool
         """
-        if self.summary_id or self.step_id or self.environment or self.topfile_id:
-            return True
-
-        return False
+        return bool(self.flags & PREPEND_ID_FLAGS)
 
     def prepend_line(self, text):
         """
@@ -711,10 +1143,8 @@ class AutoSaltSLSEntry(object):
         text
             Text to add to the start of the content lines
         """
-        self.lines.insert(0, text)
-
-        # Reset the internal content property
-        self._content = None
+        self._unpack()
+        self._lines.insert(0, text)
 
     def process_id(self, new_val=None):
         """
@@ -726,13 +1156,7 @@ class AutoSaltSLSEntry(object):
         if new_val is not None:
             self._process_id = new_val
         elif self._process_id is None:
-            if (
-                self.show_id
-                or self.summary_id
-                or self.step_id
-                or self.environment
-                or self.topfile_id
-            ):
+            if self.flags & PROCESS_ID_FLAGS:
                 self._process_id = True
 
         return self._process_id
@@ -744,10 +1168,10 @@ class AutoSaltSLSEntry(object):
 
         :return: str
         """
-        if self._summary is None:
-            self._split_lines()
+        if self._lines is not None:
+            self.pack(self.text, 0)
 
-        return self._summary
+        return self._text[self._start : self._summary_end]
 
     @property
     def text(self):
@@ -756,39 +1180,18 @@ class AutoSaltSLSEntry(object):
 
         :return: str
         """
-        return "\n".join(self.lines)
+        if self._lines is None:
+            return self._text[self._start : self._end]
+
+        return "\n".join(self._lines)
 
     #
     # Private Functions
     #
-    def _split_lines(self):
+    def _unpack(self):
         """
-        Split the content lines list into a summary (text to first blank line) and body (the rest).
+        Go back to holding the text as a list of lines so it can be changed.
         """
-        summary = []
-        content = []
-
-        # Reset the summary so we can use it as a flag
-        self._summary = None
-
-        if self.lines:
-            self._content = ""
-
-            for line in self.lines:
-                if self._summary is None:
-                    # Got the first blank line
-                    if line == "" or line.isspace():
-                        self._summary = "\n".join(summary)
-                        continue
-                    summary.append(line)
-                else:
-                    content.append(line)
-
-            if summary and self._summary is None:
-                self._summary = "\n".join(summary)
-
-            if content:
-                self._content = "\n".join(content)
-        else:
-            self._summary = ""
-            self._content = ""
+        if self._lines is None:
+            self._lines = self.lines
+            self._text = None
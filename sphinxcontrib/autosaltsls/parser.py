@@ -0,0 +1,317 @@
+"""
+AutoSaltSLS sls file comment block parser
+"""
+import locale
+import mmap
+import os
+import re
+
+from sphinx.util import logging
+
+from .objects import AutoSaltSLSEntry, ENTRY_DIRECTIVE_FLAGS
+
+logger = logging.getLogger(__name__)
+
+# Line classes, matching the group numbers in the line classifier regex
+LINE_CODE = 0
+LINE_IGNORE = 1
+LINE_DOC = 2
+LINE_COMMENT = 3
+
+# Files at least this size are memory-mapped rather than read into memory
+MMAP_THRESHOLD = 1024 * 1024
+
+# Regex to match an item in an include or top file list
+INCLUDE_REGEX = r"^\s+-\s+([\s\w\-.:]+)"
+
+
+class AutoSaltSLSParser(object):
+    """
+    Parser for the comment blocks in sls files. The parse settings are resolved and the regular expressions compiled
+    once so a single instance can be used for all the files in a source. Instances can be pickled so they can be sent
+    to worker processes.
+
+    settings
+        AutoSaltSLSMapperSettings object (or any object with the same parse attributes) for the source
+    """
+
+    def __init__(self, settings):
+        self.doc_prefix = settings.doc_prefix
+        self.comment_prefix = settings.comment_prefix
+        self.comment_ignore_prefix = settings.comment_ignore_prefix
+        self.indented_comments = settings.indented_comments
+        self.remove_first_space = settings.remove_first_space
+
+        # One regex classifies a line, the alternatives are in priority order as the prefixes usually overlap
+        # (e.g. '#!', '###' and '#') and the matched group number is the line class
+        self.line_regex = re.compile(
+            "{0}(?:({1})|({2})|({3}))".format(
+                " *" if self.indented_comments else "",
+                re.escape(self.comment_ignore_prefix),
+                re.escape(self.doc_prefix),
+                re.escape(self.comment_prefix),
+            )
+        )
+        self.include_regex = re.compile(INCLUDE_REGEX)
+
+        # Files are decoded the same way as opening them in text mode
+        self.encoding = locale.getpreferredencoding(False)
+        self.doc_prefix_bytes = self.doc_prefix.encode(self.encoding)
+
+    def parse(self, sls_obj):
+        """
+        Read the sls file for an sls object, create an AutoSaltSLSEntry object for any comment blocks found and add
+        them as entries.
+
+        The file is read as bytes in one go, or memory-mapped if it is large, and only the lines in and around doc
+        blocks are decoded. Everything between blocks is skipped with a bulk search for the next doc prefix.
+
+        sls_obj
+            AutoSaltSLS instance
+
+        :return: int (count of bytes read)
+        """
+        if not sls_obj.full_filename:
+            return 0
+
+        with open(sls_obj.full_filename, "rb") as sls_file:
+            size = os.fstat(sls_file.fileno()).st_size
+
+            if size >= MMAP_THRESHOLD:
+                with mmap.mmap(sls_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    self._parse_data(sls_obj, data)
+            else:
+                data = sls_file.read()
+                size = len(data)
+                self._parse_data(sls_obj, data)
+
+        return size
+
+    #
+    # Private functions
+    #
+    def _find_doc_line(self, data, pos):
+        """
+        Return the offset of the start of the next line from ``pos`` (which must be the start of a line) beginning
+        with the doc prefix, or -1 if there are no more.
+        """
+        prefix = self.doc_prefix_bytes
+
+        while True:
+            index = data.find(prefix, pos)
+            if index == -1:
+                return -1
+
+            line_start = data.rfind(b"\n", pos, index) + 1 or pos
+
+            # Only spaces are allowed before the prefix
+            if line_start == index or (
+                self.indented_comments and not data[line_start:index].strip(b" ")
+            ):
+                return line_start
+
+            # Carry on from the next line
+            pos = data.find(b"\n", index) + 1
+            if not pos:
+                return -1
+
+    def _parse_data(self, sls_obj, data):
+        """
+        Parse the contents of an sls file held in a bytes-like object.
+        """
+        # Translate any other line endings the same way reading the file in text mode would
+        if data.find(b"\r") != -1:
+            data = data[:].replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+        encoding = self.encoding
+        classify = self.line_regex.match
+        state = _AutoSaltSLSParseState(self, sls_obj)
+
+        # Line handlers indexed by the line class
+        handlers = (state.code_line, None, state.doc_line, state.comment_line)
+
+        # Grab the file format from the first line of the file
+        if data[:2] == b"#!":
+            end = data.find(b"\n")
+            sls_obj.format = (
+                data[2 : end if end != -1 else len(data)].decode(encoding).strip()
+            )
+
+        pos = 0
+        size = len(data)
+
+        while pos < size:
+            # Outside a block only a doc line matters so jump straight to the next one
+            if state.entry is None:
+                pos = self._find_doc_line(data, pos)
+                if pos == -1:
+                    break
+
+            end = data.find(b"\n", pos)
+            if end == -1:
+                end = size
+
+            line = data[pos:end].decode(encoding)
+            pos = end + 1
+
+            match = classify(line)
+            line_class = match.lastindex if match else LINE_CODE
+
+            # Ignored lines are skipped (a doc prefix can also match the ignore prefix)
+            if line_class == LINE_IGNORE or (
+                state.entry is None and line_class != LINE_DOC
+            ):
+                continue
+
+            if handlers[line_class](line, match.end() if match else 0):
+                break
+
+        # Catch there being no content after the comment document
+        if state.entry is not None:
+            sls_obj.add_entry(state.entry)
+
+        sls_obj.pack_entries()
+
+
+#
+# Private functions
+#
+class _AutoSaltSLSParseState(object):
+    """
+    State for parsing a single sls file. The line handlers return True to stop processing the file.
+    """
+
+    def __init__(self, parser, sls_obj):
+        self.parser = parser
+        self.sls_obj = sls_obj
+        self.entry = None
+        self.included = False
+
+    def code_line(self, line, offset):
+        """
+        Handle a non-comment line following a comment block, either adding it to the entry or ending the block.
+        """
+        entry = self.entry
+
+        # Capture the first line (YAML ID) as content
+        if entry.process_id():
+            # Line ending with a colon
+            if line.endswith(":"):
+                line = line[:-1]
+            # In-line sls in a top file
+            elif entry.topfile_id and ":" in line:
+                fields = line.split(":")
+                entry.add_include(fields[1].strip())
+                line = fields[0].strip()
+
+            if entry.prepend_id:
+                # Prepend with a newline so the summary is correctly identified later
+                entry.prepend_line("")
+
+                # Remove any leading whitespace as the summary has to be left-justified
+                if self.parser.indented_comments:
+                    line = line.lstrip(" ")
+
+                entry.prepend_line(line)
+
+                # Clear the process_id flag and force another line to be read so we can parse the block entries as
+                # includes
+                if entry.topfile_id:
+                    entry.process_id(False)
+                    return False
+            else:
+                entry.append_line(line)
+
+        # Read all the include or topfile entries (flag set by directive)
+        elif entry.include or entry.topfile_id:
+            if "include:" in line:
+                self.included = True
+                return False
+            elif (self.included or entry.topfile_id) and line and not line.isspace():
+                # First non-match will trigger block end
+                match = self.parser.include_regex.match(line)
+                if match:
+                    text = match.group(1)
+
+                    if "match:" in text:
+                        entry.match_type = text.replace("match:", "").strip()
+                        return False
+                    # Relative includes are resolved by the sls object, so the result only depends on the file content
+                    entry.add_include(text)
+                    return False
+
+                # Skip any jinja directives within the includes
+                if "{%" in line:
+                    return False
+
+        # Add the entry to the main list
+        self.sls_obj.add_entry(entry)
+        self.entry = None
+
+        return False
+
+    def comment_line(self, line, offset):
+        """
+        Add a comment line within an active block to the entry.
+        """
+        line = line[offset:]
+
+        if self.parser.remove_first_space:
+            line = line[1:]
+
+        self.entry.append_line(line)
+
+        return False
+
+    def doc_line(self, line, offset):
+        """
+        Start a new entry and process any directives on the doc prefix line.
+        """
+        sls_obj = self.sls_obj
+
+        # Finish any current entry and store it in case we have two concurrent blocks without any lines in between
+        if self.entry is not None:
+            sls_obj.add_entry(self.entry)
+
+        self.entry = entry = AutoSaltSLSEntry()
+
+        # Check for directive keywords, stripping spaces from the fields
+        line = line[offset:]
+        if not line or line.isspace():
+            return False
+
+        directives = [x.strip() for x in line.split(",")]
+
+        # 'hidden' marks the file as not to have documentation generated so we might as well treat it as 'ignore' too
+        if "hidden" in directives:
+            logger.debug(
+                "[AutoSaltSLS] Marking sls {0} as hidden due to directive".format(
+                    sls_obj.basename
+                )
+            )
+            sls_obj.hidden = True
+            return True
+
+        ignore = False
+        for directive in directives:
+            # 'ignore' halts all processing for this file
+            if directive == "ignore":
+                logger.debug(
+                    "[AutoSaltSLS] Aborting processing of sls {0} due to 'ignore' directive".format(
+                        sls_obj.basename
+                    )
+                )
+                ignore = True
+            # 'topfile' is an sls directive
+            elif directive == "topfile":
+                logger.debug(
+                    "[AutoSaltSLS] Marking sls {0} as top file due to directive".format(
+                        sls_obj.basename
+                    )
+                )
+                sls_obj.topfile = True
+            # Everything else is for an entry
+            elif directive in ENTRY_DIRECTIVE_FLAGS:
+                entry.flags |= ENTRY_DIRECTIVE_FLAGS[directive]
+
+        return ignore
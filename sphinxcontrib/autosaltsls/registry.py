@@ -0,0 +1,130 @@
+"""
+AutoSaltSLS registry of the sls names documented across all sources
+"""
+import os
+import re
+
+from sphinx.util import logging
+
+from .utils import relative_path
+
+logger = logging.getLogger(__name__)
+
+
+class AutoSaltSLSRegistry(object):
+    """
+    Registry mapping each (cross-reference role, sls name) pair documented by any of the sources to its sls object and
+    document, so include and top file targets can be resolved with a single lookup.
+
+    srcdir
+        Sphinx source dir, used to work out the document names
+    """
+
+    def __init__(self, srcdir):
+        self.srcdir = srcdir
+        self.names = {}
+
+    def __contains__(self, key):
+        return self.resolve(*key) is not None
+
+    def __len__(self):
+        return len(self.names)
+
+    def add_mapper(self, mapper):
+        """
+        Add all the sls objects with a document from a loaded mapper, skipping any marked as hidden when parsed as
+        they have no document.
+
+        mapper
+            AutoSaltSLSMapper instance
+        """
+        role = mapper.settings.cross_ref_role
+
+        for sls_obj in mapper.sls_objects:
+            for obj, output_file, template in sls_obj.rst_files(mapper.build_root):
+                # Only the sls and top file pages describe an sls name with the object directive, e.g. dirs without an
+                # init.sls file or the environment pages of a split top file have none
+                if template is not None or obj.hidden:
+                    continue
+
+                key = (role, obj.prefixed_name)
+                docname = os.path.splitext(relative_path(output_file, self.srcdir))[0]
+                docname = docname.replace(os.path.sep, "/")
+
+                if key in self.names:
+                    logger.warning(
+                        "[AutoSaltSLS] sls {0} is documented in both '{1}' and '{2}'".format(
+                            obj.prefixed_name, self.names[key][1], docname,
+                        ),
+                        location=obj.full_filename,
+                    )
+                    continue
+
+                self.names[key] = (obj, docname)
+
+    def dangling_includes(self, mapper):
+        """
+        Return the include and top file targets of the visible sls objects for a loaded mapper that are not
+        documented by any source.
+
+        mapper
+            AutoSaltSLSMapper instance
+
+        :return: list
+            Tuples of (AutoSaltSLS instance, target sls name, line number or None)
+        """
+        role = mapper.settings.cross_ref_role
+        dangling = []
+
+        for sls_obj in mapper.visible_sls_objects:
+            for obj in [sls_obj] + sls_obj.children:
+                if obj.hidden:
+                    continue
+
+                for text, target in obj.include_items:
+                    if self.resolve(role, target) is None:
+                        dangling.append((obj, target, _find_line(obj, text)))
+
+        return dangling
+
+    def resolve(self, role, name):
+        """
+        Return the sls object and document name for an sls name.
+
+        role
+            Cross-reference role of the source the name belongs to (e.g. 'sls')
+
+        name
+            Full dot-separated sls name, including any source prefix
+
+        :return: tuple
+            (AutoSaltSLS instance, document name) or None if the name is not documented
+        """
+        resolved = self.names.get((role, name))
+
+        # In case an object is parsed again and marked as hidden after it was added
+        if resolved is None or resolved[0].hidden:
+            return None
+
+        return resolved
+
+
+#
+# Private functions
+#
+def _find_line(sls_obj, text):
+    """
+    Return the number of the first non-comment line in an sls file that mentions some include text. The line numbers
+    are not kept when parsing, so the file is only searched again when an include needs reporting.
+    """
+    regex = re.compile(r"(?<![\w.\-]){0}(?![\w.\-])".format(re.escape(text)))
+
+    try:
+        with open(sls_obj.full_filename) as sls_file:
+            for number, line in enumerate(sls_file, 1):
+                if not line.lstrip().startswith("#") and regex.search(line):
+                    return number
+    except (OSError, UnicodeDecodeError):
+        pass
+
+    return None
@@ -0,0 +1,140 @@
+"""
+AutoSaltSLS Jinja environments
+
+This module only depends on Jinja so ``setup.py`` can load it to precompile the built-in templates.
+"""
+import hashlib
+import json
+import os
+import threading
+
+import jinja2
+from jinja2 import (
+    ChoiceLoader,
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    ModuleLoader,
+)
+
+# Built-in templates and the dir they are precompiled into when the package is built
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "templates")
+COMPILED_DIR = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), "_compiled_templates"
+)
+COMPILED_INFO = "templates.json"
+
+# Environments shared by everything rendering with the same template search path
+_environments = {}
+_environments_lock = threading.Lock()
+
+# Loader for the precompiled templates, False until it has been checked
+_compiled_loader = False
+
+
+def compile_templates(target_dir):
+    """
+    Precompile the built-in templates into Python modules for ``ModuleLoader``, with the checksums of the template
+    sources and the Jinja version so out of date modules are never used.
+
+    target_dir
+        Dir to write the modules to, created if needed
+    """
+    os.makedirs(target_dir, exist_ok=True)
+
+    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
+    env.compile_templates(target_dir, zip=None, ignore_errors=False)
+
+    with open(os.path.join(target_dir, COMPILED_INFO), "w") as outfile:
+        json.dump(_compiled_info(), outfile, indent=2, sort_keys=True)
+
+
+def get_jinja_env(template_paths, cache_dir=None):
+    """
+    Return the Jinja environment for a template search path, creating it the first time the path is used. The
+    environment is created again if any of the dirs in the path other than the built-in template dir change (e.g. a
+    template is added to override a built-in one).
+
+    template_paths
+        List of dirs to search for templates, in priority order, usually ending with ``TEMPLATE_DIR``
+
+    cache_dir : None
+        Dir for a persistent cache of the compiled templates that are not precompiled
+
+    :return: jinja2.Environment
+    """
+    user_paths = [x for x in template_paths if x != TEMPLATE_DIR]
+    key = (tuple(template_paths), cache_dir)
+    signature = tuple(_dir_mtime(x) for x in user_paths)
+
+    with _environments_lock:
+        env, env_signature = _environments.get(key, (None, None))
+
+        if env is None or env_signature != signature:
+            loaders = []
+            if user_paths:
+                loaders.append(FileSystemLoader(user_paths))
+
+            if TEMPLATE_DIR in template_paths:
+                loaders.append(_builtin_loader())
+
+            bytecode_cache = None
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+                bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+            env = Environment(
+                loader=ChoiceLoader(loaders), bytecode_cache=bytecode_cache
+            )
+            _environments[key] = (env, signature)
+
+    return env
+
+
+#
+# Private functions
+#
+def _builtin_loader():
+    """
+    Return the loader for the built-in templates, using the precompiled modules if they are up to date.
+    """
+    global _compiled_loader
+
+    if _compiled_loader is False:
+        _compiled_loader = None
+
+        try:
+            with open(os.path.join(COMPILED_DIR, COMPILED_INFO)) as infile:
+                if json.load(infile) == _compiled_info():
+                    _compiled_loader = ModuleLoader(COMPILED_DIR)
+        except (OSError, ValueError):
+            pass
+
+    if _compiled_loader is not None:
+        return _compiled_loader
+
+    return FileSystemLoader(TEMPLATE_DIR)
+
+
+def _compiled_info():
+    """
+    Return the Jinja version and the checksums of the built-in template sources.
+    """
+    templates = {}
+
+    for name in sorted(os.listdir(TEMPLATE_DIR)):
+        if name.endswith(".rst_t"):
+            with open(os.path.join(TEMPLATE_DIR, name), "rb") as infile:
+                templates[name] = hashlib.sha1(infile.read()).hexdigest()
+
+    return {"jinja2": jinja2.__version__, "templates": templates}
+
+
+def _dir_mtime(path):
+    """
+    Return the mtime of a dir, which changes when files are added to or removed from it, or None if it is missing.
+    """
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
@@ -0,0 +1,407 @@
+"""
+AutoSaltSLS source directory scanner
+"""
+import fnmatch
+import os
+import pickle
+import re
+import time
+
+from sphinx.util import logging
+
+# noinspection PyUnresolvedReferences
+from sphinx.util.console import darkgreen, bold
+
+logger = logging.getLogger(__name__)
+
+# Prefix marking an exclude entry as a regular expression rather than a glob
+REGEX_PREFIX = "re:"
+
+# Bump this whenever the manifest format changes
+MANIFEST_VERSION = 1
+
+# Dir mtimes this recent are not trusted as the dir could still change within the same timestamp
+MTIME_GRACE_NS = 2 * 10 ** 9
+
+
+class AutoSaltSLSExcludeMatcher(object):
+    """
+    Match paths relative to a source dir against a list of exclude patterns. Each pattern can be:
+
+    * A glob (e.g. ``roles`` or ``*/files``) matched against the whole relative path using ``/`` as the separator
+    * A string starting with ``re:`` which is treated as a regular expression and searched for in the relative path
+    * A compiled regular expression which is searched for in the relative path
+
+    exclude
+        List of patterns
+    """
+
+    def __init__(self, exclude):
+        globs = []
+        self.regexes = []
+
+        for pattern in exclude or []:
+            if isinstance(pattern, str):
+                if pattern.startswith(REGEX_PREFIX):
+                    self.regexes.append(re.compile(pattern[len(REGEX_PREFIX) :]))
+                else:
+                    globs.append(
+                        fnmatch.translate(pattern.replace(os.path.sep, "/").strip("/"))
+                    )
+            else:
+                self.regexes.append(pattern)
+
+        # Combine all the globs into one expression so each path only needs a single match
+        self.glob_regex = re.compile("|".join(globs)) if globs else None
+
+    def __bool__(self):
+        return self.glob_regex is not None or bool(self.regexes)
+
+    def match(self, rel_path):
+        """
+        Check a relative path against the exclude patterns.
+
+        rel_path
+            Path relative to the source dir using ``/`` as the separator
+
+        :return: bool
+        """
+        if self.glob_regex is not None and self.glob_regex.match(rel_path):
+            return True
+
+        for regex in self.regexes:
+            if regex.search(rel_path):
+                return True
+
+        return False
+
+
+class AutoSaltSLSManifest(object):
+    """
+    Record of the dirs and sls files found in a source dir by a previous scan, so the next scan only needs to read the
+    dirs whose mtime has changed and can report which sls files were added, removed or modified.
+
+    filename
+        Full path to the manifest file
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+
+        # rel path -> (mtime, sls filenames, sub dir names) from the previous scan
+        self.dirs = {}
+        # rel path -> (mtime, size) from the previous scan
+        self.files = {}
+        # Generated file paths relative to the build root from the previous write
+        self.outputs = []
+
+        self.added = set()
+        self.removed = set()
+        self.modified = set()
+
+        self._new_dirs = {}
+        self._new_files = {}
+
+    @property
+    def changes(self):
+        """
+        Return the sls names which were added, removed or modified since the previous scan.
+
+        :return: dict
+        """
+        return {
+            "added": {sls_name(x) for x in self.added},
+            "removed": {sls_name(x) for x in self.removed},
+            "modified": {sls_name(x) for x in self.modified},
+        }
+
+    @property
+    def has_changes(self):
+        """
+        Return whether any sls files were added, removed or modified since the previous scan.
+
+        :return: bool
+        """
+        return bool(self.added or self.removed or self.modified)
+
+    def list_dir(self, rel_path, full_path):
+        """
+        Return the sls filenames and sub dir names for a dir, re-using the previous listing if the dir mtime has not
+        changed.
+
+        rel_path
+            Path of the dir relative to the source dir
+
+        full_path
+            Full path to the dir
+
+        :return: tuple
+            List of sls filenames and list of sub dir names
+        """
+        mtime = os.stat(full_path).st_mtime_ns
+        previous = self.dirs.get(rel_path)
+
+        if previous is not None and previous[0] == mtime:
+            sls_files, sub_dirs = previous[1], previous[2]
+        else:
+            sls_files, sub_dirs = _scan_dir(full_path)
+
+        # Don't trust the mtime next time if the dir could still be changing
+        if time.time_ns() - mtime < MTIME_GRACE_NS:
+            mtime = None
+
+        self._new_dirs[rel_path] = (mtime, sls_files, sub_dirs)
+
+        return sls_files, sub_dirs
+
+    def add_file(self, rel_path, full_path):
+        """
+        Record the stat data for an sls file found by the scan and compare it to the previous scan.
+
+        rel_path
+            Path of the file relative to the source dir
+
+        full_path
+            Full path to the file
+        """
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            return
+
+        data = (stat.st_mtime_ns, stat.st_size)
+        self._new_files[rel_path] = data
+
+        previous = self.files.get(rel_path)
+        if previous is None:
+            self.added.add(rel_path)
+        elif previous != data:
+            self.modified.add(rel_path)
+
+    def update_files(self, files):
+        """
+        Record the stat data for some sls files already in the manifest without scanning the whole source again,
+        replacing the added, removed and modified sets with the results.
+
+        files
+            List of (path relative to the source dir, full path) tuples
+
+        :return: bool (False if any of the files are not in the manifest or no longer exist, so a scan is needed)
+        """
+        self.added = set()
+        self.removed = set()
+        self.modified = set()
+
+        updates = {}
+        for rel_path, full_path in files:
+            if rel_path not in self.files:
+                return False
+
+            try:
+                stat = os.stat(full_path)
+            except OSError:
+                return False
+
+            updates[rel_path] = (stat.st_mtime_ns, stat.st_size)
+
+        for rel_path, data in updates.items():
+            if self.files[rel_path] != data:
+                self.files[rel_path] = data
+                self.modified.add(rel_path)
+
+        return True
+
+    def start_scan(self):
+        """
+        Clear the results of any previous scan with this manifest.
+        """
+        self.added = set()
+        self.removed = set()
+        self.modified = set()
+        self._new_dirs = {}
+        self._new_files = {}
+
+    def finish_scan(self):
+        """
+        Work out the removed files and make the results of the scan the current manifest data.
+        """
+        self.removed = set(self.files) - set(self._new_files)
+        self.dirs = self._new_dirs
+        self.files = self._new_files
+        self._new_dirs = {}
+        self._new_files = {}
+
+    def load(self):
+        """
+        Read the manifest from disk. A missing or unreadable file just means every sls file is reported as added.
+        """
+        if not os.path.isfile(self.filename):
+            return
+
+        try:
+            with open(self.filename, "rb") as infile:
+                data = pickle.load(infile)
+        except Exception as e:
+            logger.warning(
+                "[AutoSaltSLS] Ignoring unreadable scan manifest '{0}': {1}".format(
+                    self.filename, e
+                )
+            )
+            return
+
+        if data.get("version") != MANIFEST_VERSION:
+            return
+
+        self.dirs = data["dirs"]
+        self.files = data["files"]
+        self.outputs = data["outputs"]
+
+    def save(self):
+        """
+        Write the manifest to disk.
+        """
+        manifest_dir = os.path.dirname(self.filename)
+        if not os.path.isdir(manifest_dir):
+            os.makedirs(manifest_dir, exist_ok=True)
+
+        temp_filename = "{0}.{1}.tmp".format(self.filename, os.getpid())
+
+        with open(temp_filename, "wb") as outfile:
+            pickle.dump(
+                {
+                    "version": MANIFEST_VERSION,
+                    "dirs": self.dirs,
+                    "files": self.files,
+                    "outputs": self.outputs,
+                },
+                outfile,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+
+        os.replace(temp_filename, self.filename)
+
+
+def sls_name(rel_path):
+    """
+    Return the dotted sls name for a file path relative to a source dir (e.g. ``apache/init.sls`` is ``apache``).
+
+    rel_path
+        Path of the sls file relative to the source dir
+
+    :return: str
+    """
+    name = rel_path[: -len(".sls")] if rel_path.endswith(".sls") else rel_path
+    parts = name.replace(os.path.sep, "/").split("/")
+
+    if len(parts) > 1 and parts[-1] == "init":
+        parts.pop()
+
+    return ".".join(parts)
+
+
+def walk_sls_tree(root, exclude=None, log_tag="[AutoSaltSLS] ", manifest=None):
+    """
+    Walk a source dir top-down looking for sls files. Excluded dirs are pruned before they are read and only the names
+    of ``.sls`` files are collected. Symlinked dirs are not followed. Entries are returned in sorted order so the
+    results do not depend on the filesystem.
+
+    root
+        Full path to the source dir
+
+    exclude : None
+        AutoSaltSLSExcludeMatcher instance or list of exclude patterns, matched against dirs and sls files
+
+    log_tag : '[AutoSaltSLS] '
+        Prefix for log messages
+
+    manifest : None
+        AutoSaltSLSManifest instance used to skip reading unchanged dirs and to record the sls files found. Its
+        ``start_scan`` and ``finish_scan`` methods are called before and after the walk.
+
+    :return: generator
+        Tuples of (dir path relative to root, list of sls filenames). The root dir itself is returned as ``.``.
+    """
+    if not isinstance(exclude, AutoSaltSLSExcludeMatcher):
+        exclude = AutoSaltSLSExcludeMatcher(exclude)
+
+    if manifest is not None:
+        manifest.start_scan()
+
+    # Stack of (relative path with os separators, relative path with '/' separators, full path)
+    stack = [(".", "", root)]
+
+    while stack:
+        rel_path, match_path, full_path = stack.pop()
+
+        try:
+            if manifest is None:
+                sls_files, sub_dirs = _scan_dir(full_path)
+            else:
+                sls_files, sub_dirs = manifest.list_dir(rel_path, full_path)
+        except OSError as e:
+            logger.warning(
+                "{0}Could not read dir '{1}': {2}".format(log_tag, full_path, e)
+            )
+            continue
+
+        if exclude:
+            sls_files = [
+                x
+                for x in sls_files
+                if not exclude.match(match_path + "/" + x if match_path else x)
+            ]
+
+        if manifest is not None:
+            for name in sls_files:
+                manifest.add_file(
+                    os.path.join(rel_path, name) if match_path else name,
+                    os.path.join(full_path, name),
+                )
+
+        yield rel_path, sls_files
+
+        # Push the sub dirs in reverse so they are popped in sorted order
+        for name in reversed(sub_dirs):
+            sub_match_path = match_path + "/" + name if match_path else name
+
+            if exclude and exclude.match(sub_match_path):
+                logger.info(
+                    bold(log_tag) + darkgreen("Ignoring {0}".format(sub_match_path))
+                )
+                continue
+
+            stack.append(
+                (
+                    os.path.join(rel_path, name) if match_path else name,
+                    sub_match_path,
+                    os.path.join(full_path, name),
+                )
+            )
+
+    if manifest is not None:
+        manifest.finish_scan()
+
+
+#
+# Private functions
+#
+def _scan_dir(full_path):
+    """
+    Read a dir and return the sorted lists of sls filenames and sub dir names in it.
+    """
+    sls_files = []
+    sub_dirs = []
+
+    with os.scandir(full_path) as entries:
+        for entry in entries:
+            name = entry.name
+
+            if name.endswith(".sls"):
+                sls_files.append(name)
+            elif entry.is_dir(follow_symlinks=False):
+                sub_dirs.append(name)
+
+    sls_files.sort()
+    sub_dirs.sort()
+
+    return sls_files, sub_dirs
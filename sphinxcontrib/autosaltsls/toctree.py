@@ -0,0 +1,193 @@
+"""
+AutoSaltSLS nested toctrees
+
+Used when ``autosaltsls_nested_toctrees`` is set to list the sls objects of a source in toctrees which mirror its dir
+hierarchy, rather than in one flat toctree on the source index page.
+"""
+import posixpath
+
+SHARD_MODES = ("alpha", "size")
+
+
+class AutoSaltSLSTocLevel(object):
+    """
+    A dir of a source with a toctree of the dirs and single page sls objects directly in it, or a shard of the entries
+    of a large dir. The source dir is the root level, with the source index page as its document.
+
+    name
+        Full dot-separated name of the dir (e.g. 'roles.webserver'), empty for the source dir
+
+    docname
+        Document name of the page for the level, relative to the source build root and without the extension
+
+    title : None
+        Title for the page, defaults to the name
+
+    label : None
+        Text for the entry of the level in the toctree of its parent, defaults to the last part of the name
+    """
+
+    def __init__(self, name, docname, title=None, label=None):
+        self.name = name
+        self.docname = docname
+        self.title = title or name
+        self.label = label or name.rsplit(".", 1)[-1]
+        self.entries = []
+        self.levels = {}
+        self.shards = []
+        self.sls_obj = None
+
+    def __str__(self):
+        return self.docname
+
+    def add_entry(self, label, docname):
+        """
+        Add an entry to the toctree for the level.
+
+        label
+            Text to display for the entry
+
+        docname
+            Document name of the entry, relative to the source build root
+        """
+        self.entries.append((label, docname))
+
+    @property
+    def all_levels(self):
+        """
+        Return this level and all levels under it, including any shards.
+
+        :return: list
+        """
+        levels = [self] + self.shards
+
+        for name in sorted(self.levels):
+            levels.extend(self.levels[name].all_levels)
+
+        return levels
+
+    def get_level(self, parts):
+        """
+        Return the level for a dir under this one, creating it and any levels between if needed.
+
+        parts
+            List of the dir names from this level down
+
+        :return: AutoSaltSLSTocLevel
+        """
+        level = self
+
+        for part in parts:
+            if part not in level.levels:
+                name = "{0}.{1}".format(level.name, part) if level.name else part
+                sub_level = AutoSaltSLSTocLevel(name, name.replace(".", "/") + "/main")
+
+                level.levels[part] = sub_level
+                level.add_entry(sub_level.label, sub_level.docname)
+
+            level = level.levels[part]
+
+        return level
+
+    def shard(self, mode, size):
+        """
+        Split the entries of this level and all levels under it into shards if there are more than ``size`` of them,
+        so the toctree for each page stays bounded.
+
+        mode
+            'alpha' to shard by the first character of the entries (shards are not split any further) or 'size' for
+            shards of at most ``size`` entries
+
+        size
+            Largest number of entries a level can have before it is sharded
+        """
+        self.entries.sort()
+        self.shards = []
+
+        if mode and 0 < size < len(self.entries):
+            groups = {}
+
+            if mode == "alpha":
+                for label, docname in self.entries:
+                    key = label[0].lower() if label[0].isalnum() else "_"
+                    groups.setdefault(key, []).append((label, docname))
+
+                labels = {x: x.upper() for x in groups}
+            else:
+                for index in range(0, len(self.entries), size):
+                    groups[str(index // size + 1)] = self.entries[index : index + size]
+
+                labels = {}
+                for key, entries in groups.items():
+                    labels[key] = entries[0][0]
+                    if len(entries) > 1:
+                        labels[key] += " - " + entries[-1][0]
+
+            # Shard numbers are sorted as numbers
+            for key in sorted(groups, key=lambda x: (len(x), x)):
+                shard = AutoSaltSLSTocLevel(
+                    self.name,
+                    "{0}.{1}".format(self.docname, key),
+                    title="{0}: {1}".format(self.title, labels[key]),
+                    label=labels[key],
+                )
+                shard.entries = groups[key]
+                self.shards.append(shard)
+
+        for level in self.levels.values():
+            level.shard(mode, size)
+
+    @property
+    def toc_entries(self):
+        """
+        Return the toctree entries for the page of this level, which are its shards if it has been sharded.
+
+        :return: list
+            Tuples of (label, document name relative to the page)
+        """
+        if self.shards:
+            entries = [(x.label, x.docname) for x in self.shards]
+        else:
+            entries = self.entries
+
+        base = posixpath.dirname(self.docname) or "."
+
+        return [(label, posixpath.relpath(x, base)) for label, x in entries]
+
+
+def build_toc_levels(sls_objects, title, mode=None, size=0):
+    """
+    Build the tree of levels for the non-top sls objects of a source. A dir with sls files in it other than its
+    ``init.sls`` file is a level, with its ``main`` page as the document. Other sls objects are entries of the level
+    for the dir they are in.
+
+    sls_objects
+        List of the visible non-top sls objects of the source
+
+    title
+        Title of the source, used for the titles of any shards of the root level
+
+    mode : None
+        Shard mode to use for large levels, 'alpha', 'size' or None for no sharding
+
+    size : 0
+        Largest number of entries a level can have before it is sharded
+
+    :return: AutoSaltSLSTocLevel (the root level)
+    """
+    root = AutoSaltSLSTocLevel("", "index", title=title)
+
+    for sls_obj in sls_objects:
+        parts = sls_obj.basename.split(".")
+
+        if sls_obj.children:
+            level = root.get_level(parts)
+            level.sls_obj = sls_obj
+            sls_obj.toc_level = level
+        else:
+            root.get_level(parts[:-1]).add_entry(parts[-1], sls_obj.toc_entry)
+            sls_obj.toc_level = None
+
+    root.shard(mode, size)
+
+    return root
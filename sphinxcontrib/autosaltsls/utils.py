@@ -0,0 +1,83 @@
+"""
+AutoSaltSLS utility functions
+"""
+import os
+import threading
+
+
+def relative_path(path, start):
+    """
+    Return a path relative to a dir. Paths already under the dir (e.g. generated files under a build root) are sliced
+    rather than normalised by ``os.path.relpath``, which is slow when done for every file in a large source.
+
+    path
+        Full path
+
+    start
+        Full path of the dir to make the path relative to
+
+    :return: str
+    """
+    prefix = start if start.endswith(os.path.sep) else start + os.path.sep
+
+    if path.startswith(prefix) and os.path.pardir not in path:
+        return path[len(prefix) :]
+
+    return os.path.relpath(path, start)
+
+
+def write_file_if_changed(filename, content, dry_run=False):
+    """
+    Write some content to a file only if it differs from what is already on disk. This leaves the mtime of unchanged
+    files alone so Sphinx does not treat them as outdated. The file is replaced atomically so anything watching it
+    (e.g. ``sphinx-autobuild``) never reads it partly written.
+
+    filename
+        Full path of the file to write
+
+    content
+        Text to write to the file
+
+    dry_run : False
+        Only check whether the file would be written
+
+    :return: bool (True if the file was written)
+    """
+    if os.path.isfile(filename):
+        try:
+            with open(filename) as infile:
+                if infile.read() == content:
+                    return False
+        except (OSError, UnicodeDecodeError):
+            pass
+
+    if dry_run:
+        return True
+
+    write_file_atomic(filename, content)
+
+    return True
+
+
+def write_file_atomic(filename, content):
+    """
+    Write some content to a file via a temp file in the same dir, so anything reading the file never sees it partly
+    written. The dir is created if needed.
+
+    filename
+        Full path of the file to write
+
+    content
+        Text or bytes to write to the file
+    """
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+    # Unique per thread as well as process, as threads processing different sources can write the same file
+    temp_filename = "{0}.{1}.{2}.tmp".format(
+        filename, os.getpid(), threading.get_ident()
+    )
+
+    with open(temp_filename, "wb" if isinstance(content, bytes) else "w") as outfile:
+        outfile.write(content)
+
+    os.replace(temp_filename, filename)
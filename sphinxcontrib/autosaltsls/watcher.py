@@ -0,0 +1,306 @@
+"""
+AutoSaltSLS source watchers
+
+Used by the command line interface to regenerate the rst files as the sls files change. Linux inotify is used through
+``ctypes`` when it is available, otherwise the sources are polled.
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+
+from sphinx.util import logging
+
+# noinspection PyUnresolvedReferences
+from sphinx.util.console import bold
+
+logger = logging.getLogger(__name__)
+
+# inotify event flags from <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_ONLYDIR
+)
+
+# Header of each event read from an inotify fd: watch descriptor, mask, cookie and name length
+EVENT_HEADER = struct.Struct("iIII")
+
+# How long to wait for more events once something has changed, so a burst of changes (e.g. a git checkout) is handled
+# in one go
+SETTLE_SECONDS = 0.05
+
+# How often the polling watcher checks the sources
+POLL_SECONDS = 1.0
+
+
+class AutoSaltSLSInotifyWatcher(object):
+    """
+    Watch some dirs and everything under them for changed sls files and dirs using inotify.
+
+    paths
+        List of dirs to watch
+
+    Raises OSError if inotify is not available or the watch limit is reached.
+    """
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+
+        self._libc = _load_libc()
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        # Watch descriptor -> dir path
+        self._watches = {}
+
+        try:
+            for path in self.paths:
+                self._add_tree(path)
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        """
+        Stop watching.
+        """
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def wait(self, timeout=None):
+        """
+        Wait for sls files or dirs to change.
+
+        timeout : None
+            Seconds to wait for, forever if None
+
+        :return: set
+            Full paths of the sls files and dirs which changed, empty if the timeout expired. The watched dirs
+            themselves are returned if events were lost.
+        """
+        changed = set()
+
+        if not select.select([self._fd], [], [], timeout)[0]:
+            return changed
+
+        while True:
+            changed.update(self._read_events())
+
+            if not select.select([self._fd], [], [], SETTLE_SECONDS)[0]:
+                break
+
+        return changed
+
+    #
+    # Private functions
+    #
+    def _add_tree(self, path):
+        """
+        Watch a dir and all the dirs under it.
+        """
+        for dir_path, dir_names, filenames in os.walk(path):
+            wd = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(dir_path), WATCH_MASK
+            )
+
+            if wd < 0:
+                error = ctypes.get_errno()
+
+                # The dir may have gone again already
+                if error in (errno.ENOENT, errno.ENOTDIR):
+                    continue
+
+                raise OSError(
+                    error,
+                    "Could not watch '{0}': {1}".format(dir_path, os.strerror(error)),
+                )
+
+            self._watches[wd] = dir_path
+
+    def _read_events(self):
+        """
+        Read the pending events and return the paths of the sls files and dirs they are for.
+        """
+        changed = set()
+
+        try:
+            data = os.read(self._fd, 65536)
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[
+                offset + EVENT_HEADER.size : offset + EVENT_HEADER.size + length
+            ].rstrip(b"\0")
+            offset += EVENT_HEADER.size + length
+
+            # Too many events to queue so anything could have changed
+            if mask & IN_Q_OVERFLOW:
+                changed.update(self.paths)
+                continue
+
+            dir_path = self._watches.get(wd)
+            if dir_path is None:
+                continue
+
+            if mask & IN_IGNORED:
+                del self._watches[wd]
+                continue
+
+            path = os.path.join(dir_path, os.fsdecode(name)) if name else dir_path
+
+            if mask & IN_ISDIR or not name:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path)
+
+                changed.add(path)
+            elif path.endswith(".sls"):
+                changed.add(path)
+
+        return changed
+
+
+class AutoSaltSLSPollingWatcher(object):
+    """
+    Watch some dirs and everything under them for changed sls files by checking their mtimes at intervals.
+
+    paths
+        List of dirs to watch
+
+    interval : POLL_SECONDS
+        Seconds between checks
+    """
+
+    def __init__(self, paths, interval=POLL_SECONDS):
+        self.paths = list(paths)
+        self.interval = interval
+
+        self._snapshot = self._take_snapshot()
+
+    def close(self):
+        """
+        Stop watching.
+        """
+        self._snapshot = {}
+
+    def wait(self, timeout=None):
+        """
+        Wait for sls files or dirs to change.
+
+        timeout : None
+            Seconds to wait for, forever if None
+
+        :return: set
+            Full paths of the sls files which changed, empty if the timeout expired
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            snapshot = self._take_snapshot()
+            changed = {
+                x
+                for x in set(snapshot) | set(self._snapshot)
+                if snapshot.get(x) != self._snapshot.get(x)
+            }
+            self._snapshot = snapshot
+
+            if changed:
+                return changed
+
+            if end is not None and time.monotonic() >= end:
+                return changed
+
+            time.sleep(
+                self.interval
+                if end is None
+                else max(min(self.interval, end - time.monotonic()), 0)
+            )
+
+    #
+    # Private functions
+    #
+    def _take_snapshot(self):
+        """
+        Return the mtimes and sizes of all the sls files, added and removed files show up as new or missing entries.
+        """
+        snapshot = {}
+
+        for path in self.paths:
+            for dir_path, dir_names, filenames in os.walk(path):
+                for filename in filenames:
+                    if not filename.endswith(".sls"):
+                        continue
+
+                    full_path = os.path.join(dir_path, filename)
+                    try:
+                        stat = os.stat(full_path)
+                    except OSError:
+                        continue
+
+                    snapshot[full_path] = (stat.st_mtime_ns, stat.st_size)
+
+        return snapshot
+
+
+def get_watcher(paths, poll=False):
+    """
+    Return a watcher for some dirs, using inotify if it is available.
+
+    paths
+        List of dirs to watch
+
+    poll : False
+        Always poll the dirs, e.g. for network filesystems that do not support inotify
+
+    :return: AutoSaltSLSInotifyWatcher or AutoSaltSLSPollingWatcher
+    """
+    if not poll:
+        try:
+            return AutoSaltSLSInotifyWatcher(paths)
+        except (AttributeError, OSError) as e:
+            logger.info(
+                bold("[AutoSaltSLS] ")
+                + "inotify not available, polling for changes: {0}".format(e)
+            )
+
+    return AutoSaltSLSPollingWatcher(paths)
+
+
+#
+# Private functions
+#
+def _load_libc():
+    """
+    Return the C library with the inotify functions, raising AttributeError or OSError if it does not have them.
+    """
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+
+    return libc
@@ -0,0 +1,133 @@
+import os
+from types import SimpleNamespace
+
+from sphinxcontrib.autosaltsls.cache import AutoSaltSLSParseCache
+from sphinxcontrib.autosaltsls.objects import AutoSaltSLS
+
+SLS_TEXT = """###
+# Apache installed
+#
+# Longer description
+apache:
+  pkg.installed
+"""
+
+
+def _make_sls(tmp_path):
+    settings = SimpleNamespace(
+        doc_prefix="###",
+        comment_prefix="#",
+        comment_ignore_prefix="#!",
+        indented_comments=False,
+        remove_first_space=True,
+    )
+    return AutoSaltSLS("apache.sls", str(tmp_path), settings)
+
+
+def test_parse_cache_roundtrip(tmp_path):
+    (tmp_path / "apache.sls").write_text(SLS_TEXT)
+    cache_file = str(tmp_path / "cache" / "parse_cache.pickle")
+
+    sls_obj = _make_sls(tmp_path)
+    cache = AutoSaltSLSParseCache(cache_file, ("###",))
+    cache.load()
+    assert cache.get(sls_obj) is None
+    sls_obj.parse_file()
+    cache.put(sls_obj, sls_obj.get_parse_result())
+    cache.save()
+
+    # A new cache instance should return the stored result without parsing
+    cache = AutoSaltSLSParseCache(cache_file, ("###",))
+    cache.load()
+    result = cache.get(sls_obj)
+    assert result == sls_obj.get_parse_result()
+
+    cached_obj = _make_sls(tmp_path)
+    cached_obj.apply_parse_result(result)
+    assert cached_obj.header.summary == "Apache installed"
+    assert cached_obj.header.content == "Longer description"
+
+    # Changed content or config invalidates the entry
+    (tmp_path / "apache.sls").write_text(SLS_TEXT.replace("Apache", "Nginx"))
+    assert cache.get(sls_obj) is None
+
+    cache = AutoSaltSLSParseCache(cache_file, ("#@#",))
+    cache.load()
+    os.utime(str(tmp_path / "apache.sls"))
+    assert cache.get(_make_sls(tmp_path)) is None
+
+
+def test_parse_cache_shared_store(tmp_path):
+    store_dir = str(tmp_path / "store")
+    text = "### include\ninclude:\n  - .ssl\n" + SLS_TEXT
+
+    # The same file under another name in another source shares the stored result
+    for name in ["one", "two"]:
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "{0}.sls".format(name)).write_text(text)
+
+    settings = _make_sls(tmp_path).source_settings
+    first = AutoSaltSLS("one.sls", str(tmp_path / "one"), settings)
+    second = AutoSaltSLS("two.sls", str(tmp_path / "two"), settings)
+
+    cache = AutoSaltSLSParseCache(
+        str(tmp_path / "one.pickle"), ("###",), store_dir=store_dir
+    )
+    assert cache.get(first) is None
+    first.parse_file()
+    cache.put(first, first.get_parse_result())
+    assert first.include.includes == [".ssl <one.ssl>"]
+
+    cache = AutoSaltSLSParseCache(
+        str(tmp_path / "two.pickle"), ("###",), store_dir=store_dir
+    )
+    result = cache.get(second)
+    assert cache.hits == 1
+    assert cache.content_key(second) is not None
+
+    # Relative includes are resolved against the name of the object the result is applied to
+    second.apply_parse_result(result)
+    assert second.include.includes == [".ssl <two.ssl>"]
+    assert second.include_targets == ["two.ssl"]
+
+    # Least recently used results are evicted once the store is too big
+    (tmp_path / "one" / "one.sls").write_text(SLS_TEXT)
+    first = AutoSaltSLS("one.sls", str(tmp_path / "one"), settings)
+    first.parse_file()
+    cache.put(first, first.get_parse_result())
+
+    old_file = cache._result_file(cache.content_key(second))
+    os.utime(old_file, (1, 1))
+    assert cache.evict(os.path.getsize(old_file)) == 1
+    assert not os.path.exists(old_file)
+    assert cache.get(first) is not None
+
+
+def test_parse_cache_store_size(tmp_path, monkeypatch):
+    (tmp_path / "apache.sls").write_text(SLS_TEXT)
+    store_dir = tmp_path / "store"
+    size_file = store_dir / ".size"
+
+    sls_obj = _make_sls(tmp_path)
+    sls_obj.parse_file()
+
+    cache = AutoSaltSLSParseCache(
+        str(tmp_path / "index.pickle"), ("###",), store_dir=str(store_dir)
+    )
+    cache.get(sls_obj)
+    cache.put(sls_obj, sls_obj.get_parse_result())
+    result_size = os.path.getsize(cache._result_file(cache.content_key(sls_obj)))
+
+    # A new store is scanned once to work out its size, which is then kept up to date as results are written
+    cache.max_size = result_size * 2
+    cache.save()
+    assert int(size_file.read_text()) == result_size
+
+    scans = []
+    monkeypatch.setattr(cache, "_evict", lambda *args: scans.append(args))
+
+    cache.save()
+    size_file.write_text(str(result_size * 2))
+    cache._written_size = 1
+    cache.save()
+    assert scans == [(result_size * 2, int(result_size * 1.8))]
@@ -0,0 +1,179 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from sphinxcontrib.autosaltsls import cli
+
+
+def _make_project(root):
+    os.makedirs(os.path.join(str(root), "states", "apache"))
+    os.makedirs(os.path.join(str(root), "docs"))
+
+    with open(os.path.join(str(root), "states", "apache", "init.sls"), "w") as outfile:
+        outfile.write("###\n# Apache\n### include\ninclude:\n  - nginx\n")
+
+    with open(os.path.join(str(root), "states", "nginx.sls"), "w") as outfile:
+        outfile.write("###\n# Nginx\n###\n")
+
+    with open(os.path.join(str(root), "docs", "conf.py"), "w") as outfile:
+        outfile.write("autosaltsls_sources = {'states': {'title': 'States'}}\n")
+
+    return os.path.join(str(root), "docs")
+
+
+def test_minimal_imports():
+    # --help and argument errors shouldn't pay for importing Sphinx
+    code = (
+        "import sys\n"
+        "from sphinxcontrib.autosaltsls import cli\n"
+        "try:\n"
+        "    cli.main(['--help'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print(sorted(x for x in sys.modules if x.split('.')[0] in ('sphinx', 'docutils', 'jinja2')))\n"
+    )
+    output = subprocess.check_output([sys.executable, "-c", code])
+
+    assert output.decode().splitlines()[-1] == "[]"
+
+
+def test_load_config(tmp_path):
+    docs = _make_project(tmp_path)
+
+    config = cli.load_config(
+        docs, overrides=["autosaltsls_parse_cache=no", "autosaltsls_metrics_slowest=3"]
+    )
+    assert config.autosaltsls_sources == {"states": {"title": "States"}}
+    assert config.autosaltsls_parse_cache is False
+    assert config["autosaltsls_metrics_slowest"] == 3
+
+    config = cli.load_config(docs, sources=["states", "pillar"])
+    assert config.autosaltsls_sources == {"states": {"title": "States"}, "pillar": {}}
+
+    with pytest.raises(ValueError):
+        cli.load_config(docs, overrides=["autosaltsls_unknown=1"])
+
+
+def test_main(tmp_path):
+    docs = _make_project(tmp_path)
+    nginx_rst = os.path.join(docs, "states", "nginx.rst")
+
+    assert cli.main([docs, "-q", "--dry-run"]) == 0
+    assert not os.path.exists(nginx_rst)
+
+    assert cli.main([docs, "-q", "--changed-only"]) == 0
+    assert os.path.isfile(nginx_rst)
+    assert "apache" in open(nginx_rst).read()
+
+    # Only the changed file and the files it includes are rendered again
+    with open(
+        os.path.join(str(tmp_path), "states", "apache", "init.sls"), "a"
+    ) as outfile:
+        outfile.write("# more\n")
+
+    os.remove(nginx_rst)
+    assert cli.main([docs, "-q", "--changed-only"]) == 0
+    assert os.path.isfile(nginx_rst)
+
+
+def test_watch_file_removed(tmp_path, monkeypatch, caplog):
+    from sphinxcontrib.autosaltsls import watcher
+    from sphinxcontrib.autosaltsls.build import run_autosaltsls
+
+    docs = _make_project(tmp_path)
+    nginx_sls = os.path.join(str(tmp_path), "states", "nginx.sls")
+    apache_sls = os.path.join(str(tmp_path), "states", "apache", "init.sls")
+
+    app = cli.AutoSaltSLSApp(
+        docs, docs, os.path.join(docs, "_build"), cli.load_config(docs)
+    )
+    run_autosaltsls(app)
+
+    class FakeWatcher(object):
+        def __init__(self):
+            self.changes = [{nginx_sls}, {nginx_sls, apache_sls}]
+
+        def wait(self):
+            if not self.changes:
+                raise KeyboardInterrupt
+            return self.changes.pop(0)
+
+        def close(self):
+            pass
+
+    fake_watcher = FakeWatcher()
+    monkeypatch.setattr(watcher, "get_watcher", lambda *args, **kwargs: fake_watcher)
+
+    # The changed file is removed after the change is seen but before it is parsed again
+    mapper = app.autosaltsls_mappers[0]
+    load = mapper.load
+
+    def remove_and_load(*args, **kwargs):
+        if os.path.exists(nginx_sls):
+            os.remove(nginx_sls)
+        return load(*args, **kwargs)
+
+    monkeypatch.setattr(mapper, "load", remove_and_load)
+
+    with open(nginx_sls, "a") as outfile:
+        outfile.write("# more\n")
+
+    with open(apache_sls, "a") as outfile:
+        outfile.write("# more\n")
+
+    cli._watch(app)
+
+    # The error is reported and the next change is still handled
+    assert "No such file or directory" in caplog.text
+    assert not fake_watcher.changes
+    assert not os.path.exists(os.path.join(docs, "states", "nginx.rst"))
+
+
+def test_main_without_fork(tmp_path, monkeypatch):
+    from sphinxcontrib.autosaltsls import mapper
+
+    docs = _make_project(tmp_path)
+
+    # Parallel jobs render in this process where render workers can't be forked
+    monkeypatch.setattr(mapper, "_fork_available", lambda: False)
+
+    assert cli.main([docs, "-q", "-j", "2"]) == 0
+    assert "apache" in open(os.path.join(docs, "states", "nginx.rst")).read()
+
+
+def test_state_saved_after_build(tmp_path):
+    from sphinxcontrib.autosaltsls.build import run_autosaltsls
+    from sphinxcontrib.autosaltsls.extension import build_finished
+
+    docs = _make_project(tmp_path)
+    app = cli.AutoSaltSLSApp(
+        docs, docs, os.path.join(docs, "_build"), cli.load_config(docs)
+    )
+
+    # Only rst files the previous build wrote under a build root are removed as stale
+    user_file = os.path.join(docs, "notes.rst")
+    stale_file = os.path.join(docs, "states", "old.rst")
+    os.makedirs(os.path.dirname(stale_file))
+    for filename in [user_file, stale_file]:
+        with open(filename, "w") as outfile:
+            outfile.write("Old\n===\n")
+
+    app.env.autosaltsls_docs = {
+        "notes": {"names": set(), "output": user_file},
+        "states/old": {"names": set(), "output": stale_file},
+    }
+
+    run_autosaltsls(app)
+    assert os.path.isfile(user_file)
+    assert not os.path.exists(stale_file)
+
+    # The changes found by the scan are reported again if the build fails
+    manifest_file = app.autosaltsls_mappers[0].manifest.filename
+
+    build_finished(app, Exception("Build failed"))
+    assert not os.path.exists(manifest_file)
+
+    build_finished(app, None)
+    assert os.path.isfile(manifest_file)
@@ -0,0 +1,89 @@
+import os
+
+from docutils import nodes
+from sphinx.application import Sphinx
+
+
+def _make_project(root):
+    os.makedirs(os.path.join(str(root), "states", "apache"))
+    os.makedirs(os.path.join(str(root), "docs"))
+
+    files = {
+        os.path.join("states", "apache", "init.sls"): (
+            "###\n# Apache\n#\n# Installs *Apache*\n### include\ninclude:\n  - nginx\n"
+        ),
+        os.path.join("states", "nginx.sls"): (
+            "###\n# Nginx\n### step_id\n# Install the package\nnginx_installed:\n"
+            "  pkg.installed: []\n"
+        ),
+        os.path.join("states", "top.sls"): (
+            "###\n# Top file\n### environment\nbase:\n  ### topfile_id\n"
+            "  '*':\n    - nginx\n"
+        ),
+        os.path.join("docs", "conf.py"): (
+            "extensions = ['sphinxcontrib.autosaltsls']\n"
+            "autosaltsls_sources = {'states': {'cross_ref_role': 'state'}}\n"
+            "autosaltsls_indented_comments = True\n"
+            "autosaltsls_render_nodes = True\n"
+        ),
+        os.path.join("docs", "index.rst"): (
+            "Test\n====\n\n.. toctree::\n\n    states/index\n\n"
+            ".. autosaltsls:: nginx\n    :role: state\n"
+        ),
+    }
+
+    for path, text in files.items():
+        with open(os.path.join(str(root), path), "w") as outfile:
+            outfile.write(text)
+
+    return os.path.join(str(root), "docs")
+
+
+def test_directive_pages(tmp_path):
+    docs = _make_project(tmp_path)
+    build = os.path.join(str(tmp_path), "build")
+
+    app = Sphinx(
+        docs,
+        docs,
+        build,
+        os.path.join(build, ".doctrees"),
+        "dummy",
+        status=None,
+        warning=None,
+        freshenv=True,
+    )
+    app.build()
+
+    # Only a stub is written for the pages
+    with open(os.path.join(docs, "states", "apache.rst")) as infile:
+        assert infile.read() == ".. autosaltsls:: apache\n    :role: state"
+
+    doctree = app.env.get_doctree("states/apache")
+    titles = [x.astext() for x in doctree.traverse(nodes.title)]
+    assert titles == ["apache [init]", "Includes"]
+    assert "Installs Apache" in [x.astext() for x in doctree.traverse(nodes.paragraph)]
+    assert app.env.get_domain("salt").objects["state"]["apache"][0] == "states/apache"
+
+    doctree = app.env.get_doctree("states/nginx")
+    assert [x.astext() for x in doctree.traverse(nodes.title)] == [
+        "nginx",
+        "Steps",
+        "Included by",
+    ]
+    assert doctree.traverse(nodes.enumerated_list)[0].astext() == (
+        "nginx_installed\n\nInstall the package"
+    )
+
+    doctree = app.env.get_doctree("states/top")
+    assert [x.astext() for x in doctree.traverse(nodes.title)] == [
+        "top.sls",
+        "Environment: base",
+        "'*'",
+    ]
+
+    # The directive can be used in other documents, which are read again when the sls file changes
+    assert (
+        os.path.join(str(tmp_path), "states", "nginx.sls")
+        in app.env.dependencies["index"]
+    )
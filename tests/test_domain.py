@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+from sphinxcontrib.autosaltsls.domain import AutoSaltSLSDomain
+
+
+def _make_domain(docname):
+    config = SimpleNamespace(
+        autosaltsls_sources={
+            "states": {"cross_ref_role": "state"},
+            "roles": {"cross_ref_role": "state", "prefix": "roles"},
+        }
+    )
+    env = SimpleNamespace(
+        app=SimpleNamespace(config=config), domaindata={}, docname=docname
+    )
+
+    return AutoSaltSLSDomain(env)
+
+
+def test_domain_objects():
+    domain = _make_domain("states/apache")
+    domain.note_object("state", "apache", "state-apache")
+    domain.note_object("state", "apache.installed", "state-apache-installed")
+
+    assert sorted(domain.object_types) == ["sls", "state"]
+    assert [x.name for x in domain.indices] == ["sls", "state"]
+
+    # Documents read by another process are merged in
+    other = _make_domain("states/nginx")
+    other.note_object("state", "nginx", "state-nginx")
+    domain.merge_domaindata(["states/nginx"], other.data)
+
+    assert domain.objects["state"]["nginx"] == ("states/nginx", "state-nginx")
+
+    content, collapse = domain.indices[1](domain).generate()
+    assert [(x.name, x.subtype) for x in content[0][1]] == [
+        ("apache", 1),
+        ("apache.installed", 2),
+    ]
+    assert content[1][0] == "N"
+
+    domain.clear_doc("states/apache")
+    assert sorted(domain.objects["state"]) == ["nginx"]
+    assert "states/apache" not in domain.data["docs"]
@@ -0,0 +1,122 @@
+import os
+import shutil
+
+import pytest
+from docutils import nodes
+from sphinx.application import Sphinx
+
+from sphinxcontrib.autosaltsls import mapper
+
+EXAMPLE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "example")
+
+
+def _build_example(root, **overrides):
+    root = os.path.join(str(root), "example")
+    shutil.copytree(
+        EXAMPLE, root, ignore=shutil.ignore_patterns("_build", "__pycache__")
+    )
+    docs = os.path.join(root, "docs")
+    build = os.path.join(root, "build")
+
+    app = Sphinx(
+        docs,
+        docs,
+        build,
+        os.path.join(build, ".doctrees"),
+        "dummy",
+        confoverrides=overrides,
+        status=None,
+        warning=None,
+        freshenv=True,
+    )
+    app.build()
+
+    return app
+
+
+def _read_rst_files(app):
+    contents = {}
+
+    for root, dirs, files in os.walk(app.srcdir):
+        for filename in files:
+            if filename.endswith(".rst"):
+                full_filename = os.path.join(root, filename)
+                with open(full_filename, "rb") as infile:
+                    contents[os.path.relpath(full_filename, app.srcdir)] = infile.read()
+
+    return contents
+
+
+@pytest.mark.parametrize("render_nodes", [False, True])
+def test_example_included_by_resolves(tmp_path, render_nodes):
+    app = _build_example(tmp_path, autosaltsls_render_nodes=render_nodes)
+
+    checked = 0
+    for docname in sorted(app.env.found_docs):
+        doctree = app.env.get_and_resolve_doctree(docname, app.builder)
+
+        for section in doctree.traverse(nodes.section):
+            if section[0].astext() != "Included by":
+                continue
+
+            for item in section.traverse(nodes.list_item):
+                assert item.traverse(nodes.reference), "{0}: {1}".format(
+                    docname, item.astext()
+                )
+                checked += 1
+
+    # Top files include most of the example states, so there are links to check
+    assert checked >= 5
+
+
+@pytest.mark.parametrize("render_nodes", [False, True])
+def test_example_registry_matches_domain(tmp_path, render_nodes):
+    app = _build_example(tmp_path, autosaltsls_render_nodes=render_nodes)
+    objects = app.env.get_domain("salt").objects
+
+    # Every name the registry resolves is described on the page it resolves to
+    assert app.autosaltsls_registry.names
+    for (role, name), (sls_obj, docname) in app.autosaltsls_registry.names.items():
+        assert objects[role][name][0] == docname
+
+    assert app.autosaltsls_registry.resolve("state", "top")[1] == "states/top"
+
+
+@pytest.mark.parametrize("single_source", [False, True])
+def test_example_parallel_output_identical(tmp_path, monkeypatch, single_source):
+    overrides = {}
+    if single_source:
+        overrides["autosaltsls_sources"] = {"states": {"cross_ref_role": "state"}}
+
+    serial = _read_rst_files(
+        _build_example(tmp_path / "serial", autosaltsls_parallel_jobs=1, **overrides)
+    )
+
+    # All the sources share a pool of forked workers, or a single source creates its own
+    forked = _read_rst_files(
+        _build_example(tmp_path / "forked", autosaltsls_parallel_jobs=4, **overrides)
+    )
+    assert forked == serial
+
+    # Without fork each source is rendered in its own thread, or in this process for a single source
+    monkeypatch.setattr(mapper, "_fork_available", lambda: False)
+    threaded = _read_rst_files(
+        _build_example(tmp_path / "threaded", autosaltsls_parallel_jobs=4, **overrides)
+    )
+    assert threaded == serial
+    assert len(serial) > 5
+
+
+def test_example_include_sections_spacing(tmp_path):
+    app = _build_example(tmp_path)
+
+    # The include sections are separated by one blank line like the others, without a trailing blank line
+    checked = 0
+    for filename, content in _read_rst_files(app).items():
+        content = content.decode()
+        if "\nIncluded by\n" in content or "\nAll includes\n" in content:
+            assert "\n\n\n" not in content.lstrip("\n"), filename
+            assert not content.endswith("\n"), filename
+            checked += 1
+
+    assert checked >= 5
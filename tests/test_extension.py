@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+from sphinxcontrib.autosaltsls.extension import (
+    env_get_outdated,
+    env_merge_info,
+    env_purge_doc,
+)
+from sphinxcontrib.autosaltsls.graph import AutoSaltSLSIncludeGraph
+
+
+def _docs(*names):
+    return {
+        "states/" + x: {"names": {"state:" + x}, "files": [], "output": None}
+        for x in names
+    }
+
+
+def _graph(edges):
+    graph = AutoSaltSLSIncludeGraph()
+    for node, targets in edges.items():
+        graph.add_node("state:" + node, ["state:" + x for x in targets])
+
+    return graph
+
+
+def _app(docs, graph, changed_names=()):
+    return SimpleNamespace(
+        config=SimpleNamespace(autosaltsls_render_nodes=False),
+        autosaltsls_docs=docs,
+        autosaltsls_graph=graph,
+        autosaltsls_changed_names=set(changed_names),
+    )
+
+
+def test_env_get_outdated():
+    edges = {"webserver": ["apache"], "top": ["webserver", "nginx"]}
+    env = SimpleNamespace(
+        autosaltsls_docs=_docs("apache", "nginx", "webserver", "top"),
+        autosaltsls_graph=_graph(edges),
+    )
+    app = _app(
+        _docs("apache", "nginx", "webserver", "top"), _graph(edges), ["state:apache"]
+    )
+
+    # The changed document and the documents that include it
+    assert env_get_outdated(app, env, set(), set(), set()) == [
+        "states/apache",
+        "states/webserver",
+    ]
+
+    # Documents Sphinx already found changed are not returned again
+    assert env_get_outdated(app, env, set(), {"states/apache"}, set()) == [
+        "states/webserver"
+    ]
+
+    # Nothing is outdated without any changed sls files
+    app.autosaltsls_changed_names = set()
+    assert env_get_outdated(app, env, set(), set(), set()) == []
+
+
+def test_env_get_outdated_deleted_state():
+    env = SimpleNamespace(
+        autosaltsls_docs=_docs("apache", "nginx", "webserver", "top"),
+        autosaltsls_graph=_graph({"webserver": ["apache"], "top": ["webserver"]}),
+    )
+    app = _app(_docs("nginx", "webserver", "top"), _graph({"top": ["webserver"]}))
+
+    # The includers of the deleted state are found from the previous include graph
+    assert env_get_outdated(app, env, set(), set(), {"states/apache"}) == [
+        "states/webserver"
+    ]
+    assert env.autosaltsls_graph is app.autosaltsls_graph
+
+    # The deleted document is purged and a parallel read of another merged in
+    env_purge_doc(app, env, "states/apache")
+    assert sorted(env.autosaltsls_docs) == [
+        "states/nginx",
+        "states/top",
+        "states/webserver",
+    ]
+
+    env_purge_doc(app, env, "states/webserver")
+    other = SimpleNamespace(autosaltsls_docs=_docs("webserver", "nrpe"))
+    env_merge_info(app, env, ["states/webserver"], other)
+    assert sorted(env.autosaltsls_docs) == [
+        "states/nginx",
+        "states/top",
+        "states/webserver",
+    ]
@@ -0,0 +1,39 @@
+import pickle
+
+from sphinxcontrib.autosaltsls.graph import AutoSaltSLSIncludeGraph
+
+
+def test_include_graph():
+    graph = AutoSaltSLSIncludeGraph()
+    graph.add_node("sls:top", ["sls:webserver", "sls:nrpe"])
+    graph.add_node("sls:webserver", ["sls:apache"])
+    graph.add_node("sls:apache", ["sls:apache.installed", "sls:webserver"])
+    graph.add_node("sls:apache.installed", [])
+    graph.add_node("sls:loop", ["sls:loop"])
+
+    assert graph.dependents(["sls:apache"]) == {"sls:webserver"}
+    assert graph.dependents(["sls:nrpe", "sls:missing"]) == {"sls:top"}
+    assert graph.cycles() == [["sls:apache", "sls:webserver"], ["sls:loop"]]
+
+    # The reverse edges are rebuilt after unpickling
+    graph = pickle.loads(pickle.dumps(graph))
+    assert graph.reverse["sls:webserver"] == {"sls:top", "sls:apache"}
+
+
+def test_include_closure():
+    graph = AutoSaltSLSIncludeGraph()
+    graph.add_node("sls:role", ["sls:profile", "sls:nginx"])
+    graph.add_node("sls:profile", ["sls:apache", "sls:nginx"])
+    graph.add_node("sls:apache", ["sls:apache.config"])
+    graph.add_node("sls:apache.config", ["sls:apache"])
+
+    closure = graph.closure()
+
+    assert closure["sls:role"] == {
+        "sls:profile": 1,
+        "sls:nginx": 1,
+        "sls:apache": 2,
+        "sls:apache.config": 3,
+    }
+    assert closure["sls:apache"] == {"sls:apache.config": 1}
+    assert closure["sls:apache.config"] == {"sls:apache": 1}
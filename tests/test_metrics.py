@@ -0,0 +1,40 @@
+import json
+
+from sphinxcontrib.autosaltsls.metrics import AutoSaltSLSMetrics, AutoSaltSLSTraceFile
+
+
+def test_metrics_reports(tmp_path):
+    metrics = AutoSaltSLSMetrics(slowest=2)
+    metrics.add("states", "sls_files_parsed", 3)
+    metrics.add("pillar", "sls_files_parsed")
+    metrics.add_phase_time("states", "parse", 0.5)
+
+    for index, seconds in enumerate([0.1, 0.3, 0.2]):
+        metrics.add_file_time(
+            "parse", "states", "s{0}".format(index), "s{0}.sls".format(index), seconds
+        )
+
+    metrics.write_json(str(tmp_path / "metrics.json"))
+    data = json.loads((tmp_path / "metrics.json").read_text())
+
+    assert data["counters"]["sls_files_parsed"] == 4
+    assert data["sources"]["states"]["phases"]["parse"] == 0.5
+    assert [x["name"] for x in data["slowest_parse"]] == ["s1", "s2"]
+
+    # Label values have to be escaped
+    metrics.add('a"b', "files_written")
+    metrics.write_openmetrics(str(tmp_path / "metrics.prom"))
+    lines = (tmp_path / "metrics.prom").read_text().splitlines()
+
+    assert 'autosaltsls_files_written{source="a\\"b"} 1' in lines
+    assert lines[-1] == "# EOF"
+
+
+def test_trace_file(tmp_path):
+    trace = AutoSaltSLSTraceFile(str(tmp_path / "trace" / "parse.jsonl"))
+    trace.write({"name": "apache", "entries": []})
+    trace.write({"name": "nginx", "entries": []})
+    trace.close()
+
+    lines = (tmp_path / "trace" / "parse.jsonl").read_text().splitlines()
+    assert [json.loads(x)["name"] for x in lines] == ["apache", "nginx"]
@@ -0,0 +1,92 @@
+import os
+from types import SimpleNamespace
+
+from sphinxcontrib.autosaltsls.objects import AutoSaltSLS, AutoSaltSLSEntry
+
+
+def test_entry_pack():
+    entry = AutoSaltSLSEntry("Summary line\nsecond line\n\nContent\n  more")
+    entry.step_id = True
+    assert entry.is_step and entry.prepend_id and not entry.step
+
+    buffer = "header\n\n" + entry.text
+    entry.pack(buffer, len("header\n\n"))
+    assert entry.summary == "Summary line\nsecond line"
+    assert entry.content == "Content\n  more"
+    assert entry.lines == ["Summary line", "second line", "", "Content", "  more"]
+
+    # Changing a packed entry goes back to a list of lines
+    entry.prepend_line("")
+    assert entry.summary == ""
+    assert entry.content == "Summary line\nsecond line\n\nContent\n  more"
+
+    empty = AutoSaltSLSEntry()
+    assert not empty.has_text and empty.summary == "" and empty.content == ""
+
+
+def _entry(text, directive=None):
+    entry = AutoSaltSLSEntry(text)
+    if directive:
+        setattr(entry, directive, True)
+
+    return entry
+
+
+def test_split_top_file(tmp_path):
+    sls_obj = AutoSaltSLS("top.sls", str(tmp_path), SimpleNamespace(prefix=None))
+    sls_obj.add_entry(_entry("Top file"))
+    sls_obj.add_entry(_entry("Before any environment"))
+    sls_obj.add_entry(_entry("base\n\nCommon states", "environment"))
+    for target in ["'*'", "'web*'", "'db*'"]:
+        sls_obj.add_entry(_entry(target, "topfile_id"))
+    sls_obj.add_entry(_entry("prod env", "environment"))
+
+    pages = sls_obj.split_top_file(chunk_size=2)
+
+    assert [(x.rst_filename, x.label, len(x.entries)) for x in pages] == [
+        ("top.base.1.rst", "Environment: base (1 of 2)", 2),
+        ("top.base.2.rst", "Environment: base (2 of 2)", 1),
+        ("top.prod_env.rst", "Environment: prod env", 0),
+    ]
+    assert [x.summary for x in sls_obj.top_overview_entries] == [
+        "Before any environment"
+    ]
+
+    # The overview keeps the page of the top file, so references to it still work
+    rst_files = sls_obj.rst_files(str(tmp_path))
+    assert rst_files[0] == (sls_obj, os.path.join(str(tmp_path), "top.rst"), None)
+    assert [x[2] for x in rst_files[1:]] == ["top_env.rst_t"] * 3
+
+    # Environments are not chunked without a chunk size
+    assert len(sls_obj.split_top_file()) == 2
+
+
+def test_split_nested_top_file(tmp_path):
+    settings = SimpleNamespace(prefix=None)
+    parent = AutoSaltSLS("envs", str(tmp_path), settings)
+    sls_obj = AutoSaltSLS(
+        "top.sls", str(tmp_path / "envs"), settings, parent_name=parent.name
+    )
+    parent.add_child(sls_obj)
+    sls_obj.add_entry(_entry("Top file"))
+    sls_obj.add_entry(_entry("base", "environment"))
+    sls_obj.add_entry(_entry("'*'", "topfile_id"))
+    sls_obj.add_entry(_entry("prod", "environment"))
+
+    sls_obj.split_top_file()
+
+    # The environment pages sit next to the page for the top file in the dir
+    output_dir = os.path.join(str(tmp_path), "envs")
+    assert parent.rst_files(str(tmp_path))[1:] == [
+        (sls_obj, os.path.join(output_dir, "top.rst"), None),
+        (
+            sls_obj.top_pages[0],
+            os.path.join(output_dir, "top.base.rst"),
+            "top_env.rst_t",
+        ),
+        (
+            sls_obj.top_pages[1],
+            os.path.join(output_dir, "top.prod.rst"),
+            "top_env.rst_t",
+        ),
+    ]
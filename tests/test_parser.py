@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+import pytest
+
+from sphinxcontrib.autosaltsls import parser as parser_module
+from sphinxcontrib.autosaltsls.objects import AutoSaltSLS
+from sphinxcontrib.autosaltsls.parser import AutoSaltSLSParser
+
+SLS_TEXT = """#!jinja|yaml
+### include
+# Included states
+include:
+  - .ssl
+  - users
+  {% if pillar.get('extra') %}
+  - extra
+  {% endif %}
+
+    ### summary_id
+    # Installs the package
+    #!not documented
+apache_installed:
+  pkg.installed:
+    - name: apache2
+###
+# Trailing block
+"""
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+@pytest.mark.parametrize("mmap_threshold", [parser_module.MMAP_THRESHOLD, 1])
+def test_parser(tmp_path, monkeypatch, newline, mmap_threshold):
+    monkeypatch.setattr(parser_module, "MMAP_THRESHOLD", mmap_threshold)
+    (tmp_path / "server.sls").write_bytes(SLS_TEXT.replace("\n", newline).encode())
+    settings = SimpleNamespace(
+        doc_prefix="###",
+        comment_prefix="#",
+        comment_ignore_prefix="#!",
+        indented_comments=True,
+        remove_first_space=True,
+    )
+    parser = AutoSaltSLSParser(settings)
+
+    sls_obj = AutoSaltSLS("server.sls", str(tmp_path), settings, parent_name="apache")
+    sls_obj.parse_file(parser)
+
+    assert sls_obj.format == "jinja|yaml"
+    assert len(sls_obj.entries) == 3
+
+    include, summary, trailing = sls_obj.entries
+    assert include.includes == [".ssl <apache.ssl>", "users", "extra"]
+    assert include.summary == "Included states"
+    assert summary.summary == "apache_installed"
+    assert summary.content == "Installs the package"
+    assert trailing.text == "Trailing block"
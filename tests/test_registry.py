@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+from sphinxcontrib.autosaltsls.objects import AutoSaltSLS
+from sphinxcontrib.autosaltsls.registry import AutoSaltSLSRegistry
+
+SETTINGS = SimpleNamespace(
+    doc_prefix="###",
+    comment_prefix="#",
+    comment_ignore_prefix="#!",
+    indented_comments=False,
+    remove_first_space=True,
+    cross_ref_role="sls",
+    prefix=None,
+)
+
+WEBSERVER_TEXT = """### include
+include:
+  - apache
+  - missing
+  - internal
+"""
+
+
+def test_registry_includes(tmp_path):
+    (tmp_path / "apache.sls").write_text("###\n# Apache\napache:\n  pkg.installed\n")
+    (tmp_path / "webserver.sls").write_text(WEBSERVER_TEXT)
+    (tmp_path / "internal.sls").write_text("### hidden\n# Internal\n")
+
+    sls_objects = []
+    for basename in ["apache.sls", "webserver.sls", "internal.sls"]:
+        sls_obj = AutoSaltSLS(basename, str(tmp_path), SETTINGS)
+        sls_obj.parse_file()
+        sls_objects.append(sls_obj)
+
+    mapper = SimpleNamespace(
+        settings=SETTINGS,
+        build_root=str(tmp_path / "docs" / "states"),
+        sls_objects=sls_objects,
+        visible_sls_objects=sls_objects,
+    )
+
+    registry = AutoSaltSLSRegistry(str(tmp_path / "docs"))
+    registry.add_mapper(mapper)
+
+    assert registry.resolve("sls", "apache") == (sls_objects[0], "states/apache")
+    assert registry.resolve("pillar", "apache") is None
+    assert registry.dangling_includes(mapper) == [
+        (sls_objects[1], "missing", 4),
+        (sls_objects[1], "internal", 5),
+    ]
+
+    # Hidden sls files have no page so can't be included
+    assert sls_objects[2].hidden
+    assert registry.resolve("sls", "internal") is None
+    assert ("sls", "internal") not in registry
@@ -0,0 +1,36 @@
+import os
+
+from jinja2 import ModuleLoader
+
+from sphinxcontrib.autosaltsls import rendering
+
+
+def test_jinja_env_shared(tmp_path):
+    user_dir = tmp_path / "templates"
+    user_dir.mkdir()
+    paths = [str(user_dir), rendering.TEMPLATE_DIR]
+
+    env = rendering.get_jinja_env(paths, cache_dir=str(tmp_path / "cache"))
+    assert rendering.get_jinja_env(paths, cache_dir=str(tmp_path / "cache")) is env
+
+    # Overriding a built-in template changes the user dir so a new environment is needed
+    (user_dir / "index.rst_t").write_text("custom")
+    os.utime(str(user_dir), ns=(0, 0))
+    env2 = rendering.get_jinja_env(paths, cache_dir=str(tmp_path / "cache"))
+    assert env2 is not env
+    assert env2.get_template("index.rst_t").render() == "custom"
+    assert os.listdir(str(tmp_path / "cache"))
+
+
+def test_precompiled_templates(tmp_path, monkeypatch):
+    compiled_dir = str(tmp_path / "compiled")
+    rendering.compile_templates(compiled_dir)
+
+    monkeypatch.setattr(rendering, "COMPILED_DIR", compiled_dir)
+    monkeypatch.setattr(rendering, "_compiled_loader", False)
+    assert isinstance(rendering._builtin_loader(), ModuleLoader)
+
+    # Out of date modules are not used
+    monkeypatch.setattr(rendering, "_compiled_loader", False)
+    monkeypatch.setattr(rendering.jinja2, "__version__", "0.0")
+    assert not isinstance(rendering._builtin_loader(), ModuleLoader)
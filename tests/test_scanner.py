@@ -0,0 +1,72 @@
+import os
+import re
+
+from sphinxcontrib.autosaltsls.scanner import AutoSaltSLSManifest, walk_sls_tree
+
+
+def _make_tree(root, paths):
+    for path in paths:
+        full_path = os.path.join(str(root), *path.split("/"))
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        open(full_path, "w").close()
+
+
+def test_walk_sls_tree(tmp_path):
+    _make_tree(
+        tmp_path,
+        [
+            "top.sls",
+            "apache/init.sls",
+            "apache/running.sls",
+            "apache/files/httpd.conf",
+            "apache/files/extra/mod.sls",
+            "roles/webserver/init.sls",
+            "tests/test_apache.sls",
+        ],
+    )
+
+    result = list(walk_sls_tree(str(tmp_path)))
+    assert result == [
+        (".", ["top.sls"]),
+        ("apache", ["init.sls", "running.sls"]),
+        (os.path.join("apache", "files"), []),
+        (os.path.join("apache", "files", "extra"), ["mod.sls"]),
+        ("roles", []),
+        (os.path.join("roles", "webserver"), ["init.sls"]),
+        ("tests", ["test_apache.sls"]),
+    ]
+
+    # Exact paths, globs and regexes
+    result = list(
+        walk_sls_tree(
+            str(tmp_path),
+            exclude=["roles", "*/files", re.compile(r"^tests"), "re:running\\.sls$"],
+        )
+    )
+    assert result == [(".", ["top.sls"]), ("apache", ["init.sls"])]
+
+
+def test_walk_sls_tree_manifest(tmp_path):
+    source = str(tmp_path / "states")
+    _make_tree(source, ["apache/init.sls", "apache/running.sls"])
+    manifest_file = str(tmp_path / "manifest.pickle")
+
+    manifest = AutoSaltSLSManifest(manifest_file)
+    list(walk_sls_tree(source, manifest=manifest))
+    assert manifest.changes["added"] == {"apache", "apache.running"}
+    manifest.save()
+
+    with open(os.path.join(source, "apache", "running.sls"), "w") as outfile:
+        outfile.write("# changed\n")
+    os.remove(os.path.join(source, "apache", "init.sls"))
+    _make_tree(source, ["nginx.sls"])
+
+    manifest = AutoSaltSLSManifest(manifest_file)
+    manifest.load()
+    result = list(walk_sls_tree(source, manifest=manifest))
+    assert result == [(".", ["nginx.sls"]), ("apache", ["running.sls"])]
+    assert manifest.changes == {
+        "added": {"nginx"},
+        "removed": {"apache"},
+        "modified": {"apache.running"},
+    }
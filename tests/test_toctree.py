@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+from sphinxcontrib.autosaltsls.toctree import build_toc_levels
+
+
+def _sls(basename, children=False):
+    toc_entry = basename.replace(".", "/")
+
+    return SimpleNamespace(
+        basename=basename,
+        children=[object()] if children else [],
+        toc_entry=toc_entry + "/main" if children else toc_entry,
+        toc_level=None,
+    )
+
+
+def test_nested_levels():
+    webserver = _sls("roles.webserver", children=True)
+    sls_objects = [_sls("nginx"), _sls("roles.cache"), webserver, _sls("deep.a.b.c")]
+
+    root = build_toc_levels(sls_objects, "States")
+
+    assert root.toc_entries == [
+        ("deep", "deep/main"),
+        ("nginx", "nginx"),
+        ("roles", "roles/main"),
+    ]
+
+    # Dirs without sls files of their own still get a level
+    assert root.levels["deep"].toc_entries == [("a", "a/main")]
+    assert root.levels["deep"].levels["a"].levels["b"].toc_entries == [("c", "c")]
+
+    roles = root.levels["roles"]
+    assert roles.toc_entries == [("cache", "cache"), ("webserver", "webserver/main")]
+    assert webserver.toc_level is roles.levels["webserver"]
+    assert roles.levels["webserver"].sls_obj is webserver
+
+
+def test_sharded_levels():
+    sls_objects = [_sls(x) for x in ["apache", "bind", "cron", "mysql", "nginx"]]
+
+    root = build_toc_levels(sls_objects, "States", mode="size", size=2)
+    assert root.toc_entries == [
+        ("apache - bind", "index.1"),
+        ("cron - mysql", "index.2"),
+        ("nginx", "index.3"),
+    ]
+    assert root.shards[1].title == "States: cron - mysql"
+    assert root.shards[1].toc_entries == [("cron", "cron"), ("mysql", "mysql")]
+
+    root = build_toc_levels(sls_objects, "States", mode="alpha", size=4)
+    assert [x[0] for x in root.toc_entries] == ["A", "B", "C", "M", "N"]
+
+    # Levels are only sharded when they are too big
+    root = build_toc_levels(sls_objects, "States", mode="alpha", size=5)
+    assert not root.shards
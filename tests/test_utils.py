@@ -0,0 +1,18 @@
+import os
+
+from sphinxcontrib.autosaltsls.utils import write_file_if_changed
+
+
+def test_write_file_if_changed(tmp_path):
+    filename = str(tmp_path / "test.rst")
+
+    assert write_file_if_changed(filename, "Title\n*****\n")
+    mtime = os.stat(filename).st_mtime_ns
+
+    # Same content should leave the file alone
+    assert not write_file_if_changed(filename, "Title\n*****\n")
+    assert os.stat(filename).st_mtime_ns == mtime
+
+    assert write_file_if_changed(filename, "New Title\n*********\n")
+    with open(filename) as infile:
+        assert infile.read() == "New Title\n*********\n"
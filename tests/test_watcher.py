@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+from sphinxcontrib.autosaltsls import watcher
+
+
+def _write(path, text):
+    with open(str(path), "w") as outfile:
+        outfile.write(text)
+
+
+def test_polling_watcher(tmp_path):
+    (tmp_path / "apache").mkdir()
+    _write(tmp_path / "apache" / "init.sls", "###\n# Apache\n")
+    _write(tmp_path / "nginx.sls", "")
+
+    poller = watcher.AutoSaltSLSPollingWatcher([str(tmp_path)], interval=0.01)
+    assert poller.wait(timeout=0) == set()
+
+    _write(tmp_path / "apache" / "init.sls", "###\n# Apache server\n")
+    _write(tmp_path / "apache" / "notes.txt", "not an sls file")
+    os.remove(str(tmp_path / "nginx.sls"))
+
+    assert poller.wait(timeout=1) == {
+        str(tmp_path / "apache" / "init.sls"),
+        str(tmp_path / "nginx.sls"),
+    }
+
+
+def test_inotify_watcher(tmp_path):
+    try:
+        inotify = watcher.AutoSaltSLSInotifyWatcher([str(tmp_path)])
+    except (AttributeError, OSError):
+        pytest.skip("inotify not available")
+
+    try:
+        _write(tmp_path / "nginx.sls", "")
+        assert inotify.wait(timeout=1) == {str(tmp_path / "nginx.sls")}
+
+        # New dirs are watched as well
+        (tmp_path / "apache").mkdir()
+        assert inotify.wait(timeout=1) == {str(tmp_path / "apache")}
+
+        _write(tmp_path / "apache" / "init.sls", "")
+        _write(tmp_path / "apache" / "init.sls.swp", "")
+        assert inotify.wait(timeout=1) == {str(tmp_path / "apache" / "init.sls")}
+    finally:
+        inotify.close()